@@ -1,3 +1,4 @@
+import click
 from flask import Flask
 from flask_cors import CORS
 from flask_login import LoginManager
@@ -23,6 +24,15 @@ def create_app(config_class=Config):
     # Apply tenant middleware
     TenantMiddleware(app)
 
+    from app.services.grading import answer_key_cache
+    from app.services.code_runner import result_cache
+    from app.services.exam_paper import paper_cache
+    from app.services.analytics import analytics_cache
+    answer_key_cache.init_app(app)
+    result_cache.init_app(app)
+    paper_cache.init_app(app)
+    analytics_cache.init_app(app)
+
     # Register blueprints
     from app.routes.tenants import tenants_bp
     from app.routes.auth import auth_bp
@@ -49,6 +59,112 @@ def create_app(config_class=Config):
     def unauthorized():
         return {'error': 'Authentication required'}, 401
 
+    # Maintenance jobs (run from cron / a scheduler via `flask <command>`)
+    @app.cli.command('reconcile-usage')
+    def reconcile_usage():
+        """Recompute tenant usage counters from source tables"""
+        from app.services.tenant_service import TenantService
+        print(f"Corrected usage for {TenantService.reconcile_usage()} tenant(s)")
+
+    @app.cli.command('set-feature-overrides')
+    @click.argument('slug')
+    @click.argument('overrides', required=False)
+    def set_feature_overrides(slug, overrides):
+        """Set a tenant's feature overrides from a JSON object (omit to clear)"""
+        import json
+        from app.services.tenant_service import TenantService
+        try:
+            tenant = TenantService.set_feature_overrides(slug, json.loads(overrides) if overrides else None)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        print(f"Feature overrides of {tenant.slug}: {tenant.feature_overrides or {}}")
+
+    @app.cli.command('reconcile-invoices')
+    def reconcile_invoices():
+        """Recompute Invoice.paid_amount from completed payments"""
+        from app.services.payment_service import PaymentService
+        print(f"Corrected paid amounts for {PaymentService.reconcile_invoice_totals()} invoice(s)")
+
+    @app.cli.command('rebuild-revenue-rollups')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='First day to rebuild')
+    @click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Day to stop before')
+    def rebuild_revenue_rollups(since, until):
+        """Recompute the daily revenue rollups from payments"""
+        from app.services.financial_reports import rebuild_rollups
+        rows = rebuild_rollups(since.date() if since else None, until.date() if until else None)
+        print(f"Wrote {rows} daily revenue row(s)")
+
+    @app.cli.command('repair-seat-counts')
+    def repair_seat_counts():
+        """Recount Batch.confirmed_count from confirmed enrollments"""
+        from app.services.enrollment_service import EnrollmentService
+        print(f"Corrected seat counts for {EnrollmentService.recount_batch_seats()} batch(es)")
+
+    @app.cli.command('rebuild-gradebook')
+    @click.option('--course-id', default=None, help='Only rebuild this course')
+    def rebuild_gradebook(course_id):
+        """Backfill gradebook entries from finalized exams"""
+        from app.services.gradebook import rebuild_gradebook
+        print(f"Rebuilt gradebook from {rebuild_gradebook(course_id)} exam(s)")
+
+    @app.cli.command('grading-worker')
+    def grading_worker():
+        """Grade queued subjective and code responses until interrupted"""
+        from app.services.grading_queue import GradingWorkerPool
+        GradingWorkerPool(app).run_forever()
+
+    @app.cli.command('webhook-worker')
+    def webhook_worker():
+        """Process payment webhook events from the inbox until interrupted"""
+        from app.services.webhook_inbox import WebhookWorkerPool
+        WebhookWorkerPool(app).run_forever()
+
+    @app.cli.command('replay-webhooks')
+    @click.option('--status', default='failed', help='Replay events in this status')
+    @click.option('--since', type=click.DateTime(), default=None, help='Only events received at or after')
+    @click.option('--until', type=click.DateTime(), default=None, help='Only events received before')
+    @click.option('--event-id', 'event_ids', multiple=True, help='Replay specific gateway event ids')
+    def replay_webhooks(status, since, until, event_ids):
+        """Queue stored webhook events for processing again"""
+        from app.services.webhook_inbox import replay_events
+        print(f"Queued {replay_events(status, since, until, list(event_ids))} event(s) for replay")
+
+    @app.cli.command('backfill-exam-deadlines')
+    def backfill_exam_deadlines():
+        """Set expires_at of in-progress timed exams that have none (run once after upgrading)"""
+        from app.services.exam_sweeper import backfill_exam_deadlines
+        print(f"Set deadlines of {backfill_exam_deadlines()} exam(s)")
+
+    @app.cli.command('sweep-exams')
+    def sweep_exams():
+        """Finalize overdue timed exams every EXAM_SWEEP_INTERVAL_SECONDS until interrupted"""
+        from app.services.exam_sweeper import ExamSweeper
+        sweeper = ExamSweeper(app).start()
+        try:
+            sweeper._thread.join()
+        except KeyboardInterrupt:
+            sweeper.stop()
+
+    # Write buffers live in each worker process: flush them on a timer and
+    # at exit instead of from request handlers
+    if app.config.get('WRITE_BUFFER_FLUSH_THREAD'):
+        from app.services.progress_buffer import progress_buffer
+        from app.utils.usage_buffer import usage_buffer
+        from app.utils.buffer_flusher import BufferFlusher
+        app.extensions['buffer_flusher'] = BufferFlusher(app, [progress_buffer, usage_buffer]).start()
+
+    if app.config.get('EXAM_SWEEPER_INPROCESS'):
+        from app.services.exam_sweeper import ExamSweeper
+        app.extensions['exam_sweeper'] = ExamSweeper(app).start()
+
+    if app.config.get('WEBHOOK_WORKER_INPROCESS'):
+        from app.services.webhook_inbox import WebhookWorkerPool
+        app.extensions['webhook_workers'] = WebhookWorkerPool(app).start()
+
+    if app.config.get('GRADING_WORKER_INPROCESS'):
+        from app.services.grading_queue import GradingWorkerPool
+        app.extensions['grading_workers'] = GradingWorkerPool(app).start()
+
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
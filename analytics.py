@@ -0,0 +1,179 @@
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models.assessment import Question, Response, Exam
+from app.utils.cache import TTLCache, MISSING
+
+FINAL_STATUSES = ('submitted', 'graded', 'expired')
+
+# Share of examinees in the upper and lower groups of the discrimination index
+GROUP_FRACTION = 0.27
+
+analytics_cache = TTLCache(config_prefix='ANALYTICS_CACHE')
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def _answer_key(answer):
+    """Hashable form of an answer for distractor counts"""
+    if isinstance(answer, list):
+        return '|'.join(sorted(str(item) for item in answer))
+    return str(answer) if answer is not None else None
+
+class AssessmentAnalytics:
+    """Per-exam columns of one assessment, refreshed incrementally from the DB.
+
+    For every finalized exam it keeps the score, time spent and, per question,
+    the score ratio and answer. Only exams changed since the last refresh are
+    read again, in chunks of plain column tuples.
+    """
+
+    def __init__(self, assessment_id):
+        self.assessment_id = assessment_id
+        self.watermark = None
+        self.exams = {}
+        self.questions = {}
+        self.lock = threading.Lock()
+
+    def refresh(self, chunk_size=1000):
+        refreshed_at = datetime.utcnow()
+
+        self.questions = {
+            question_id: (question_type, marks or 0, (content or {}).get('options'))
+            for question_id, question_type, marks, content in db.session.query(
+                Question.id, Question.type, Question.marks, Question.content
+            ).filter(Question.assessment_id == self.assessment_id)
+        }
+
+        changed = db.session.query(
+            Exam.id, Exam.percentage, Exam.time_spent_seconds, Exam.started_at, Exam.submitted_at
+        ).filter(
+            Exam.assessment_id == self.assessment_id,
+            Exam.status.in_(FINAL_STATUSES)
+        )
+        if self.watermark is not None:
+            # updated_at is stamped at flush, before the exam's transaction
+            # commits: look back far enough to catch late commits (and clock
+            # skew between servers); re-reading an exam is harmless
+            overlap = timedelta(seconds=current_app.config.get('ANALYTICS_WATERMARK_OVERLAP_SECONDS', 300))
+            changed = changed.filter(Exam.updated_at >= self.watermark - overlap)
+
+        changed_ids = []
+        for exam_id, percentage, time_spent, started_at, submitted_at in changed:
+            if not time_spent and started_at and submitted_at:
+                time_spent = int((submitted_at - started_at).total_seconds())
+            self.exams[exam_id] = {
+                'score': float(percentage or 0),
+                'time_spent': time_spent or 0,
+                'answers': {}
+            }
+            changed_ids.append(exam_id)
+
+        # Responses of changed exams, streamed as tuples rather than ORM objects
+        for start in range(0, len(changed_ids), chunk_size):
+            ids = changed_ids[start:start + chunk_size]
+            rows = db.session.query(
+                Response.exam_id, Response.question_id, Response.answer, Response.marks_awarded
+            ).filter(Response.exam_id.in_(ids)).execution_options(yield_per=chunk_size)
+
+            for exam_id, question_id, answer, marks_awarded in rows:
+                question = self.questions.get(question_id)
+                if not question:
+                    continue
+                ratio = None
+                if marks_awarded is not None and question[1]:
+                    ratio = marks_awarded / question[1]
+                self.exams[exam_id]['answers'][question_id] = (ratio, _answer_key(answer))
+
+        self.watermark = refreshed_at
+        return len(changed_ids)
+
+    def report(self):
+        exams = self.exams
+        scores = sorted(exam['score'] for exam in exams.values())
+        times = sorted(exam['time_spent'] for exam in exams.values())
+
+        # Upper and lower groups by total score for the discrimination index
+        ranked = sorted(exams, key=lambda exam_id: exams[exam_id]['score'])
+        group_size = max(1, int(len(ranked) * GROUP_FRACTION)) if ranked else 0
+        lower_group = set(ranked[:group_size])
+        upper_group = set(ranked[-group_size:]) if group_size else set()
+
+        columns = {question_id: [] for question_id in self.questions}
+        for exam_id, exam in exams.items():
+            for question_id, (ratio, answer) in exam['answers'].items():
+                if question_id in columns:
+                    columns[question_id].append((exam_id, ratio, answer))
+
+        questions = []
+        for question_id, (question_type, marks, options) in self.questions.items():
+            column = columns[question_id]
+            ratios = [ratio for _, ratio, _ in column if ratio is not None]
+            upper = [ratio for exam_id, ratio, _ in column if ratio is not None and exam_id in upper_group]
+            lower = [ratio for exam_id, ratio, _ in column if ratio is not None and exam_id in lower_group]
+
+            item = {
+                'question_id': question_id,
+                'type': question_type,
+                'responses': len(column),
+                'graded': len(ratios),
+                # Difficulty index: mean share of marks obtained (1 = easiest)
+                'difficulty': round(sum(ratios) / len(ratios), 4) if ratios else None,
+                'discrimination': round(
+                    sum(upper) / len(upper) - sum(lower) / len(lower), 4
+                ) if upper and lower else None,
+            }
+
+            if question_type == 'mcq':
+                counts = Counter(answer for _, _, answer in column)
+                item['distractors'] = {
+                    str(option): counts.get(_answer_key(option), 0) for option in options or []
+                }
+                item['distractors']['(no answer)'] = counts.get(None, 0)
+
+            questions.append(item)
+
+        buckets = [0] * 10
+        for score in scores:
+            buckets[min(int(score // 10), 9)] += 1
+
+        return {
+            'assessment_id': self.assessment_id,
+            'exams': len(scores),
+            'scores': {
+                'mean': round(sum(scores) / len(scores), 2) if scores else None,
+                'median': percentile(scores, 0.5),
+                'p25': percentile(scores, 0.25),
+                'p75': percentile(scores, 0.75),
+                'distribution': [
+                    {'range': f"{i * 10}-{i * 10 + 10}", 'count': count}
+                    for i, count in enumerate(buckets)
+                ]
+            },
+            'time_spent_seconds': {
+                'p50': percentile(times, 0.5),
+                'p90': percentile(times, 0.9),
+                'p99': percentile(times, 0.99),
+                'max': times[-1] if times else None
+            },
+            'questions': questions,
+            'computed_at': self.watermark.isoformat() if self.watermark else None
+        }
+
+def get_assessment_analytics(assessment_id):
+    """Return the analytics report, reading only exams changed since last time"""
+    state = analytics_cache.get(assessment_id)
+    if state is MISSING:
+        state = AssessmentAnalytics(assessment_id)
+        analytics_cache.set(assessment_id, state)
+    with state.lock:
+        state.refresh()
+        return state.report()
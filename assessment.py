@@ -1,6 +1,10 @@
 from app.extensions import db
 from app.models.base import BaseModel
 from datetime import datetime
+from sqlalchemy.orm import Session, object_session
+
+# Callables run with an assessment id after a commit that changed its questions
+_question_change_handlers = []
 
 class Assessment(BaseModel):
     __tablename__ = 'assessments'
@@ -27,12 +31,32 @@ class Assessment(BaseModel):
     total_marks = db.Column(db.Integer, default=100)
     is_published = db.Column(db.Boolean, default=False)
 
+    # Bumped in the transaction of every question change; caches of derived
+    # data (answer keys, exam papers) compare it on each read
+    questions_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Relationships
     course = db.relationship('Course', back_populates='assessments')
     module = db.relationship('Module', back_populates='assessments')
     questions = db.relationship('Question', back_populates='assessment', lazy='dynamic')
     exams = db.relationship('Exam', back_populates='assessment', lazy='dynamic')
 
+    @staticmethod
+    def bump_questions_version(assessment_id, connection=None):
+        """Increment questions_version in the current (or given connection's) transaction"""
+        statement = db.update(Assessment.__table__).where(
+            Assessment.__table__.c.id == assessment_id
+        ).values(questions_version=Assessment.__table__.c.questions_version + 1)
+        if connection is not None:
+            connection.execute(statement)
+        else:
+            db.session.execute(statement)
+
+def on_questions_committed(handler):
+    """Register handler(assessment_id) to run after commits that change questions"""
+    _question_change_handlers.append(handler)
+    return handler
+
 class Question(BaseModel):
     __tablename__ = 'questions'
 
@@ -90,6 +114,10 @@ class Exam(BaseModel):
     percentage = db.Column(db.Numeric(5, 2))
 
     status = db.Column(db.Enum('in_progress', 'submitted', 'graded', 'expired'), default='in_progress')
+    expires_at = db.Column(db.DateTime)  # Deadline of timed assessments, None when untimed
+    # Failed expiry sweeps of this exam; it is retried after sweep_retry_at
+    sweep_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    sweep_retry_at = db.Column(db.DateTime)
 
     proctoring_data = db.Column(db.JSON, default=lambda: {
         'tab_switches': 0,
@@ -97,7 +125,84 @@ class Exam(BaseModel):
         'face_detection_logs': []
     })
 
+    __table_args__ = (
+        # Expiry sweeper: in-progress exams past their deadline
+        db.Index('ix_exams_status_expires', 'status', 'expires_at'),
+        # Active exam lookup in start_exam
+        db.Index('ix_exams_assessment_user_status', 'assessment_id', 'user_id', 'status'),
+    )
+
     # Relationships
     assessment = db.relationship('Assessment', back_populates='exams')
     user = db.relationship('User')
     responses = db.relationship('Response', back_populates='exam', lazy='dynamic')
+
+class GradingJob(BaseModel):
+    __tablename__ = 'grading_jobs'
+
+    exam_id = db.Column(db.String(36), db.ForeignKey('exams.id'), nullable=False)
+    response_id = db.Column(db.String(36), db.ForeignKey('responses.id'), nullable=False, unique=True)
+    question_type = db.Column(db.String(20), nullable=False)
+
+    # manual: no automatic grader applies, waiting for an instructor
+    status = db.Column(db.Enum('queued', 'running', 'done', 'manual', 'failed'), default='queued')
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    locked_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_grading_jobs_status_created', 'status', 'created_at'),)
+
+    # Relationships
+    exam = db.relationship('Exam')
+    response = db.relationship('Response')
+
+class ExamAutosave(BaseModel):
+    __tablename__ = 'exam_autosaves'
+
+    # Append-only log of in-progress answers; the latest entry per question wins
+    exam_id = db.Column(db.String(36), db.ForeignKey('exams.id'), nullable=False)
+    question_id = db.Column(db.String(36), db.ForeignKey('questions.id'), nullable=False)
+    answer = db.Column(db.JSON)
+    seq = db.Column(db.BigInteger, default=0)  # Client sequence number of the save
+
+    __table_args__ = (db.Index('ix_exam_autosaves_exam_seq', 'exam_id', 'seq'),)
+
+class GradebookEntry(BaseModel):
+    __tablename__ = 'gradebook_entries'
+
+    # Materialized best/latest result of a student on an assessment, kept in
+    # step with exams by app.services.gradebook
+    course_id = db.Column(db.String(36), db.ForeignKey('courses.id'), nullable=False)
+    assessment_id = db.Column(db.String(36), db.ForeignKey('assessments.id'), nullable=False)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+
+    attempts = db.Column(db.Integer, default=0)
+    best_percentage = db.Column(db.Numeric(5, 2))
+    latest_percentage = db.Column(db.Numeric(5, 2))
+    latest_exam_id = db.Column(db.String(36), db.ForeignKey('exams.id'))
+    latest_status = db.Column(db.String(20))
+    last_submitted_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('assessment_id', 'user_id', name='uq_gradebook_assessment_user'),
+        db.Index('ix_gradebook_course_user', 'course_id', 'user_id'),
+    )
+
+@db.event.listens_for(Question, 'after_insert')
+@db.event.listens_for(Question, 'after_update')
+@db.event.listens_for(Question, 'after_delete')
+def _record_question_change(mapper, connection, question):
+    Assessment.bump_questions_version(question.assessment_id, connection)
+    session = object_session(question)
+    if session is not None:
+        session.info.setdefault('changed_assessment_ids', set()).add(question.assessment_id)
+
+@db.event.listens_for(Session, 'after_commit')
+def _notify_question_changes(session):
+    for assessment_id in session.info.pop('changed_assessment_ids', ()):
+        for handler in _question_change_handlers:
+            handler(assessment_id)
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_question_changes(session):
+    session.info.pop('changed_assessment_ids', None)
@@ -1,6 +1,15 @@
 from app.models import db, Assessment, Question, Exam, Response
+from app.models.assessment import GradingJob, ExamAutosave
+from app.services.autosave import save_answers, load_saved_responses
+from app.services.grading import get_answer_key, grade_responses, invalidate_answer_key
+from app.services.grading_queue import enqueue_responses, refresh_exam_scores
+from app.services.exam_paper import invalidate_exam_paper
+from app.services.gradebook import update_gradebook
+from app.utils.validators import Validators
+import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from flask import current_app
 
 class AssessmentService:
     @staticmethod
@@ -26,6 +35,9 @@ class AssessmentService:
     @staticmethod
     def add_question(assessment_id, question_type, content, marks, **kwargs):
         """Add a question to an assessment"""
+        errors = Validators.validate_question(question_type, content, marks)
+        if errors:
+            raise ValueError('; '.join(errors))
 
         # Get the highest order index
         max_order = db.session.query(db.func.max(Question.order_index)).filter_by(
@@ -66,11 +78,18 @@ class AssessmentService:
         if not assessment:
             raise ValueError("Assessment not found")
 
+        started_at = datetime.utcnow()
+        settings = assessment.settings or {}
+        expires_at = None
+        if settings.get('timed'):
+            expires_at = started_at + timedelta(minutes=settings.get('duration_minutes') or 60)
+
         exam = Exam(
             id=str(uuid.uuid4()),
             assessment_id=assessment_id,
             user_id=user_id,
-            started_at=datetime.utcnow(),
+            started_at=started_at,
+            expires_at=expires_at,
             total_marks=assessment.total_marks
         )
 
@@ -80,55 +99,113 @@ class AssessmentService:
         return exam
 
     @staticmethod
-    def submit_exam(exam_id, responses):
-        """Submit exam responses and calculate score"""
-
-        exam = Exam.query.get(exam_id)
+    def autosave_exam(exam_id, responses, seq=None):
+        """Save in-progress answers of an exam; returns the number accepted.
+
+        Answers are written straight to the autosave log, so any worker (and
+        the expiry sweeper) finalizing the exam sees them. Only answers to
+        questions of the exam's assessment are kept.
+        """
+        if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool)):
+            raise ValueError("seq must be an integer")
+
+        # Shared row lock: a concurrent submit (FOR UPDATE) waits for this
+        # save, and a save after finalization sees the new status
+        exam = Exam.query.filter_by(id=exam_id).with_for_update(read=True).populate_existing().first()
         if not exam:
             raise ValueError("Exam not found")
+        if exam.status != 'in_progress':
+            raise ValueError("Exam is not in progress")
+        if exam.expires_at and exam.expires_at < datetime.utcnow():
+            raise ValueError("Exam time is over")
 
-        total_marks_obtained = 0
-
-        # Save each response
+        key = get_answer_key(exam.assessment_id)
+        answers = {}
         for response_data in responses:
-            question_id = response_data.get('question_id')
-            answer = response_data.get('answer')
-
-            if not question_id:
-                continue
-
-            question = Question.query.get(question_id)
-            if not question:
-                continue
-
-            # Calculate marks (simplified - in real app, you'd have proper grading logic)
-            marks_awarded = 0
-            if question.type == 'mcq' and answer == question.content.get('correct_answer'):
-                marks_awarded = question.marks
-            elif question.type == 'tf' and answer == question.content.get('correct_answer'):
-                marks_awarded = question.marks
-            else:
-                # For subjective questions, full marks for now (would be graded by instructor)
-                marks_awarded = question.marks
-
-            total_marks_obtained += marks_awarded
-
-            response = Response(
-                id=str(uuid.uuid4()),
-                question_id=question_id,
-                user_id=exam.user_id,
-                exam_id=exam_id,
-                answer=answer,
-                marks_awarded=marks_awarded
-            )
-
-            db.session.add(response)
-
-        # Update exam results
+            if isinstance(response_data, dict) and response_data.get('question_id') in key:
+                answers[response_data['question_id']] = response_data.get('answer')
+
+        accepted = save_answers(exam_id, answers, seq)
+        db.session.commit()
+        return accepted
+
+    @staticmethod
+    def submit_exam(exam_id, responses=None, expired=False):
+        """Submit exam responses and calculate score.
+
+        Answers autosaved for the exam are used for every question the
+        submission itself does not include. With expired=True (used by the
+        expiry sweeper) an exam without any saved answer is marked expired.
+        A submission arriving after expires_at plus EXAM_SWEEP_GRACE_SECONDS
+        is finalized the same way: its own answers are dropped and only the
+        ones saved in time count.
+        """
+
+        # Row lock so a student submit and the expiry sweeper cannot both finalize
+        exam = Exam.query.filter_by(id=exam_id).with_for_update().populate_existing().first()
+        if not exam:
+            raise ValueError("Exam not found")
+        if exam.status != 'in_progress':
+            raise ValueError("Exam has already been submitted")
+
+        grace = timedelta(seconds=current_app.config.get('EXAM_SWEEP_GRACE_SECONDS', 60))
+        late = bool(exam.expires_at and datetime.utcnow() > exam.expires_at + grace)
+        if late:
+            responses = None
+            expired = True
+
+        # Final answers override autosaved ones
+        submitted = {r.get('question_id'): r for r in responses or [] if r.get('question_id')}
+        responses = [
+            saved for saved in load_saved_responses(exam_id)
+            if saved['question_id'] not in submitted
+        ] + list(submitted.values())
+
+        # Grade against the cached, compiled answer key of the assessment
+        key = get_answer_key(exam.assessment_id)
+        graded, total_marks_obtained = grade_responses(key, responses)
+
+        now = datetime.utcnow()
+        response_rows = []
+        pending = []
+        for question_id, answer, marks_awarded, question_type in graded:
+            response_id = str(uuid.uuid4())
+            response_rows.append({
+                'id': response_id,
+                'question_id': question_id,
+                'user_id': exam.user_id,
+                'exam_id': exam_id,
+                'answer': answer,
+                'marks_awarded': marks_awarded,
+                'submitted_at': now,
+                'created_at': now,
+                'updated_at': now
+            })
+            if marks_awarded is None:
+                pending.append({'id': response_id, 'question_type': question_type})
+
+        # Write all responses with a single executemany insert
+        if response_rows:
+            db.session.execute(db.insert(Response), response_rows)
+
+        # Subjective and code answers are graded in the background
+        enqueue_responses(exam_id, pending)
+
+        # Update exam results with the objective marks; the grading queue
+        # adds the rest and marks the exam graded when nothing is pending
         exam.marks_obtained = total_marks_obtained
         exam.percentage = (total_marks_obtained / exam.total_marks) * 100 if exam.total_marks else 0
-        exam.status = 'submitted'
-        exam.submitted_at = datetime.utcnow()
+        if expired and not response_rows:
+            exam.status = 'expired'
+        else:
+            exam.status = 'submitted' if pending else 'graded'
+        exam.submitted_at = now
+
+        db.session.flush()
+        update_gradebook([exam_id])
+
+        # The autosave log is only needed until the exam is finalized
+        ExamAutosave.query.filter_by(exam_id=exam_id).delete(synchronize_session=False)
 
         db.session.commit()
 
@@ -137,7 +214,9 @@ class AssessmentService:
             'total_marks': exam.total_marks,
             'marks_obtained': exam.marks_obtained,
             'percentage': float(exam.percentage) if exam.percentage else 0,
-            'status': exam.status
+            'status': exam.status,
+            'pending_grading': len(pending),
+            'late': late
         }
 
     @staticmethod
@@ -148,24 +227,153 @@ class AssessmentService:
         if not exam:
             raise ValueError("Exam not found")
 
-        total_marks_obtained = 0
+        graded_marks = {
+            graded_data.get('response_id'): graded_data
+            for graded_data in graded_responses
+            if graded_data.get('response_id')
+        }
 
-        for graded_data in graded_responses:
-            response_id = graded_data.get('response_id')
-            marks = graded_data.get('marks')
-            feedback = graded_data.get('feedback')
+        responses = Response.query.filter(
+            Response.exam_id == exam_id,
+            Response.id.in_(list(graded_marks))
+        ).all()
 
-            response = Response.query.get(response_id)
-            if response and response.exam_id == exam_id:
-                response.marks_awarded = marks
-                response.feedback = feedback
-                total_marks_obtained += marks
+        for response in responses:
+            graded_data = graded_marks[response.id]
+            response.marks_awarded = graded_data.get('marks')
+            response.feedback = graded_data.get('feedback')
 
-        # Update exam results
-        exam.marks_obtained = total_marks_obtained
-        exam.percentage = (total_marks_obtained / exam.total_marks) * 100 if exam.total_marks else 0
-        exam.status = 'graded'
+        # Close the queued or manual grading jobs of these responses
+        if responses:
+            GradingJob.query.filter(
+                GradingJob.response_id.in_([response.id for response in responses])
+            ).update({'status': 'done', 'error': None}, synchronize_session=False)
+
+        # Recompute exam totals from all responses, objective ones included
+        db.session.flush()
+        refresh_exam_scores([exam_id])
 
         db.session.commit()
 
         return exam
+
+    @staticmethod
+    def iter_import_questions(assessment_id, records, chunk_size=500):
+        """Validate and bulk insert questions, yielding progress after each chunk.
+
+        records is an iterable of dicts (parsed JSON Lines or CSV rows). Invalid
+        rows are skipped and reported; valid rows are inserted in chunks inside
+        one transaction that is committed at the end.
+        """
+        assessment = Assessment.query.get(assessment_id)
+        if not assessment:
+            raise ValueError("Assessment not found")
+
+        # One MAX query, then order indexes are assigned in memory
+        next_order = (db.session.query(db.func.max(Question.order_index)).filter_by(
+            assessment_id=assessment_id
+        ).scalar() or 0) + 1
+
+        processed = 0
+        imported = 0
+        errors = []
+        chunk = []
+
+        def flush(chunk):
+            if chunk:
+                db.session.execute(db.insert(Question), chunk)
+            return len(chunk)
+
+        try:
+            for line_number, record in enumerate(records, start=1):
+                processed += 1
+                try:
+                    question_type, content, marks = AssessmentService.parse_question_record(record)
+                except ValueError as e:
+                    errors.append({'line': line_number, 'errors': [str(e)]})
+                    continue
+
+                record_errors = Validators.validate_question(question_type, content, marks)
+                if record_errors:
+                    errors.append({'line': line_number, 'errors': record_errors})
+                    continue
+
+                now = datetime.utcnow()
+                chunk.append({
+                    'id': str(uuid.uuid4()),
+                    'assessment_id': assessment_id,
+                    'type': question_type,
+                    'content': content,
+                    'marks': marks,
+                    'explanation': record.get('explanation') or None,
+                    'order_index': next_order,
+                    'question_metadata': record.get('question_metadata') or {},
+                    'created_at': now,
+                    'updated_at': now
+                })
+                next_order += 1
+
+                if len(chunk) >= chunk_size:
+                    imported += flush(chunk)
+                    chunk = []
+                    yield {'processed': processed, 'imported': imported, 'failed': len(errors)}
+
+            imported += flush(chunk)
+            if imported:
+                # Bulk inserts bypass ORM events: bump the version ourselves
+                Assessment.bump_questions_version(assessment_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # ...and drop this process's cached key and paper right away
+        invalidate_answer_key(assessment_id)
+        invalidate_exam_paper(assessment_id)
+
+        yield {
+            'processed': processed,
+            'imported': imported,
+            'failed': len(errors),
+            'errors': errors,
+            'done': True
+        }
+
+    @staticmethod
+    def import_questions(assessment_id, records, chunk_size=500):
+        """Bulk import questions and return the final summary"""
+        summary = None
+        for summary in AssessmentService.iter_import_questions(assessment_id, records, chunk_size):
+            pass
+        return summary
+
+    @staticmethod
+    def parse_question_record(record):
+        """Normalize a JSON Lines or CSV record into (type, content, marks)"""
+        if record.get('parse_error'):
+            raise ValueError(record['parse_error'])
+
+        question_type = (record.get('type') or '').strip().lower()
+
+        content = record.get('content')
+        if isinstance(content, str):
+            content = json.loads(content) if content.strip() else None
+        if content is None:
+            # Flat CSV columns: prompt, options (| separated), correct_answer, test_cases (JSON)
+            content = {'prompt': record.get('prompt')}
+            if record.get('options'):
+                options = record['options']
+                content['options'] = options.split('|') if isinstance(options, str) else options
+            if record.get('correct_answer') not in (None, ''):
+                content['correct_answer'] = record['correct_answer']
+            if record.get('test_cases'):
+                test_cases = record['test_cases']
+                content['test_cases'] = json.loads(test_cases) if isinstance(test_cases, str) else test_cases
+
+        marks = record.get('marks', 1)
+        try:
+            marks = int(marks) if marks not in (None, '') else 1
+        except (TypeError, ValueError):
+            raise ValueError("Marks must be a positive integer")
+
+        return question_type, content, marks
@@ -1,7 +1,14 @@
-from flask import Blueprint, request, jsonify, g
-from app.models import db, Assessment, Question, Response, Exam, Course
+from flask import Blueprint, request, jsonify, g, current_app, Response as FlaskResponse, stream_with_context
+from flask_login import current_user
+from app.models import db, Assessment, Question, Response, Exam, Course, Enrollment
 from app.services.assessment_service import AssessmentService
-from app.utils.decorators import tenant_required, login_required, instructor_required
+from app.services.exam_paper import get_exam_paper, render_questions
+from app.services.analytics import get_assessment_analytics
+from app.utils.helpers import JSONEncoder
+from app.utils.decorators import tenant_required, login_required, instructor_required, feature_required
+import csv
+import io
+import json
 
 assessments_bp = Blueprint('assessments', __name__)
 
@@ -65,6 +72,23 @@ def get_assessment(assessment_id):
         'questions': [question.to_dict() for question in assessment.questions] if current_user.role != 'student' else None
     })
 
+@assessments_bp.route('/<assessment_id>/analytics', methods=['GET'])
+@tenant_required
+@instructor_required
+@feature_required('advanced_analytics')
+def get_analytics(assessment_id):
+    """Get item statistics and score distribution of an assessment"""
+    assessment = Assessment.query.join(Course).filter(
+        Assessment.id == assessment_id,
+        Course.tenant_id == g.tenant_id
+    ).first_or_404()
+
+    # Verify instructor owns the course
+    if current_user.role == 'instructor' and assessment.course.instructor_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    return jsonify({'analytics': get_assessment_analytics(assessment_id)})
+
 @assessments_bp.route('/<assessment_id>/questions', methods=['POST'])
 @tenant_required
 @instructor_required
@@ -85,7 +109,7 @@ def add_question(assessment_id):
     try:
         question = AssessmentService.add_question(
             assessment_id=assessment_id,
-            type=data['type'],
+            question_type=data['type'],
             content=data['content'],
             marks=data['marks'],
             explanation=data.get('explanation'),
@@ -100,6 +124,71 @@ def add_question(assessment_id):
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@assessments_bp.route('/<assessment_id>/questions/import', methods=['POST'])
+@tenant_required
+@instructor_required
+def import_questions(assessment_id):
+    """Bulk import questions from JSON Lines or CSV (body or 'file' upload)"""
+    assessment = Assessment.query.join(Course).filter(
+        Assessment.id == assessment_id,
+        Course.tenant_id == g.tenant_id
+    ).first_or_404()
+
+    # Verify instructor owns the course
+    if current_user.role == 'instructor' and assessment.course.instructor_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    filename = upload.filename if upload else ''
+
+    fmt = request.args.get('format')
+    if not fmt:
+        is_csv = filename.lower().endswith('.csv') or (request.mimetype or '').endswith('csv')
+        fmt = 'csv' if is_csv else 'jsonl'
+    if fmt not in ['csv', 'jsonl']:
+        return jsonify({'error': 'Format must be csv or jsonl'}), 400
+
+    records = iter_question_records(io.TextIOWrapper(stream, encoding='utf-8'), fmt)
+    chunk_size = min(request.args.get('chunk_size', 500, type=int), 5000)
+
+    # ?progress=1 streams one JSON line per inserted chunk, then the summary
+    if request.args.get('progress'):
+        def generate():
+            try:
+                for progress in AssessmentService.iter_import_questions(assessment_id, records, chunk_size):
+                    yield json.dumps(progress) + '\n'
+            except ValueError as e:
+                yield json.dumps({'error': str(e), 'done': True}) + '\n'
+
+        return FlaskResponse(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    try:
+        summary = AssessmentService.import_questions(assessment_id, records, chunk_size)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'message': f"Imported {summary['imported']} questions",
+        'summary': summary
+    }), 201 if summary['imported'] else 400
+
+def iter_question_records(text_stream, fmt):
+    """Yield question dicts from a JSON Lines or CSV text stream"""
+    if fmt == 'csv':
+        yield from csv.DictReader(text_stream)
+        return
+
+    for line in text_stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else {'parse_error': 'Line is not a JSON object'}
+
 @assessments_bp.route('/<assessment_id>/start', methods=['POST'])
 @tenant_required
 @login_required
@@ -120,26 +209,62 @@ def start_assessment(assessment_id):
             user_id=current_user.id
         )
 
-        return jsonify({
-            'message': 'Assessment started',
-            'exam': exam.to_dict(),
-            'questions': [{
-                'id': q.id,
-                'type': q.type,
-                'content': q.content,
-                'marks': q.marks,
-                'order_index': q.order_index
-            } for q in assessment.questions.order_by(Question.order_index)]
-        })
+        # Questions come from the cached, answer-stripped paper (no per-student query)
+        paper = get_exam_paper(assessment_id)
+        questions = render_paper_questions(assessment, paper, exam)
+
+        body = (
+            '{"message":"Assessment started","exam":'
+            + json.dumps(exam.to_dict(), cls=JSONEncoder, separators=(',', ':'))
+            + ',"paper_etag":' + json.dumps(paper_etag(assessment, paper, exam))
+            + ',"questions":' + questions + '}'
+        )
+        return current_app.response_class(body, mimetype='application/json')
 
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
-@assessments_bp.route('/exams/<exam_id>/submit', methods=['POST'])
+@assessments_bp.route('/exams/<exam_id>/paper', methods=['GET'])
 @tenant_required
 @login_required
-def submit_exam(exam_id):
-    """Submit exam responses"""
+def get_exam_paper_questions(exam_id):
+    """Get the student-facing questions of an exam, with ETag revalidation"""
+    exam = Exam.query.filter_by(id=exam_id).first_or_404()
+
+    # Check ownership
+    if exam.user_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    assessment = exam.assessment
+    paper = get_exam_paper(assessment.id)
+    etag = paper_etag(assessment, paper, exam)
+
+    if etag in request.if_none_match:
+        return current_app.response_class(status=304, headers={'ETag': f'"{etag}"'})
+
+    response = current_app.response_class(
+        '{"questions":' + render_paper_questions(assessment, paper, exam) + '}',
+        mimetype='application/json'
+    )
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def render_paper_questions(assessment, paper, exam):
+    """Questions JSON for one student, shuffled per exam when enabled"""
+    shuffle = (assessment.settings or {}).get('shuffle_questions')
+    return render_questions(paper, shuffle_seed=exam.id if shuffle else None)
+
+def paper_etag(assessment, paper, exam):
+    if (assessment.settings or {}).get('shuffle_questions'):
+        return f"{paper.etag}-{exam.id}"
+    return paper.etag
+
+@assessments_bp.route('/exams/<exam_id>/autosave', methods=['PUT'])
+@tenant_required
+@login_required
+def autosave_exam(exam_id):
+    """Save changed answers of an in-progress exam"""
     exam = Exam.query.filter_by(id=exam_id).first_or_404()
 
     # Check ownership
@@ -148,17 +273,44 @@ def submit_exam(exam_id):
 
     data = request.get_json()
 
-    if not data or not data.get('responses'):
+    if not data or not isinstance(data.get('responses'), list):
         return jsonify({'error': 'Responses required'}), 400
 
     try:
+        saved = AssessmentService.autosave_exam(
+            exam_id=exam_id,
+            responses=data['responses'],  # [{question_id, answer}] changed since last save
+            seq=data.get('seq')
+        )
+
+        return jsonify({'saved': saved})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@assessments_bp.route('/exams/<exam_id>/submit', methods=['POST'])
+@tenant_required
+@login_required
+def submit_exam(exam_id):
+    """Submit exam responses"""
+    exam = Exam.query.filter_by(id=exam_id).first_or_404()
+
+    # Check ownership
+    if exam.user_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    data = request.get_json(silent=True) or {}
+
+    try:
+        # Responses are optional when answers were autosaved
         result = AssessmentService.submit_exam(
             exam_id=exam_id,
-            responses=data['responses']  # [{question_id, answer}]
+            responses=data.get('responses', [])  # [{question_id, answer}]
         )
 
         return jsonify({
-            'message': 'Exam submitted successfully',
+            'message': 'Time was over: only answers saved before the deadline were graded'
+            if result['late'] else 'Exam submitted successfully',
             'result': result
         })
 
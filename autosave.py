@@ -0,0 +1,39 @@
+import time
+import uuid
+from datetime import datetime
+from app.extensions import db
+from app.models.assessment import ExamAutosave
+
+def save_answers(exam_id, answers, seq=None):
+    """Append answers ({question_id: answer}) to the autosave log in the caller's transaction.
+
+    All answers of one save go in a single executemany insert; the log is
+    coalesced on read, where the highest seq per question wins.
+    """
+    if not answers:
+        return 0
+
+    seq = seq if seq is not None else time.time_ns() // 1000
+    now = datetime.utcnow()
+    db.session.execute(db.insert(ExamAutosave), [{
+        'id': str(uuid.uuid4()),
+        'exam_id': exam_id,
+        'question_id': question_id,
+        'answer': answer,
+        'seq': seq,
+        'created_at': now,
+        'updated_at': now
+    } for question_id, answer in answers.items()])
+    return len(answers)
+
+def load_saved_responses(exam_id):
+    """Return the latest saved answer per question as [{question_id, answer}]"""
+    latest = {}
+    rows = db.session.query(
+        ExamAutosave.question_id, ExamAutosave.answer
+    ).filter(ExamAutosave.exam_id == exam_id).order_by(ExamAutosave.seq, ExamAutosave.created_at)
+
+    for question_id, answer in rows:
+        latest[question_id] = answer
+
+    return [{'question_id': question_id, 'answer': answer} for question_id, answer in latest.items()]
@@ -0,0 +1,44 @@
+import atexit
+import threading
+from app.extensions import db
+
+class BufferFlusher:
+    """Background thread that flushes this process's write buffers.
+
+    Every interval each buffer's flush_if_due() runs, so an idle worker does
+    not sit on buffered writes; at interpreter exit everything still pending
+    is flushed. Buffers write on their own connection (db.engine.begin()),
+    never on a request's session.
+    """
+
+    def __init__(self, app, buffers, interval=None):
+        self.app = app
+        self.buffers = list(buffers)
+        self.interval = interval or app.config.get('WRITE_BUFFER_FLUSH_INTERVAL_SECONDS', 1)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self, force=False):
+        with self.app.app_context():
+            for buffer in self.buffers:
+                try:
+                    buffer.flush() if force else buffer.flush_if_due()
+                except Exception:
+                    self.app.logger.exception("Flushing %s failed", type(buffer).__name__)
+            db.session.remove()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='buffer-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.flush(force=True)
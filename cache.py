@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+class TTLCache:
+    """Process-local LRU cache whose entries expire after a TTL.
+
+    Sized and timed from <config_prefix>_TTL_SECONDS, _NEGATIVE_TTL_SECONDS
+    (for None values) and _MAX_ENTRIES. Cached values should be immutable or
+    plain snapshots so they can be shared across requests and sessions.
+    """
+
+    def __init__(self, app=None, config_prefix='CACHE'):
+        self.config_prefix = config_prefix
+        self.ttl = 60
+        self.negative_ttl = 10
+        self.max_entries = 1024
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reset_counters()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        prefix = self.config_prefix
+        self.ttl = app.config.get(f'{prefix}_TTL_SECONDS', self.ttl)
+        self.negative_ttl = app.config.get(f'{prefix}_NEGATIVE_TTL_SECONDS', self.negative_ttl)
+        self.max_entries = app.config.get(f'{prefix}_MAX_ENTRIES', self.max_entries)
+        self.clear()
+
+    def _reset_counters(self):
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or MISSING if absent or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Cache a value, or None to remember a negative lookup"""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose (non-None) value matches predicate"""
+        with self._lock:
+            stale = [
+                key for key, (value, _) in self._entries.items()
+                if value is not None and predicate(value)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': ((self.hits + self.negative_hits) / lookups * 100) if lookups else 0,
+            }
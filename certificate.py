@@ -2,6 +2,7 @@ from app.extensions import db
 from app.models.base import BaseModel
 from datetime import datetime
 import hashlib
+from app.utils.number_allocator import number_allocator
 
 class Certificate(BaseModel):
     __tablename__ = 'certificates'
@@ -40,9 +41,19 @@ class Certificate(BaseModel):
         self.verification_hash = hashlib.sha256(base_string.encode()).hexdigest()
 
     def generate_cert_number(self):
-        """Generate unique certificate number"""
-        timestamp = int(datetime.utcnow().timestamp())
-        self.cert_number = f"CERT-{timestamp}-{self.id[:8].upper()}"
+        """Take the next certificate number of the enrollment's tenant"""
+        self.cert_number = number_allocator.next_number(Certificate.tenant_id_for(self.enrollment_id), 'certificate')
+
+    @staticmethod
+    def tenant_id_for(enrollment_id):
+        from app.models.course import Course
+        from app.models.enrollment import Enrollment
+        tenant_id = db.session.query(Course.tenant_id).join(
+            Enrollment, Enrollment.course_id == Course.id
+        ).filter(Enrollment.id == enrollment_id).scalar()
+        if not tenant_id:
+            raise ValueError("Enrollment not found")
+        return tenant_id
 
     def to_dict(self):
         data = super().to_dict()
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import math
+import os
+import select
+import selectors
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.utils.cache import TTLCache, MISSING
+from app.utils.validators import Validators
+
+# Language -> (config key of the interpreter, interpreter arguments)
+SUPPORTED_LANGUAGES = {
+    'python': ('CODE_RUN_PYTHON', ['-I', '-S']),
+}
+
+# Exit status of the launcher when the sandbox itself could not be set up
+_SANDBOX_FAILED = 97
+
+# Needs no privileges: moves into new user, mount, UTS, IPC, network and PID
+# namespaces, in which it may mount. It hides the configured paths behind
+# empty read-only tmpfs mounts, makes the work directory read-only, then forks
+# the solution as PID 1 of the new namespace. The solution runs as an
+# unmapped-to-root user of the namespace, so exec leaves it no capabilities;
+# it gets its resource limits, is killed with the launcher, and when it exits
+# the kernel kills everything else it started. Done in a launcher instead of
+# preexec_fn, which is unsafe in threaded servers.
+_LAUNCHER = """
+import ctypes, os, resource, select, signal, sys
+cpu, memory, nproc = (int(value) for value in sys.argv[1:4])
+hidden = [path for path in sys.argv[4].split(os.pathsep) if path]
+root, workdir, argv = sys.argv[5], sys.argv[6], sys.argv[7:]
+libc = ctypes.CDLL(None, use_errno=True)
+uid, gid = os.geteuid(), os.getegid()
+
+def fail(step, errno=None):
+    sys.stderr.write('code-sandbox: {} failed (errno {})\\n'.format(step, errno or ctypes.get_errno()))
+    sys.exit(%d)
+
+def mount(source, target, fstype, flags, data=None):
+    if libc.mount(source, target.encode(), fstype, flags, data) != 0:
+        fail('mounting ' + target)
+
+# CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWUTS | CLONE_NEWIPC | CLONE_NEWPID | CLONE_NEWNET
+if libc.unshare(0x10000000 | 0x00020000 | 0x04000000 | 0x08000000 | 0x20000000 | 0x40000000) != 0:
+    fail('unshare')
+# The only id of the namespace: its nobody, which is the launcher's account outside
+try:
+    for path, value in (('setgroups', 'deny'), ('uid_map', '65534 %%d 1' %% uid), ('gid_map', '65534 %%d 1' %% gid)):
+        with open('/proc/self/' + path, 'w') as f:
+            f.write(value)
+except OSError as e:
+    fail('mapping ids', e.errno)
+# MS_REC | MS_PRIVATE: mounts below do not leak back to the host
+mount(None, '/', None, 0x4000 | 0x40000)
+for path in hidden:
+    # MS_RDONLY | MS_NOSUID | MS_NODEV
+    if os.path.isdir(path):
+        mount(b'tmpfs', path, b'tmpfs', 0x1 | 0x2 | 0x4, b'size=4k,mode=0755')
+# Read-only bind of the work directory (MS_BIND, then MS_REMOUNT | MS_RDONLY);
+# the flags it already has are kept since a namespace may not clear them
+outer_workdir = root.rstrip('/') + workdir if root != '-' else workdir
+mount(outer_workdir.encode(), outer_workdir, None, 0x1000)
+flags = os.statvfs(outer_workdir).f_flag
+locked = (flags & (0x2 | 0x4 | 0x8 | 0x400 | 0x800)) | (0x200000 if flags & 0x1000 else 0)
+mount(None, outer_workdir, None, 0x1000 | 0x20 | 0x1 | locked)
+if root != '-':
+    os.chroot(root)
+# The child watches this pipe: EOF means the launcher is already gone
+alive_read, alive_write = os.pipe()
+
+pid = os.fork()
+if pid:
+    _, status = os.waitpid(pid, 0)
+    code = os.waitstatus_to_exitcode(status)
+    sys.exit(code if code >= 0 else 128 - code)
+
+os.close(alive_write)
+# PR_SET_NO_NEW_PRIVS, PR_SET_PDEATHSIG
+libc.prctl(38, 1, 0, 0, 0)
+libc.prctl(1, signal.SIGKILL)
+if select.select([alive_read], [], [], 0)[0]:
+    os._exit(1)
+os.close(alive_read)
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_FSIZE, (1024 * 1024, 1024 * 1024))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+resource.setrlimit(resource.RLIMIT_NPROC, (nproc, nproc))
+os.chdir(workdir)
+os.execv(argv[0], argv)
+""" % _SANDBOX_FAILED
+
+result_cache = TTLCache(config_prefix='CODE_RESULT_CACHE')
+
+def _bounded(value, default, maximum):
+    """Coerce a per-question limit to a positive number no larger than maximum"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    if not value > 0:
+        return default
+    return min(value, maximum)
+
+def _limits_for(content):
+    config = current_app.config
+    time_limit = config.get('CODE_RUN_TIME_LIMIT_SECONDS', 5)
+    memory_limit = config.get('CODE_RUN_MEMORY_LIMIT_MB', 256)
+    return {
+        'time_limit': _bounded(content.get('time_limit_seconds'), time_limit, time_limit),
+        'memory_limit_mb': int(_bounded(content.get('memory_limit_mb'), memory_limit, memory_limit)),
+        'output_limit': config.get('CODE_RUN_OUTPUT_LIMIT_BYTES', 64 * 1024),
+    }
+
+def _sandbox_settings():
+    """Sandbox filesystem and process settings for run_test_suite"""
+    config = current_app.config
+
+    # The application tree (config, .env, instance folder) is never visible
+    hidden = list(config.get('CODE_RUN_HIDDEN_PATHS', []))
+    hidden += [os.path.dirname(current_app.root_path), current_app.instance_path]
+    return {
+        'max_processes': config.get('CODE_RUN_MAX_PROCESSES', 16),
+        'hidden_paths': hidden,
+        'chroot': config.get('CODE_RUN_CHROOT'),
+        'interpreters': {
+            language: config.get(config_key) for language, (config_key, _) in SUPPORTED_LANGUAGES.items()
+        },
+    }
+
+def _kill_session(process):
+    """SIGKILL the launcher's whole process group (it is a session leader)"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def _communicate(process, stdin_data, timeout, limit):
+    """Feed stdin and read stdout/stderr as they arrive, keeping at most limit bytes of each.
+
+    Returns (stdout, stderr, error); error is 'Time limit exceeded' or
+    'Output limit exceeded' when the process group had to be killed.
+    """
+    deadline = time.monotonic() + timeout
+    output = {process.stdout: bytearray(), process.stderr: bytearray()}
+    pending = memoryview(stdin_data)
+    error = None
+
+    with selectors.DefaultSelector() as selector:
+        for stream in output:
+            selector.register(stream, selectors.EVENT_READ)
+        if pending:
+            selector.register(process.stdin, selectors.EVENT_WRITE)
+        else:
+            process.stdin.close()
+
+        while selector.get_map() and not error:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                error = 'Time limit exceeded'
+                break
+            for key, _ in selector.select(remaining):
+                if key.fileobj is process.stdin:
+                    try:
+                        pending = pending[os.write(key.fd, pending[:select.PIPE_BUF]):]
+                    except BrokenPipeError:
+                        pending = pending[:0]
+                    if not pending:
+                        selector.unregister(process.stdin)
+                        process.stdin.close()
+                    continue
+
+                chunk = os.read(key.fd, 64 * 1024)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                output[key.fileobj] += chunk
+                if len(output[key.fileobj]) > limit:
+                    error = 'Output limit exceeded'
+                    break
+
+    if not error:
+        try:
+            process.wait(timeout=max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            error = 'Time limit exceeded'
+    if error:
+        _kill_session(process)
+    for stream in (process.stdin, process.stdout, process.stderr):
+        stream.close()
+    process.wait()
+
+    return (
+        bytes(output[process.stdout][:limit]).decode('utf-8', 'replace'),
+        bytes(output[process.stderr][:limit]).decode('utf-8', 'replace'),
+        error
+    )
+
+def run_test_suite(language, code, test_cases, limits, sandbox):
+    """Run code against every test case in a fresh, isolated and limited process"""
+    cpu = math.ceil(limits['time_limit']) + 1
+    memory = limits['memory_limit_mb'] * 1024 * 1024
+    root = sandbox['chroot']
+    results = []
+
+    # Inside a chroot the work directory must live under the new root
+    with tempfile.TemporaryDirectory(prefix='code-run-', dir=os.path.join(root, 'tmp') if root else None) as workdir:
+        os.chmod(workdir, 0o755)
+        source_path = os.path.join(workdir, 'solution.py')
+        with open(source_path, 'w') as f:
+            f.write(code)
+        os.chmod(source_path, 0o644)
+
+        sandbox_workdir = workdir[len(root.rstrip('/')):] if root else workdir
+        interpreter_args = SUPPORTED_LANGUAGES[language][1]
+        command = [
+            sys.executable, '-I', '-S', '-c', _LAUNCHER,
+            str(cpu), str(memory), str(sandbox['max_processes']),
+            os.pathsep.join(sandbox['hidden_paths']), root or '-', sandbox_workdir,
+            sandbox['interpreters'][language], *interpreter_args, os.path.join(sandbox_workdir, 'solution.py')
+        ]
+
+        for test_case in test_cases:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=workdir,
+                env={'PATH': '/usr/bin:/bin', 'PYTHONHASHSEED': '0'},
+                start_new_session=True
+            )
+            stdout, stderr, error = _communicate(
+                process, str(test_case.get('input', '')).encode(), limits['time_limit'], limits['output_limit']
+            )
+            if error:
+                results.append({'passed': False, 'error': error})
+                continue
+
+            if process.returncode == _SANDBOX_FAILED and stderr.startswith('code-sandbox:'):
+                raise RuntimeError(f"Code sandbox unavailable: {stderr.strip()}")
+
+            expected = str(test_case.get('expected_output', ''))
+            passed = process.returncode == 0 and stdout.strip() == expected.strip()
+            results.append({
+                'passed': passed,
+                'error': stderr[-1000:] if process.returncode else None
+            })
+
+    return results
+
+def score_results(marks, test_cases, results):
+    """Award marks in proportion to the weight of the passing test cases.
+
+    Test cases with an invalid weight (stored before weights were validated)
+    count for nothing instead of failing the whole grading batch.
+    """
+    weights = [Validators.code_test_weight(test_case) or 0 for test_case in test_cases]
+    total_weight = sum(weights)
+    if not total_weight:
+        return 0
+    passed_weight = sum(
+        weight for weight, result in zip(weights, results) if result['passed']
+    )
+    return int(marks * passed_weight / total_weight)
+
+def _run_key(language, code, test_cases, limits):
+    payload = json.dumps([language, code, test_cases, limits], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def grade_code_batch(items):
+    """Grade [(question, response), ...] code answers concurrently.
+
+    Returns marks per item in order, or None for answers that cannot be run
+    automatically (unsupported language or no test cases).
+    """
+    marks = [None] * len(items)
+    runs = {}
+
+    for index, (question, response) in enumerate(items):
+        content = (question.content if question else None) or {}
+        language = content.get('language', 'python')
+        test_cases = content.get('test_cases') or []
+        code = response.answer if isinstance(response.answer, str) else (response.answer or {}).get('code')
+
+        if language not in SUPPORTED_LANGUAGES or not test_cases:
+            continue
+        if not code:
+            marks[index] = 0
+            continue
+
+        limits = _limits_for(content)
+        key = _run_key(language, code, test_cases, limits)
+        cached = result_cache.get(key)
+        if cached is not MISSING:
+            marks[index] = score_results(question.marks, test_cases, cached)
+            continue
+
+        # Identical answers to the same suite are run once per batch
+        runs.setdefault(key, (language, code, test_cases, limits, []))[4].append(index)
+
+    if runs:
+        sandbox = _sandbox_settings()
+        workers = current_app.config.get('CODE_RUN_WORKERS', os.cpu_count() or 2)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='code-run') as executor:
+            futures = {
+                key: executor.submit(run_test_suite, language, code, test_cases, limits, sandbox)
+                for key, (language, code, test_cases, limits, _) in runs.items()
+            }
+            for key, future in futures.items():
+                results = future.result()
+                result_cache.set(key, results)
+                for index in runs[key][4]:
+                    question = items[index][0]
+                    marks[index] = score_results(question.marks, runs[key][2], results)
+
+    return marks
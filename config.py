@@ -37,6 +37,101 @@ class Config:
     # Main domain for multi-tenancy
     MAIN_DOMAIN = os.environ.get('MAIN_DOMAIN', 'xyz.com')
 
+    # Tenant lookup cache (per process); TTL bounds how long a suspension or
+    # plan change can take to reach workers that did not handle the update
+    TENANT_CACHE_TTL_SECONDS = int(os.environ.get('TENANT_CACHE_TTL_SECONDS', 60))
+    TENANT_CACHE_NEGATIVE_TTL_SECONDS = int(os.environ.get('TENANT_CACHE_NEGATIVE_TTL_SECONDS', 10))
+    TENANT_CACHE_MAX_ENTRIES = int(os.environ.get('TENANT_CACHE_MAX_ENTRIES', 1024))
+    TENANT_CUSTOM_DOMAIN_REFRESH_SECONDS = int(os.environ.get('TENANT_CUSTOM_DOMAIN_REFRESH_SECONDS', 300))
+    # A custom domain is verified by a TXT record at <prefix>.<domain>
+    CUSTOM_DOMAIN_VERIFICATION_PREFIX = os.environ.get('CUSTOM_DOMAIN_VERIFICATION_PREFIX', '_lms-verification')
+
+    # Usage counters: tenants listed here (by slug or id) append their deltas
+    # to tenant_usage_deltas, drained every TENANT_USAGE_FLUSH_SECONDS
+    TENANT_USAGE_BUFFERED_TENANTS = [t for t in os.environ.get('TENANT_USAGE_BUFFERED_TENANTS', '').split(',') if t]
+    TENANT_USAGE_FLUSH_SECONDS = int(os.environ.get('TENANT_USAGE_FLUSH_SECONDS', 5))
+    TENANT_USAGE_DRAIN_BATCH_SIZE = int(os.environ.get('TENANT_USAGE_DRAIN_BATCH_SIZE', 1000))
+    # Short-lived cache of /api/tenants/usage aggregates; 0 disables it
+    TENANT_USAGE_CACHE_TTL_SECONDS = int(os.environ.get('TENANT_USAGE_CACHE_TTL_SECONDS', 30))
+
+    # Compiled answer keys for auto-grading, per assessment
+    ANSWER_KEY_CACHE_TTL_SECONDS = int(os.environ.get('ANSWER_KEY_CACHE_TTL_SECONDS', 300))
+    ANSWER_KEY_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_KEY_CACHE_MAX_ENTRIES', 512))
+    # Serialized student-facing exam papers, per assessment
+    EXAM_PAPER_CACHE_TTL_SECONDS = int(os.environ.get('EXAM_PAPER_CACHE_TTL_SECONDS', 300))
+    EXAM_PAPER_CACHE_MAX_ENTRIES = int(os.environ.get('EXAM_PAPER_CACHE_MAX_ENTRIES', 512))
+
+    # Per-assessment item statistics; exams changed since the last read are
+    # folded in incrementally, expiry forces a full recompute
+    ANALYTICS_CACHE_TTL_SECONDS = int(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', 3600))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', 128))
+    # Each refresh re-reads exams updated this long before the last one, to
+    # pick up transactions that committed after it; keep above the longest
+    # exam transaction plus clock skew between servers
+    ANALYTICS_WATERMARK_OVERLAP_SECONDS = int(os.environ.get('ANALYTICS_WATERMARK_OVERLAP_SECONDS', 300))
+
+    # Enrollment progress: updates are coalesced per enrollment and written in
+    # batched UPDATEs; completions are written immediately
+    ENROLLMENT_PROGRESS_FLUSH_SECONDS = int(os.environ.get('ENROLLMENT_PROGRESS_FLUSH_SECONDS', 10))
+    ENROLLMENT_PROGRESS_MAX_PENDING = int(os.environ.get('ENROLLMENT_PROGRESS_MAX_PENDING', 5000))
+    # Upper bound on the time_spent_seconds a single progress update may add
+    ENROLLMENT_PROGRESS_MAX_SECONDS = int(os.environ.get('ENROLLMENT_PROGRESS_MAX_SECONDS', 3600))
+
+    # Progress and usage buffers are flushed by a thread in each process
+    # (started by create_app, so do not preload the app in gunicorn) and at exit
+    WRITE_BUFFER_FLUSH_THREAD = os.environ.get('WRITE_BUFFER_FLUSH_THREAD', 'True').lower() == 'true'
+    WRITE_BUFFER_FLUSH_INTERVAL_SECONDS = int(os.environ.get('WRITE_BUFFER_FLUSH_INTERVAL_SECONDS', 1))
+
+    # Expiry sweeper for timed exams
+    EXAM_SWEEP_INTERVAL_SECONDS = int(os.environ.get('EXAM_SWEEP_INTERVAL_SECONDS', 30))
+    EXAM_SWEEP_BATCH_SIZE = int(os.environ.get('EXAM_SWEEP_BATCH_SIZE', 100))
+    EXAM_SWEEP_BATCH_PAUSE_SECONDS = int(os.environ.get('EXAM_SWEEP_BATCH_PAUSE_SECONDS', 1))
+    EXAM_SWEEP_GRACE_SECONDS = int(os.environ.get('EXAM_SWEEP_GRACE_SECONDS', 60))
+    # An exam that fails to expire is retried after RETRY_SECONDS, doubling
+    # each time, and left for an operator after MAX_ATTEMPTS failures
+    EXAM_SWEEP_RETRY_SECONDS = int(os.environ.get('EXAM_SWEEP_RETRY_SECONDS', 60))
+    EXAM_SWEEP_MAX_ATTEMPTS = int(os.environ.get('EXAM_SWEEP_MAX_ATTEMPTS', 5))
+    EXAM_SWEEPER_INPROCESS = os.environ.get('EXAM_SWEEPER_INPROCESS', 'False').lower() == 'true'
+
+    # Background grading of subjective and code responses
+    GRADING_WORKERS = int(os.environ.get('GRADING_WORKERS', 4))
+    GRADING_BATCH_SIZE = int(os.environ.get('GRADING_BATCH_SIZE', 50))
+    GRADING_POLL_SECONDS = int(os.environ.get('GRADING_POLL_SECONDS', 2))
+    GRADING_JOB_TIMEOUT_SECONDS = int(os.environ.get('GRADING_JOB_TIMEOUT_SECONDS', 300))
+    GRADING_JOB_MAX_ATTEMPTS = int(os.environ.get('GRADING_JOB_MAX_ATTEMPTS', 3))
+    # Run the worker pool inside the web process instead of `flask grading-worker`
+    GRADING_WORKER_INPROCESS = os.environ.get('GRADING_WORKER_INPROCESS', 'False').lower() == 'true'
+
+    # Invoice and certificate numbers are reserved per tenant in blocks of this size
+    NUMBER_BLOCK_SIZE = int(os.environ.get('NUMBER_BLOCK_SIZE', 100))
+
+    # Payment gateway webhook inbox
+    WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 2))
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 50))
+    WEBHOOK_POLL_SECONDS = int(os.environ.get('WEBHOOK_POLL_SECONDS', 1))
+    WEBHOOK_EVENT_TIMEOUT_SECONDS = int(os.environ.get('WEBHOOK_EVENT_TIMEOUT_SECONDS', 300))
+    WEBHOOK_EVENT_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_EVENT_MAX_ATTEMPTS', 5))
+    # Run the worker pool inside the web process instead of `flask webhook-worker`
+    WEBHOOK_WORKER_INPROCESS = os.environ.get('WEBHOOK_WORKER_INPROCESS', 'False').lower() == 'true'
+
+    # Sandboxed runner for 'code' questions (Python test cases in Question.content)
+    CODE_RUN_WORKERS = int(os.environ.get('CODE_RUN_WORKERS', os.cpu_count() or 2))
+    CODE_RUN_TIME_LIMIT_SECONDS = int(os.environ.get('CODE_RUN_TIME_LIMIT_SECONDS', 5))
+    CODE_RUN_MEMORY_LIMIT_MB = int(os.environ.get('CODE_RUN_MEMORY_LIMIT_MB', 256))
+    # Each run gets fresh unprivileged user, mount, PID, IPC, UTS and network
+    # namespaces (no root needed; the kernel must allow unprivileged user
+    # namespaces) with the app tree and CODE_RUN_HIDDEN_PATHS masked, optionally
+    # chrooted to CODE_RUN_CHROOT. Code answers are not run if this cannot be
+    # set up. Runs keep the worker's account outside the namespace, so hide
+    # what it can reach (including Unix sockets under /run). CODE_RUN_PYTHON
+    # must be outside hidden paths.
+    CODE_RUN_PYTHON = os.environ.get('CODE_RUN_PYTHON', '/usr/bin/python3')
+    CODE_RUN_MAX_PROCESSES = int(os.environ.get('CODE_RUN_MAX_PROCESSES', 16))
+    CODE_RUN_HIDDEN_PATHS = [p for p in os.environ.get('CODE_RUN_HIDDEN_PATHS', '/home,/root,/srv,/run,/var/run').split(',') if p]
+    CODE_RUN_CHROOT = os.environ.get('CODE_RUN_CHROOT') or None
+    CODE_RESULT_CACHE_TTL_SECONDS = int(os.environ.get('CODE_RESULT_CACHE_TTL_SECONDS', 3600))
+    CODE_RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('CODE_RESULT_CACHE_MAX_ENTRIES', 10000))
+
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_ECHO = True
@@ -50,6 +145,10 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    TENANT_CACHE_TTL_SECONDS = 0
+    TENANT_USAGE_CACHE_TTL_SECONDS = 0
+    WRITE_BUFFER_FLUSH_THREAD = False
+    STRIPE_WEBHOOK_SECRET = 'whsec_test'
 
 # Configuration dictionary
 config = {
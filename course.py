@@ -38,6 +38,9 @@ class Course(BaseModel):
         'video_preview_url': None,
     })
 
+    # Supports keyset pagination of a tenant's course list
+    __table_args__ = (db.Index('ix_courses_tenant_created', 'tenant_id', 'created_at', 'id'),)
+
     # Relationships
     tenant = db.relationship('Tenant', back_populates='courses')
     instructor = db.relationship('User', back_populates='created_courses')
@@ -74,6 +77,10 @@ class Batch(BaseModel):
 
     status = db.Column(db.Enum('upcoming', 'ongoing', 'completed', 'cancelled'), default='upcoming')
 
+    # Confirmed enrollments in this batch, maintained by reserve_seat/release_seat
+    # and recounted by `flask repair-seat-counts`
+    confirmed_count = db.Column(db.Integer, default=0, nullable=False)
+
     # Relationships
     course = db.relationship('Course', back_populates='batches')
     instructor = db.relationship('User')
@@ -81,11 +88,37 @@ class Batch(BaseModel):
 
     @property
     def enrolled_count(self):
-        return self.enrollments.filter_by(status='confirmed').count()
+        return self.confirmed_count or 0
 
     @property
     def available_seats(self):
-        return self.max_capacity - self.enrolled_count
+        return (self.max_capacity or 0) - self.enrolled_count
+
+    @staticmethod
+    def reserve_seat(batch_id, seats=1):
+        """Take seats only if the batch has room; returns False when it is full.
+
+        A single conditional UPDATE, so concurrent reservations cannot oversell.
+        """
+        result = db.session.execute(
+            db.update(Batch)
+            .where(Batch.id == batch_id, Batch.confirmed_count + seats <= Batch.max_capacity)
+            .values(confirmed_count=Batch.confirmed_count + seats)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def release_seat(batch_id, seats=1):
+        """Give seats back, never going below zero"""
+        db.session.execute(
+            db.update(Batch)
+            .where(Batch.id == batch_id)
+            .values(confirmed_count=db.case(
+                (Batch.confirmed_count >= seats, Batch.confirmed_count - seats), else_=0
+            ))
+            .execution_options(synchronize_session=False)
+        )
 
 class Module(BaseModel):
     __tablename__ = 'modules'
@@ -1,8 +1,11 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, Response, stream_with_context
 from app.models import db, Course, Batch, Material, Module, Enrollment
 from app.services.course_service import CourseService
+from app.services.gradebook import get_gradebook_columns, iter_gradebook_rows, iter_gradebook_csv
 from app.utils.decorators import tenant_required, login_required, instructor_required, admin_required
+from app.utils.helpers import keyset_paginate_query, get_keyset_pagination_info
 from flask_login import current_user
+from sqlalchemy.orm import joinedload
 
 courses_bp = Blueprint('courses', __name__)
 
@@ -21,6 +24,23 @@ def get_courses():
     elif status == 'draft':
         query = query.filter_by(is_published=False)
 
+    # Cursor mode: ?cursor= (empty for the first page) with optional ?total=
+    if 'cursor' in request.args:
+        try:
+            courses = keyset_paginate_query(
+                query, Course.created_at, Course.id,
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                total=request.args.get('total', 'none')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'courses': [course.to_dict() for course in courses['items']],
+            'pagination': get_keyset_pagination_info(courses)
+        })
+
     courses = query.order_by(Course.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
@@ -77,16 +97,28 @@ def create_course():
 @tenant_required
 def get_course(course_id):
     """Get a specific course"""
-    course = Course.query.filter_by(
+    course = Course.query.options(
+        joinedload(Course.instructor)
+    ).filter_by(
         id=course_id,
         tenant_id=g.tenant_id
     ).first_or_404()
 
+    batches = Batch.query.filter_by(course_id=course_id).order_by(Batch.start_date).all()
+
+    # Seat counts come from Batch.confirmed_count; one COUNT covers enrollments
+    # that are not in a batch as well
+    enrollment_count = Enrollment.query.filter_by(course_id=course_id, status='confirmed').count()
+
     return jsonify({
         'course': course.to_dict(),
         'instructor': course.instructor.to_public_dict() if course.instructor else None,
-        'batches': [batch.to_dict() for batch in course.batches],
-        'enrollment_count': course.enrollments.filter_by(status='confirmed').count()
+        'batches': [{
+            **batch.to_dict(),
+            'enrolled_count': batch.enrolled_count,
+            'available_seats': batch.available_seats
+        } for batch in batches],
+        'enrollment_count': enrollment_count
     })
 
 @courses_bp.route('/<course_id>', methods=['PUT'])
@@ -213,3 +245,46 @@ def get_course_enrollments(course_id):
             'user': enrollment.user.to_public_dict()
         } for enrollment in enrollments]
     })
+
+@courses_bp.route('/<course_id>/gradebook', methods=['GET'])
+@tenant_required
+@instructor_required
+def get_gradebook(course_id):
+    """Get the enrollment x assessment gradebook of a course"""
+    course = Course.query.filter_by(id=course_id, tenant_id=g.tenant_id).first_or_404()
+
+    # Verify instructor owns the course; admins see every gradebook
+    if current_user.role == 'instructor' and course.instructor_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    return jsonify({
+        'course_id': course.id,
+        'assessments': [{
+            'id': assessment_id,
+            'title': title,
+            'type': assessment_type,
+            'total_marks': total_marks
+        } for assessment_id, title, assessment_type, total_marks in get_gradebook_columns(course.id)],
+        'rows': list(iter_gradebook_rows(course.id))
+    })
+
+@courses_bp.route('/<course_id>/gradebook/export', methods=['GET'])
+@tenant_required
+@instructor_required
+def export_gradebook(course_id):
+    """Stream the gradebook of a course as CSV"""
+    course = Course.query.filter_by(id=course_id, tenant_id=g.tenant_id).first_or_404()
+
+    # Verify instructor owns the course; admins see every gradebook
+    if current_user.role == 'instructor' and course.instructor_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    score = request.args.get('score', 'best')
+    if score not in ('best', 'latest'):
+        return jsonify({'error': 'score must be best or latest'}), 400
+
+    return Response(
+        stream_with_context(iter_gradebook_csv(course.id, score)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="gradebook-{course.code}.csv"'}
+    )
@@ -31,6 +31,16 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def superadmin_required(f):
+    """Decorator to require the platform superadmin role"""
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        if current_user.role != 'superadmin':
+            return jsonify({'error': 'Superadmin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 def instructor_required(f):
     """Decorator to require instructor role"""
     @wraps(f)
@@ -41,6 +51,16 @@ def instructor_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def finance_required(f):
+    """Decorator to require finance role"""
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        if current_user.role not in ['finance', 'admin', 'superadmin']:
+            return jsonify({'error': 'Finance access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 def feature_required(feature_name):
     """Decorator to check if tenant has access to a feature"""
     def decorator(f):
@@ -15,6 +15,9 @@ class Enrollment(BaseModel):
     completed_at = db.Column(db.DateTime)
 
     progress_decimal = db.Column(db.Numeric(5, 2), default=0)  # 0-100 percentage
+    # Incremented atomically; enrollment_metadata['time_spent_minutes'] is
+    # reported from it (plus any minutes recorded there before it existed)
+    time_spent_seconds = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
     final_grade = db.Column(db.String(10))
     grade_points = db.Column(db.Numeric(5, 2))
 
@@ -26,22 +29,61 @@ class Enrollment(BaseModel):
         'notes': None,
     })
 
+    # Supports keyset pagination of enrollment listings
+    __table_args__ = (db.Index('ix_enrollments_enrolled_at', 'enrolled_at', 'id'),)
+
     # Relationships
     user = db.relationship('User', back_populates='enrollments')
     course = db.relationship('Course', back_populates='enrollments')
     batch = db.relationship('Batch', back_populates='enrollments')
     certificate = db.relationship('Certificate', back_populates='enrollment', uselist=False)
 
+    def set_status(self, status):
+        """Change status, keeping the batch's confirmed seat counter in step"""
+        from app.models.course import Batch
+
+        if status == self.status:
+            return
+
+        if self.batch_id:
+            if status == 'confirmed':
+                if not Batch.reserve_seat(self.batch_id):
+                    raise ValueError("No available seats in this batch")
+            elif self.status == 'confirmed':
+                Batch.release_seat(self.batch_id)
+
+        self.status = status
+        if status == 'confirmed':
+            self.confirmed_at = datetime.utcnow()
+        elif status == 'completed':
+            self.completed_at = datetime.utcnow()
+
     def update_progress(self, new_progress):
         """Update progress and check for completion"""
         self.progress_decimal = min(100, max(0, new_progress))
 
         if self.progress_decimal >= 100 and self.status != 'completed':
-            self.status = 'completed'
-            self.completed_at = datetime.utcnow()
+            self.set_status('completed')
+
+    @staticmethod
+    def add_time_spent(enrollment_id, seconds):
+        """Add to time_spent_seconds with one SQL increment"""
+        if not seconds:
+            return
+        db.session.execute(
+            db.update(Enrollment)
+            .where(Enrollment.id == enrollment_id)
+            .values(time_spent_seconds=Enrollment.time_spent_seconds + seconds)
+            .execution_options(synchronize_session=False)
+        )
 
     def to_dict(self):
         data = super().to_dict()
+        enrollment_metadata = dict(data.get('enrollment_metadata') or {})
+        enrollment_metadata['time_spent_minutes'] = round(
+            (enrollment_metadata.get('time_spent_minutes') or 0) + (self.time_spent_seconds or 0) / 60, 2
+        )
+        data['enrollment_metadata'] = enrollment_metadata
         # Convert Decimal to float for JSON serialization
         if data.get('progress_decimal'):
             data['progress_decimal'] = float(data['progress_decimal'])
@@ -1,4 +1,4 @@
-from app.models import db, Enrollment, Course, User
+from app.models import db, Enrollment, Course, User, Batch
 import uuid
 from datetime import datetime
 
@@ -46,6 +46,140 @@ class EnrollmentService:
 
         return enrollment
 
+    @staticmethod
+    def bulk_enroll(course_id, tenant_id, identifiers, batch_id=None, status='pending', chunk_size=500):
+        """Enroll many users (ids or emails) in a course and report per row.
+
+        The course's open batches are row-locked and their free seats are
+        computed once: capacity less confirmed seats and pending enrollments,
+        so earlier pending imports keep their places. Students are assigned to
+        the requested batch first and to the following batches by start date,
+        inserted in chunks within one transaction, and confirmed ones take
+        their seats through Batch.reserve_seat. When the course has batches
+        but none is open, users are reported as no_open_batch.
+        """
+        if status not in ('pending', 'confirmed'):
+            raise ValueError("Status must be pending or confirmed")
+
+        course = Course.query.filter_by(id=course_id, tenant_id=tenant_id).first()
+        if not course:
+            raise ValueError("Course not found")
+
+        identifiers = [str(value).strip() for value in identifiers or []]
+        if not identifiers:
+            raise ValueError("No users provided")
+
+        # Resolve ids and emails of this tenant in chunked IN queries
+        emails = list({value.lower() for value in identifiers if '@' in value})
+        ids = list({value for value in identifiers if value and '@' not in value})
+        users_by_id = {}
+        users_by_email = {}
+        for values, column in ((ids, User.id), (emails, db.func.lower(User.email))):
+            for start in range(0, len(values), chunk_size):
+                for user_id, email in db.session.query(User.id, User.email).filter(
+                    User.tenant_id == tenant_id,
+                    column.in_(values[start:start + chunk_size])
+                ):
+                    users_by_id[user_id] = user_id
+                    users_by_email[email.lower()] = user_id
+
+        user_ids = list(users_by_id)
+        enrolled = set()
+        for start in range(0, len(user_ids), chunk_size):
+            enrolled.update(user_id for user_id, in db.session.query(Enrollment.user_id).filter(
+                Enrollment.course_id == course_id,
+                Enrollment.user_id.in_(user_ids[start:start + chunk_size])
+            ))
+
+        # Lock the open batches so concurrent enrollments wait for this import
+        batches = Batch.query.filter(
+            Batch.course_id == course_id,
+            Batch.status.in_(['upcoming', 'ongoing'])
+        ).order_by(Batch.start_date, Batch.id).with_for_update().all()
+
+        if batch_id:
+            preferred = [batch for batch in batches if batch.id == batch_id]
+            if not preferred:
+                raise ValueError("Batch not found")
+            batches = preferred + [batch for batch in batches if batch.id != batch_id]
+
+        # Pending enrollments hold no confirmed seat yet but will need one
+        held = dict(db.session.query(Enrollment.batch_id, db.func.count(Enrollment.id)).filter(
+            Enrollment.batch_id.in_([batch.id for batch in batches]),
+            Enrollment.status == 'pending'
+        ).group_by(Enrollment.batch_id)) if batches else {}
+        remaining = [[batch.id, batch.available_seats - held.get(batch.id, 0)] for batch in batches]
+        no_open_batch = not batches and db.session.query(
+            Batch.query.filter(Batch.course_id == course_id).exists()
+        ).scalar()
+
+        now = datetime.utcnow()
+        report = []
+        rows = []
+        seen = set()
+
+        for row_number, value in enumerate(identifiers, start=1):
+            user_id = users_by_email.get(value.lower()) if '@' in value else users_by_id.get(value)
+            result = {'row': row_number, 'user': value}
+
+            if not user_id:
+                result['status'] = 'not_found'
+            elif user_id in seen:
+                result['status'] = 'duplicate'
+            elif user_id in enrolled:
+                result['status'] = 'already_enrolled'
+            elif no_open_batch:
+                result['status'] = 'no_open_batch'
+            else:
+                assigned = None
+                if remaining:
+                    for seats in remaining:
+                        if seats[1] > 0:
+                            seats[1] -= 1
+                            assigned = seats[0]
+                            break
+                    else:
+                        result['status'] = 'no_capacity'
+
+                if 'status' not in result:
+                    enrollment_id = str(uuid.uuid4())
+                    rows.append({
+                        'id': enrollment_id,
+                        'user_id': user_id,
+                        'course_id': course_id,
+                        'batch_id': assigned,
+                        'status': status,
+                        'enrolled_at': now,
+                        'confirmed_at': now if status == 'confirmed' else None,
+                        'created_at': now,
+                        'updated_at': now
+                    })
+                    result.update({'status': 'enrolled', 'enrollment_id': enrollment_id, 'batch_id': assigned})
+
+            if user_id:
+                seen.add(user_id)
+            report.append(result)
+
+        try:
+            for start in range(0, len(rows), chunk_size):
+                db.session.execute(db.insert(Enrollment), rows[start:start + chunk_size])
+
+            if status == 'confirmed':
+                for batch in batches:
+                    seats = sum(1 for row in rows if row['batch_id'] == batch.id)
+                    if seats and not Batch.reserve_seat(batch.id, seats):
+                        raise ValueError(f"Batch {batch.name} has no room for {seats} more students")
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return {
+            'enrolled': len(rows),
+            'failed': len(report) - len(rows),
+            'results': report
+        }
+
     @staticmethod
     def confirm_enrollment(enrollment_id):
         """Confirm an enrollment (after payment or approval)"""
@@ -54,13 +188,59 @@ class EnrollmentService:
         if not enrollment:
             raise ValueError("Enrollment not found")
 
-        enrollment.status = 'confirmed'
-        enrollment.confirmed_at = datetime.utcnow()
+        try:
+            enrollment.set_status('confirmed')
+            db.session.commit()
+        except ValueError:
+            db.session.rollback()
+            raise
 
-        db.session.commit()
+        return enrollment
+
+    @staticmethod
+    def update_enrollment_status(enrollment_id, status):
+        """Change an enrollment's status, reserving or releasing its batch seat"""
+        enrollment = Enrollment.query.get(enrollment_id)
+
+        if not enrollment:
+            raise ValueError("Enrollment not found")
+
+        try:
+            enrollment.set_status(status)
+            db.session.commit()
+        except ValueError:
+            db.session.rollback()
+            raise
 
         return enrollment
 
+    @staticmethod
+    def recount_batch_seats(batch_ids=None):
+        """Repair Batch.confirmed_count from the enrollments table"""
+        counts = db.session.query(
+            Enrollment.batch_id, db.func.count(Enrollment.id)
+        ).filter(
+            Enrollment.batch_id.isnot(None),
+            Enrollment.status == 'confirmed'
+        ).group_by(Enrollment.batch_id)
+
+        batches = Batch.query
+        if batch_ids is not None:
+            counts = counts.filter(Enrollment.batch_id.in_(batch_ids))
+            batches = batches.filter(Batch.id.in_(batch_ids))
+
+        confirmed = dict(counts.all())
+
+        updated = 0
+        for batch in batches.with_for_update().all():
+            count = confirmed.get(batch.id, 0)
+            if batch.confirmed_count != count:
+                batch.confirmed_count = count
+                updated += 1
+
+        db.session.commit()
+        return updated
+
     @staticmethod
     def update_enrollment_progress(enrollment_id, progress):
         """Update enrollment progress"""
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify, g
+from flask_login import current_user
 from app.models import db, Enrollment, Course, User
 from app.services.enrollment_service import EnrollmentService
+from app.services.progress_buffer import progress_buffer, record_progress
 from app.utils.decorators import tenant_required, login_required, instructor_required
+from app.utils.helpers import keyset_paginate_query, get_keyset_pagination_info
 
 enrollments_bp = Blueprint('enrollments', __name__)
 
@@ -23,6 +26,27 @@ def get_enrollments():
         if status != 'all':
             query = query.filter(Enrollment.status == status)
 
+        # Cursor mode: ?cursor= (empty for the first page) with optional ?total=
+        if 'cursor' in request.args:
+            try:
+                enrollments = keyset_paginate_query(
+                    query, Enrollment.enrolled_at, Enrollment.id,
+                    cursor=request.args.get('cursor'),
+                    per_page=per_page,
+                    total=request.args.get('total', 'none')
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            return jsonify({
+                'enrollments': [{
+                    **enrollment.to_dict(),
+                    'course': enrollment.course.to_dict(),
+                    'user': enrollment.user.to_public_dict()
+                } for enrollment in enrollments['items']],
+                'pagination': get_keyset_pagination_info(enrollments)
+            })
+
         enrollments = query.order_by(Enrollment.enrolled_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -93,6 +117,38 @@ def create_enrollment():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@enrollments_bp.route('/bulk', methods=['POST'])
+@tenant_required
+@instructor_required
+def bulk_enroll():
+    """Enroll a list of users (ids or emails) in a course"""
+    data = request.get_json()
+
+    if not data or not data.get('course_id') or not data.get('users'):
+        return jsonify({'error': 'Course ID and users required'}), 400
+
+    course = Course.query.filter_by(id=data['course_id'], tenant_id=g.tenant_id).first_or_404()
+
+    # Check if instructor owns the course
+    if current_user.role == 'instructor' and course.instructor_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    try:
+        result = EnrollmentService.bulk_enroll(
+            course_id=course.id,
+            tenant_id=g.tenant_id,
+            identifiers=data['users'],
+            batch_id=data.get('batch_id'),
+            status=data.get('status', 'pending')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'message': f"Enrolled {result['enrolled']} user(s)",
+        **result
+    }), 201 if result['enrolled'] else 200
+
 @enrollments_bp.route('/<enrollment_id>', methods=['GET'])
 @tenant_required
 @login_required
@@ -105,9 +161,14 @@ def get_enrollment(enrollment_id):
        (current_user.role == 'instructor' and enrollment.course.instructor_id != current_user.id):
         return jsonify({'error': 'Access denied'}), 403
 
+    enrollment_data = enrollment.to_dict()
+    pending_progress = progress_buffer.pending_progress(enrollment.id)
+    if pending_progress is not None:
+        enrollment_data['progress_decimal'] = pending_progress
+
     return jsonify({
         'enrollment': {
-            **enrollment.to_dict(),
+            **enrollment_data,
             'course': enrollment.course.to_dict(),
             'user': enrollment.user.to_public_dict() if current_user.role != 'student' else None
         }
@@ -131,15 +192,20 @@ def update_progress(enrollment_id):
 
     try:
         progress = float(data['progress'])
-        enrollment.update_progress(progress)
-        db.session.commit()
+        time_spent_seconds = int(data.get('time_spent_seconds') or 0)
+        completed = record_progress(enrollment, progress, time_spent_seconds)
+
+        enrollment_data = enrollment.to_dict()
+        if not completed:
+            # Buffered; written with the next batched flush
+            enrollment_data['progress_decimal'] = min(100, max(0, progress))
 
         return jsonify({
             'message': 'Progress updated successfully',
-            'enrollment': enrollment.to_dict()
+            'enrollment': enrollment_data
         })
 
-    except ValueError as e:
+    except (TypeError, ValueError):
         return jsonify({'error': 'Invalid progress value'}), 400
 
 @enrollments_bp.route('/<enrollment_id>/status', methods=['PUT'])
@@ -162,14 +228,10 @@ def update_enrollment_status(enrollment_id):
     if data['status'] not in valid_statuses:
         return jsonify({'error': 'Invalid status'}), 400
 
-    enrollment.status = data['status']
-
-    if data['status'] == 'confirmed':
-        enrollment.confirmed_at = db.func.now()
-    elif data['status'] == 'completed':
-        enrollment.completed_at = db.func.now()
-
-    db.session.commit()
+    try:
+        enrollment = EnrollmentService.update_enrollment_status(enrollment.id, data['status'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({
         'message': 'Enrollment status updated successfully',
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import random
+from collections import namedtuple
+from app.extensions import db
+from app.models.assessment import Assessment, Question, on_questions_committed
+from app.utils.cache import TTLCache, MISSING
+
+# Keys of Question.content that must never reach students
+ANSWER_KEYS = frozenset(['correct_answer', 'accepted_answers', 'test_cases', 'solution'])
+
+ExamPaper = namedtuple('ExamPaper', ['etag', 'fragments'])
+
+paper_cache = TTLCache(config_prefix='EXAM_PAPER_CACHE')
+
+def student_content(content):
+    """Strip answer keys from question content, keeping public sample tests"""
+    content = content or {}
+    visible = {key: value for key, value in content.items() if key not in ANSWER_KEYS}
+    samples = [test for test in content.get('test_cases') or [] if isinstance(test, dict) and test.get('public')]
+    if samples:
+        visible['sample_test_cases'] = samples
+    return visible
+
+def build_exam_paper(assessment_id):
+    """Serialize the student-facing questions of an assessment once"""
+    questions = db.session.query(
+        Question.id, Question.type, Question.content, Question.marks, Question.order_index
+    ).filter(Question.assessment_id == assessment_id).order_by(Question.order_index).all()
+
+    fragments = tuple(
+        json.dumps({
+            'id': question_id,
+            'type': question_type,
+            'content': student_content(content),
+            'marks': marks,
+            'order_index': order_index
+        }, separators=(',', ':'))
+        for question_id, question_type, content, marks, order_index in questions
+    )
+    etag = hashlib.sha1('\n'.join(fragments).encode()).hexdigest()
+    return ExamPaper(etag, fragments)
+
+def get_exam_paper(assessment_id):
+    """Return the cached exam paper of an assessment, rebuilding it when its questions_version moved"""
+    version = db.session.query(Assessment.questions_version).filter(
+        Assessment.id == assessment_id
+    ).scalar()
+    cached = paper_cache.get(assessment_id)
+    if cached is not MISSING and cached[0] == version:
+        return cached[1]
+
+    paper = build_exam_paper(assessment_id)
+    paper_cache.set(assessment_id, (version, paper))
+    return paper
+
+@on_questions_committed
+def invalidate_exam_paper(assessment_id):
+    paper_cache.invalidate(assessment_id)
+
+def render_questions(paper, shuffle_seed=None):
+    """Return the paper's questions as a JSON array string.
+
+    With a shuffle_seed (the exam id) the order is a permutation that is
+    stable for that student across reloads.
+    """
+    order = list(range(len(paper.fragments)))
+    if shuffle_seed is not None:
+        random.Random(shuffle_seed).shuffle(order)
+    return '[' + ','.join(paper.fragments[i] for i in order) + ']'
@@ -0,0 +1,136 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models.assessment import Assessment, Exam
+from app.services.assessment_service import AssessmentService
+
+def find_overdue_exams(batch_size, grace_seconds=0, max_attempts=None):
+    """Ids of in-progress exams past their deadline, oldest first.
+
+    Exams whose last sweep failed are skipped until their retry time, and
+    for good after max_attempts failures.
+    """
+    now = datetime.utcnow()
+    query = db.session.query(Exam.id).filter(
+        Exam.status == 'in_progress',
+        Exam.expires_at < now - timedelta(seconds=grace_seconds),
+        db.or_(Exam.sweep_retry_at.is_(None), Exam.sweep_retry_at <= now)
+    )
+    if max_attempts:
+        query = query.filter(Exam.sweep_attempts < max_attempts)
+    rows = query.order_by(Exam.expires_at).limit(batch_size).all()
+    return [exam_id for exam_id, in rows]
+
+def record_sweep_failure(exam_id, retry_seconds):
+    """Count a failed sweep of an exam and push its next attempt back exponentially"""
+    attempts = db.session.query(Exam.sweep_attempts).filter(Exam.id == exam_id).scalar() or 0
+    db.session.execute(
+        db.update(Exam).where(Exam.id == exam_id).values(
+            sweep_attempts=attempts + 1,
+            sweep_retry_at=datetime.utcnow() + timedelta(seconds=min(retry_seconds * 2 ** attempts, 86400))
+        )
+    )
+    db.session.commit()
+    return attempts + 1
+
+def backfill_exam_deadlines(batch_size=500):
+    """Set expires_at of in-progress timed exams started before it existed.
+
+    The deadline is started_at plus the assessment's duration, as start_exam
+    computes it; returns the number of exams updated.
+    """
+    rows = db.session.query(Exam.id, Exam.started_at, Assessment.settings).join(
+        Assessment, Assessment.id == Exam.assessment_id
+    ).filter(
+        Exam.status == 'in_progress',
+        Exam.expires_at.is_(None),
+        Exam.started_at.isnot(None)
+    ).all()
+
+    updates = [{
+        'id': exam_id,
+        'expires_at': started_at + timedelta(minutes=(settings or {}).get('duration_minutes') or 60)
+    } for exam_id, started_at, settings in rows if (settings or {}).get('timed')]
+
+    for start in range(0, len(updates), batch_size):
+        db.session.execute(db.update(Exam), updates[start:start + batch_size])
+        db.session.commit()
+    return len(updates)
+
+def sweep_expired_exams(batch_size=None):
+    """Finalize one batch of overdue exams; returns (submitted, expired, failed)"""
+    config = current_app.config
+    batch_size = batch_size or config.get('EXAM_SWEEP_BATCH_SIZE', 100)
+    max_attempts = config.get('EXAM_SWEEP_MAX_ATTEMPTS', 5)
+    exam_ids = find_overdue_exams(batch_size, config.get('EXAM_SWEEP_GRACE_SECONDS', 60), max_attempts)
+
+    submitted = expired = failed = 0
+    for exam_id in exam_ids:
+        # One short transaction per exam so no lock is held across the batch
+        try:
+            result = AssessmentService.submit_exam(exam_id, expired=True)
+        except ValueError:
+            # Submitted by the student meanwhile
+            db.session.rollback()
+            continue
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Expiring exam %s failed", exam_id)
+            failed += 1
+            # Recorded so the exam does not hold the head of every later batch
+            attempts = record_sweep_failure(exam_id, config.get('EXAM_SWEEP_RETRY_SECONDS', 60))
+            if attempts >= max_attempts:
+                current_app.logger.error("Exam %s not expired after %d attempts; giving up", exam_id, attempts)
+            continue
+
+        if result['status'] == 'expired':
+            expired += 1
+        else:
+            submitted += 1
+
+    return submitted, expired, failed
+
+class ExamSweeper:
+    """Background thread that finalizes overdue timed exams in bounded batches"""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('EXAM_SWEEP_INTERVAL_SECONDS', 30)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                total = 0
+                # Keep going while full batches come back, pausing in between
+                while not self._stop.is_set():
+                    submitted, expired, failed = sweep_expired_exams()
+                    handled = submitted + expired + failed
+                    total += handled
+                    # Failed exams are not picked again before their retry time
+                    if handled < self.app.config.get('EXAM_SWEEP_BATCH_SIZE', 100):
+                        break
+                    self._stop.wait(self.app.config.get('EXAM_SWEEP_BATCH_PAUSE_SECONDS', 1))
+                return total
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception("Exam sweep failed")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='exam-sweeper', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,210 @@
+import uuid
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.payment import Payment, Invoice, RevenueDaily
+
+# Receivables ageing buckets: (label, min days overdue, max days overdue)
+AGEING_BUCKETS = (
+    ('current', None, 0),
+    ('1-30', 1, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+)
+
+def record_payment(payment, course_id=None, refund=False):
+    """Add a completed (or refunded) payment to its daily rollup row.
+
+    Runs in the caller's transaction; the row is created on first use inside
+    a savepoint so a concurrent insert only retries the increment.
+    """
+    when = (payment.refunded_at if refund else payment.paid_at) or datetime.utcnow()
+    key = {
+        'tenant_id': payment.tenant_id,
+        'day': when.date(),
+        'course_id': course_id or '',
+        'payment_method': payment.payment_method,
+        'currency': payment.currency or 'USD',
+    }
+    amount = Decimal(str(payment.amount or 0))
+    deltas = {
+        'refunds_count': RevenueDaily.refunds_count + 1,
+        'refunded_amount': RevenueDaily.refunded_amount + amount,
+    } if refund else {
+        'payments_count': RevenueDaily.payments_count + 1,
+        'gross_amount': RevenueDaily.gross_amount + amount,
+    }
+
+    for _ in range(2):
+        result = db.session.execute(
+            db.update(RevenueDaily)
+            .where(*[getattr(RevenueDaily, column) == value for column, value in key.items()])
+            .values(**deltas)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return
+
+        now = datetime.utcnow()
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(RevenueDaily).values(
+                    id=str(uuid.uuid4()),
+                    payments_count=0 if refund else 1,
+                    gross_amount=0 if refund else amount,
+                    refunds_count=1 if refund else 0,
+                    refunded_amount=amount if refund else 0,
+                    created_at=now,
+                    updated_at=now,
+                    **key
+                ))
+            return
+        except IntegrityError:
+            continue
+
+def rebuild_rollups(since=None, until=None, tenant_id=None):
+    """Recompute daily rollups from payments with grouped SQL aggregates.
+
+    since/until are dates (until exclusive); existing rows in the range are
+    replaced. Returns the number of rollup rows written.
+    """
+    rows = {}
+
+    def aggregate(time_column, status, count_field, amount_field):
+        day = db.func.date(time_column)
+        query = db.session.query(
+            Payment.tenant_id, day, db.func.coalesce(Invoice.course_id, ''),
+            Payment.payment_method, db.func.coalesce(Payment.currency, 'USD'),
+            db.func.count(Payment.id), db.func.coalesce(db.func.sum(Payment.amount), 0)
+        ).outerjoin(Invoice, Invoice.id == Payment.invoice_id).filter(
+            Payment.status.in_(status), time_column.isnot(None)
+        )
+        if since:
+            query = query.filter(time_column >= since)
+        if until:
+            query = query.filter(time_column < until)
+        if tenant_id:
+            query = query.filter(Payment.tenant_id == tenant_id)
+
+        query = query.group_by(
+            Payment.tenant_id, day, db.func.coalesce(Invoice.course_id, ''),
+            Payment.payment_method, db.func.coalesce(Payment.currency, 'USD')
+        )
+        for row_tenant, row_day, course_id, method, currency, count, amount in query:
+            if isinstance(row_day, str):
+                row_day = date.fromisoformat(row_day)
+            row = rows.setdefault((row_tenant, row_day, course_id, method, currency), {
+                'payments_count': 0, 'gross_amount': 0, 'refunds_count': 0, 'refunded_amount': 0
+            })
+            row[count_field] = count
+            row[amount_field] = amount
+
+    # A refunded payment was paid first, so it counts towards gross revenue too
+    aggregate(Payment.paid_at, ['completed', 'refunded'], 'payments_count', 'gross_amount')
+    aggregate(Payment.refunded_at, ['refunded'], 'refunds_count', 'refunded_amount')
+
+    delete = RevenueDaily.query
+    if since:
+        delete = delete.filter(RevenueDaily.day >= since)
+    if until:
+        delete = delete.filter(RevenueDaily.day < until)
+    if tenant_id:
+        delete = delete.filter(RevenueDaily.tenant_id == tenant_id)
+
+    try:
+        delete.delete(synchronize_session=False)
+        now = datetime.utcnow()
+        if rows:
+            db.session.execute(db.insert(RevenueDaily), [{
+                'id': str(uuid.uuid4()),
+                'tenant_id': row_tenant,
+                'day': row_day,
+                'course_id': course_id,
+                'payment_method': method,
+                'currency': currency,
+                'created_at': now,
+                'updated_at': now,
+                **values
+            } for (row_tenant, row_day, course_id, method, currency), values in rows.items()])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(rows)
+
+def revenue_report(tenant_id, since, until, group_by='day'):
+    """Revenue from the daily rollups, grouped by day, month, course or payment method"""
+    if group_by not in ('day', 'month', 'course', 'payment_method'):
+        raise ValueError("group_by must be day, month, course or payment_method")
+
+    rows = db.session.query(
+        RevenueDaily.day, RevenueDaily.course_id, RevenueDaily.payment_method, RevenueDaily.currency,
+        RevenueDaily.payments_count, RevenueDaily.gross_amount,
+        RevenueDaily.refunds_count, RevenueDaily.refunded_amount
+    ).filter(
+        RevenueDaily.tenant_id == tenant_id,
+        RevenueDaily.day >= since,
+        RevenueDaily.day < until
+    )
+
+    groups = {}
+    for day, course_id, method, currency, payments, gross, refunds, refunded in rows:
+        key = {
+            'day': day.isoformat(),
+            'month': day.strftime('%Y-%m'),
+            'course': course_id or None,
+            'payment_method': method,
+        }[group_by]
+        totals = groups.setdefault((key, currency), [0, Decimal('0'), 0, Decimal('0')])
+        totals[0] += payments
+        totals[1] += Decimal(gross)
+        totals[2] += refunds
+        totals[3] += Decimal(refunded)
+
+    return [{
+        group_by: key,
+        'currency': currency,
+        'payments': payments,
+        'gross': float(gross),
+        'refunds': refunds,
+        'refunded': float(refunded),
+        'net': float(gross - refunded),
+        'refund_rate': round(refunds / payments, 4) if payments else None
+    } for (key, currency), (payments, gross, refunds, refunded) in sorted(
+        groups.items(), key=lambda item: (str(item[0][0]), item[0][1])
+    )]
+
+def receivables_ageing(tenant_id, as_of=None):
+    """Outstanding invoice balances bucketed by days past due, in one grouped query"""
+    as_of = as_of or datetime.utcnow().date()
+
+    conditions = []
+    for label, min_days, max_days in AGEING_BUCKETS:
+        clauses = []
+        if min_days is not None:
+            clauses.append(Invoice.due_date <= as_of - timedelta(days=min_days))
+        if max_days is not None:
+            clauses.append(Invoice.due_date >= as_of - timedelta(days=max_days))
+        conditions.append((db.and_(*clauses), label))
+    bucket = db.case(*conditions, else_='90+')
+
+    outstanding = Invoice.total_amount - db.func.coalesce(Invoice.paid_amount, 0)
+    rows = db.session.query(
+        bucket, Invoice.currency, db.func.count(Invoice.id), db.func.sum(outstanding)
+    ).filter(
+        Invoice.tenant_id == tenant_id,
+        Invoice.status.in_(['sent', 'overdue']),
+        outstanding > 0
+    ).group_by(bucket, Invoice.currency).all()
+
+    found = {(label, currency): (count, amount) for label, currency, count, amount in rows}
+    currencies = sorted({currency for _, currency in found}) or ['USD']
+    return [{
+        'bucket': label,
+        'currency': currency,
+        'invoices': found.get((label, currency), (0, 0))[0],
+        'outstanding': float(found.get((label, currency), (0, 0))[1] or 0)
+    } for currency in currencies for label, _, _ in AGEING_BUCKETS]
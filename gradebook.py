@@ -0,0 +1,184 @@
+import csv
+import io
+import uuid
+from datetime import datetime
+from app.extensions import db
+from app.models.assessment import Assessment, Exam, GradebookEntry
+from app.models.enrollment import Enrollment
+from app.models.user import User
+
+FINAL_STATUSES = ('submitted', 'graded', 'expired')
+
+ACTIVE_ENROLLMENT_STATUSES = ('pending', 'confirmed', 'completed')
+
+def update_gradebook(exam_ids):
+    """Recompute the gradebook entries touched by the given exams.
+
+    Runs in the caller's transaction: only the (assessment, student) pairs of
+    these exams are read back and upserted, so the cost does not grow with
+    the size of the course.
+    """
+    if not exam_ids:
+        return 0
+
+    pairs = set(db.session.query(Exam.assessment_id, Exam.user_id).filter(Exam.id.in_(exam_ids)))
+    if not pairs:
+        return 0
+
+    assessment_ids = {assessment_id for assessment_id, _ in pairs}
+    user_ids = {user_id for _, user_id in pairs}
+
+    courses = dict(db.session.query(Assessment.id, Assessment.course_id).filter(
+        Assessment.id.in_(assessment_ids)
+    ))
+
+    # Every finalized attempt of the affected students, oldest first
+    attempts = {}
+    for assessment_id, user_id, exam_id, percentage, status, submitted_at in db.session.query(
+        Exam.assessment_id, Exam.user_id, Exam.id, Exam.percentage, Exam.status, Exam.submitted_at
+    ).filter(
+        Exam.assessment_id.in_(assessment_ids),
+        Exam.user_id.in_(user_ids),
+        Exam.status.in_(FINAL_STATUSES)
+    ).order_by(Exam.submitted_at):
+        if (assessment_id, user_id) in pairs:
+            attempts.setdefault((assessment_id, user_id), []).append(
+                (exam_id, percentage, status, submitted_at)
+            )
+
+    entries = {
+        (entry.assessment_id, entry.user_id): entry
+        for entry in GradebookEntry.query.filter(
+            GradebookEntry.assessment_id.in_(assessment_ids),
+            GradebookEntry.user_id.in_(user_ids)
+        )
+    }
+
+    now = datetime.utcnow()
+    new_rows = []
+    for pair in pairs:
+        exams = attempts.get(pair)
+        if not exams:
+            continue
+
+        latest_exam_id, latest_percentage, latest_status, last_submitted_at = exams[-1]
+        values = {
+            'attempts': len(exams),
+            'best_percentage': max(percentage or 0 for _, percentage, _, _ in exams),
+            'latest_percentage': latest_percentage,
+            'latest_exam_id': latest_exam_id,
+            'latest_status': latest_status,
+            'last_submitted_at': last_submitted_at
+        }
+
+        entry = entries.get(pair)
+        if entry:
+            for field, value in values.items():
+                setattr(entry, field, value)
+        else:
+            new_rows.append({
+                'id': str(uuid.uuid4()),
+                'course_id': courses[pair[0]],
+                'assessment_id': pair[0],
+                'user_id': pair[1],
+                'created_at': now,
+                'updated_at': now,
+                **values
+            })
+
+    if new_rows:
+        db.session.execute(db.insert(GradebookEntry), new_rows)
+    return len(pairs)
+
+def rebuild_gradebook(course_id=None, batch_size=500):
+    """Backfill or repair gradebook entries from the exams table"""
+    query = db.session.query(Exam.id).filter(Exam.status.in_(FINAL_STATUSES))
+    if course_id:
+        query = query.join(Assessment, Assessment.id == Exam.assessment_id).filter(
+            Assessment.course_id == course_id
+        )
+
+    exam_ids = [exam_id for exam_id, in query]
+    for start in range(0, len(exam_ids), batch_size):
+        update_gradebook(exam_ids[start:start + batch_size])
+        db.session.commit()
+    return len(exam_ids)
+
+def get_gradebook_columns(course_id):
+    """Assessments of a course in gradebook column order"""
+    return db.session.query(
+        Assessment.id, Assessment.title, Assessment.type, Assessment.total_marks
+    ).filter(Assessment.course_id == course_id).order_by(Assessment.created_at, Assessment.id).all()
+
+def iter_gradebook_rows(course_id, chunk_size=1000):
+    """Yield one row per enrollment with its entries keyed by assessment id.
+
+    The whole matrix comes from a single enrollment-ordered query (enrollments
+    left joined to their gradebook entries), streamed in chunks.
+    """
+    rows = db.session.query(
+        Enrollment.id, Enrollment.user_id, Enrollment.status, User.full_name, User.email,
+        GradebookEntry.assessment_id, GradebookEntry.best_percentage,
+        GradebookEntry.latest_percentage, GradebookEntry.attempts, GradebookEntry.latest_status
+    ).join(User, User.id == Enrollment.user_id).outerjoin(
+        GradebookEntry, db.and_(
+            GradebookEntry.course_id == Enrollment.course_id,
+            GradebookEntry.user_id == Enrollment.user_id
+        )
+    ).filter(
+        Enrollment.course_id == course_id,
+        Enrollment.status.in_(ACTIVE_ENROLLMENT_STATUSES)
+    ).order_by(User.full_name, Enrollment.id).execution_options(yield_per=chunk_size)
+
+    current = None
+    for (enrollment_id, user_id, enrollment_status, full_name, email,
+         assessment_id, best, latest, attempts, latest_status) in rows:
+        if current is None or current['enrollment_id'] != enrollment_id:
+            if current is not None:
+                yield current
+            current = {
+                'enrollment_id': enrollment_id,
+                'user_id': user_id,
+                'full_name': full_name,
+                'email': email,
+                'enrollment_status': enrollment_status,
+                'grades': {}
+            }
+        if assessment_id:
+            current['grades'][assessment_id] = {
+                'best': float(best) if best is not None else None,
+                'latest': float(latest) if latest is not None else None,
+                'attempts': attempts,
+                'status': latest_status
+            }
+    if current is not None:
+        yield current
+
+def csv_cell(value):
+    """Neutralize text a spreadsheet would run as a formula (CSV injection)"""
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+def iter_gradebook_csv(course_id, score='best'):
+    """Stream the gradebook as CSV lines, one enrollment per line"""
+    columns = get_gradebook_columns(course_id)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    writer.writerow(['student', 'email', 'enrollment_status'] + [csv_cell(title) for _, title, _, _ in columns])
+    yield flush()
+
+    for row in iter_gradebook_rows(course_id):
+        grades = row['grades']
+        writer.writerow([csv_cell(row['full_name']), csv_cell(row['email']), row['enrollment_status']] + [
+            grades[assessment_id][score] if assessment_id in grades and grades[assessment_id][score] is not None else ''
+            for assessment_id, _, _, _ in columns
+        ])
+        yield flush()
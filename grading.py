@@ -0,0 +1,103 @@
+from collections import namedtuple
+from app.extensions import db
+from app.models.assessment import Assessment, Question, on_questions_committed
+from app.utils.cache import TTLCache, MISSING
+
+OBJECTIVE_TYPES = frozenset(['mcq', 'tf'])
+
+_TRUE_VALUES = frozenset(['true', 't', 'yes', 'y', '1'])
+_FALSE_VALUES = frozenset(['false', 'f', 'no', 'n', '0'])
+
+KeyEntry = namedtuple('KeyEntry', ['type', 'marks', 'correct'])
+
+answer_key_cache = TTLCache(config_prefix='ANSWER_KEY_CACHE')
+
+def normalize_answer(question_type, value):
+    """Normalize an answer so equal answers compare equal regardless of format"""
+    if value is None:
+        return None
+
+    if question_type == 'tf':
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE_VALUES:
+            return True
+        if text in _FALSE_VALUES:
+            return False
+        return None
+
+    if isinstance(value, (list, tuple, set)):
+        # Multiple-answer MCQ: order of the selected options does not matter
+        return frozenset(normalize_answer(question_type, item) for item in value)
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (int, float)):
+        return str(int(value)) if float(value).is_integer() else str(value)
+    return str(value).strip().lower()
+
+def compile_answer_key(assessment_id):
+    """Build {question_id: KeyEntry} for an assessment from one query"""
+    rows = db.session.query(
+        Question.id, Question.type, Question.marks, Question.content
+    ).filter(Question.assessment_id == assessment_id).all()
+
+    key = {}
+    for question_id, question_type, marks, content in rows:
+        correct = None
+        if question_type in OBJECTIVE_TYPES:
+            correct = normalize_answer(question_type, (content or {}).get('correct_answer'))
+        key[question_id] = KeyEntry(question_type, marks or 0, correct)
+    return key
+
+def get_answer_key(assessment_id):
+    """Return the compiled answer key of an assessment, compiling it on a miss.
+
+    Entries are tagged with Assessment.questions_version, read on every call,
+    so a question edit committed by any process replaces the cached key.
+    """
+    version = db.session.query(Assessment.questions_version).filter(
+        Assessment.id == assessment_id
+    ).scalar()
+    cached = answer_key_cache.get(assessment_id)
+    if cached is not MISSING and cached[0] == version:
+        return cached[1]
+
+    key = compile_answer_key(assessment_id)
+    answer_key_cache.set(assessment_id, (version, key))
+    return key
+
+@on_questions_committed
+def invalidate_answer_key(assessment_id):
+    answer_key_cache.invalidate(assessment_id)
+
+def grade_responses(key, responses):
+    """Grade submitted answers against a compiled key in a single pass.
+
+    Returns (graded, total) where graded is a list of
+    (question_id, answer, marks_awarded, question_type) for every response
+    that belongs to the assessment. Subjective and code responses get
+    marks_awarded None; they are graded later by the grading queue.
+    """
+    graded = []
+    total = 0
+    seen = set()
+
+    for response_data in responses:
+        question_id = response_data.get('question_id')
+        entry = key.get(question_id)
+        if entry is None or question_id in seen:
+            continue
+        seen.add(question_id)
+
+        answer = response_data.get('answer')
+        if entry.type in OBJECTIVE_TYPES:
+            is_correct = entry.correct is not None and normalize_answer(entry.type, answer) == entry.correct
+            marks_awarded = entry.marks if is_correct else 0
+        else:
+            marks_awarded = None
+
+        total += marks_awarded or 0
+        graded.append((question_id, answer, marks_awarded, entry.type))
+
+    return graded, total
@@ -0,0 +1,224 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models.assessment import Question, Response, Exam, GradingJob
+from app.services.grading import normalize_answer
+from app.services.code_runner import grade_code_batch
+from app.services.gradebook import update_gradebook
+
+# question type -> callable(question, response) returning marks, or None when
+# the response needs an instructor
+GRADERS = {}
+
+# question type -> callable([(question, response), ...]) returning a list of
+# marks (or None) in the same order; used for graders that parallelize
+BATCH_GRADERS = {}
+
+def register_grader(question_type):
+    """Register the automatic grader for a question type"""
+    def decorator(f):
+        GRADERS[question_type] = f
+        return f
+    return decorator
+
+def register_batch_grader(question_type):
+    """Register a grader that receives every job of its type in a batch at once"""
+    def decorator(f):
+        BATCH_GRADERS[question_type] = f
+        return f
+    return decorator
+
+@register_grader('short')
+def grade_short_answer(question, response):
+    """Grade short answers that list accepted answers; leave the rest manual"""
+    content = question.content or {}
+    accepted = content.get('accepted_answers') or (
+        [content['correct_answer']] if content.get('correct_answer') is not None else []
+    )
+    if not accepted:
+        return None
+
+    answer = normalize_answer('short', response.answer)
+    if answer in {normalize_answer('short', value) for value in accepted}:
+        return question.marks
+    return 0
+
+@register_batch_grader('code')
+def grade_code_answers(items):
+    """Run code answers against their test cases in the sandboxed runner"""
+    return grade_code_batch(items)
+
+def enqueue_responses(exam_id, response_rows):
+    """Queue grading jobs for inserted response rows (dicts with id/question_type)"""
+    now = datetime.utcnow()
+    job_rows = [{
+        'id': str(uuid.uuid4()),
+        'exam_id': exam_id,
+        'response_id': row['id'],
+        'question_type': row['question_type'],
+        'status': 'queued',
+        'attempts': 0,
+        'created_at': now,
+        'updated_at': now
+    } for row in response_rows]
+
+    if job_rows:
+        db.session.execute(db.insert(GradingJob), job_rows)
+    return len(job_rows)
+
+def refresh_exam_scores(exam_ids):
+    """Recompute marks, percentage and status of exams from their responses"""
+    if not exam_ids:
+        return
+
+    totals = db.session.query(
+        Response.exam_id,
+        db.func.coalesce(db.func.sum(Response.marks_awarded), 0),
+        db.func.sum(db.case((Response.marks_awarded.is_(None), 1), else_=0))
+    ).filter(Response.exam_id.in_(exam_ids)).group_by(Response.exam_id).all()
+
+    exams = {exam.id: exam for exam in Exam.query.filter(Exam.id.in_(exam_ids))}
+
+    for exam_id, marks_obtained, pending in totals:
+        exam = exams.get(exam_id)
+        if not exam:
+            continue
+        exam.marks_obtained = int(marks_obtained)
+        exam.percentage = (exam.marks_obtained / exam.total_marks) * 100 if exam.total_marks else 0
+        if not pending and exam.status == 'submitted':
+            exam.status = 'graded'
+
+    db.session.flush()
+    update_gradebook(exam_ids)
+
+def claim_jobs(batch_size):
+    """Mark up to batch_size queued jobs as running and return them"""
+    stale_before = datetime.utcnow() - timedelta(
+        seconds=current_app.config.get('GRADING_JOB_TIMEOUT_SECONDS', 300)
+    )
+    jobs = GradingJob.query.filter(
+        db.or_(
+            GradingJob.status == 'queued',
+            # Jobs of a worker that died mid-batch
+            db.and_(GradingJob.status == 'running', GradingJob.locked_at < stale_before)
+        )
+    ).order_by(GradingJob.created_at).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    now = datetime.utcnow()
+    for job in jobs:
+        job.status = 'running'
+        job.locked_at = now
+        job.attempts = (job.attempts or 0) + 1
+    db.session.commit()
+    return jobs
+
+def process_jobs(batch_size=50):
+    """Grade one batch of queued responses; returns the number of jobs handled"""
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0
+
+    max_attempts = current_app.config.get('GRADING_JOB_MAX_ATTEMPTS', 3)
+    responses = {
+        response.id: response
+        for response in Response.query.filter(Response.id.in_([job.response_id for job in jobs]))
+    }
+    questions = {
+        question.id: question
+        for question in Question.query.filter(
+            Question.id.in_({response.question_id for response in responses.values()})
+        )
+    }
+
+    def record(job, response, marks):
+        if marks is None:
+            job.status = 'manual'
+        else:
+            response.marks_awarded = marks
+            job.status = 'done'
+        job.error = None
+
+    def record_failure(job, error):
+        job.error = str(error)
+        job.status = 'failed' if job.attempts >= max_attempts else 'queued'
+
+    batched = {}
+    for job in jobs:
+        response = responses.get(job.response_id)
+        question = questions.get(response.question_id) if response else None
+
+        if question and job.question_type in BATCH_GRADERS:
+            batched.setdefault(job.question_type, []).append((job, question, response))
+            continue
+
+        grader = GRADERS.get(job.question_type)
+        try:
+            marks = grader(question, response) if (grader and question) else None
+        except Exception as e:
+            record_failure(job, e)
+            continue
+        record(job, response, marks)
+
+    for question_type, entries in batched.items():
+        try:
+            marks = BATCH_GRADERS[question_type]([(question, response) for _, question, response in entries])
+        except Exception as e:
+            for job, _, _ in entries:
+                record_failure(job, e)
+            continue
+        for (job, _, response), job_marks in zip(entries, marks):
+            record(job, response, job_marks)
+
+    refresh_exam_scores({job.exam_id for job in jobs if job.status == 'done'})
+    db.session.commit()
+    return len(jobs)
+
+class GradingWorkerPool:
+    """Thread pool that drains the grading_jobs table in batches"""
+
+    def __init__(self, app, workers=None, batch_size=None, poll_interval=None):
+        self.app = app
+        self.workers = workers or app.config.get('GRADING_WORKERS', 4)
+        self.batch_size = batch_size or app.config.get('GRADING_BATCH_SIZE', 50)
+        self.poll_interval = poll_interval or app.config.get('GRADING_POLL_SECONDS', 2)
+        self._stop = threading.Event()
+        self._executor = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    handled = process_jobs(self.batch_size)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Grading batch failed")
+                    handled = 0
+                finally:
+                    db.session.remove()
+            if not handled:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='grading')
+        for _ in range(self.workers):
+            self._executor.submit(self._run)
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
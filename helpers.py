@@ -63,3 +63,73 @@ def get_pagination_info(paginated_obj):
         'next_num': paginated_obj.next_num,
         'prev_num': paginated_obj.prev_num
     }
+
+def encode_cursor(sort_value, row_id):
+    """Encode the last row of a page as an opaque keyset cursor"""
+    import base64
+    payload = json.dumps([sort_value, row_id], cls=JSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a keyset cursor into (sort_value, row_id)"""
+    import base64
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), row_id
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def keyset_paginate_query(query, sort_column, id_column, cursor=None, per_page=10, total='none',
+                          estimate_limit=10000):
+    """Paginate a query by (sort_column, id_column) descending using a cursor.
+
+    Unlike OFFSET pagination, the cost of a page does not grow with its depth.
+    total can be 'none' (skip counting), 'exact', or 'estimate' (count capped
+    at estimate_limit rows).
+    """
+    from sqlalchemy import tuple_
+
+    page_query = query
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        # A row-value comparison is a single index range on (sort, id); the
+        # equivalent OR form makes some planners scan down to the cursor
+        page_query = page_query.filter(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+
+    rows = page_query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+
+    next_cursor = None
+    if has_next and items:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    result = {
+        'items': items,
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+        'total': None,
+        'total_is_estimate': False,
+    }
+
+    if total == 'exact':
+        result['total'] = query.order_by(None).count()
+    elif total == 'estimate':
+        capped = query.order_by(None).limit(estimate_limit + 1).count()
+        result['total'] = min(capped, estimate_limit)
+        result['total_is_estimate'] = capped > estimate_limit
+
+    return result
+
+def get_keyset_pagination_info(keyset_page):
+    """Get pagination metadata from a keyset_paginate_query result"""
+    return {
+        'per_page': keyset_page['per_page'],
+        'has_next': keyset_page['has_next'],
+        'next_cursor': keyset_page['next_cursor'],
+        'total': keyset_page['total'],
+        'total_is_estimate': keyset_page['total_is_estimate']
+    }
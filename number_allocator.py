@@ -0,0 +1,141 @@
+import hashlib
+import threading
+import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.sequence import NumberSequence
+
+# Document type -> (number prefix, zero padding)
+NUMBER_FORMATS = {
+    'invoice': ('INV', 6),
+    'certificate': ('CERT', 6),
+}
+
+# Longest tenant part of a number: INV-<17 chars>-<up to 19 digits> still
+# fits Invoice.invoice_number (String(50))
+MAX_TENANT_PREFIX_LENGTH = 17
+
+def tenant_prefix(slug, tenant_id):
+    """Upper-cased slug, or for long slugs its first 10 characters plus a hash of the tenant id.
+
+    The '.' separator cannot occur in a slug, so a shortened prefix never
+    equals another tenant's full one.
+    """
+    prefix = slug.upper()
+    if len(prefix) <= MAX_TENANT_PREFIX_LENGTH:
+        return prefix
+    digest = hashlib.sha1(tenant_id.encode()).hexdigest()[:6].upper()
+    return f"{prefix[:10]}.{digest}"
+
+class NumberAllocator:
+    """Hands out per-tenant, monotonically increasing document numbers.
+
+    Numbers are reserved from number_sequences in blocks, in a transaction of
+    their own so callers never hold the sequence row lock, and then served
+    from memory. Numbers of a block not used before the process exits are
+    skipped, so sequences can have gaps but never duplicates. Each (tenant,
+    type) has its own lock, so a block refill only holds up callers of the
+    same sequence.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _sequence_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _reserve(self, tenant_id, name, size):
+        """Reserve size numbers; returns (prefix, first value)"""
+        table = NumberSequence.__table__
+        where = db.and_(table.c.tenant_id == tenant_id, table.c.name == name)
+
+        for _ in range(2):
+            with db.engine.begin() as connection:
+                if connection.dialect.update_returning:
+                    # One round trip on databases with UPDATE ... RETURNING
+                    row = connection.execute(
+                        table.update().where(where)
+                        .values(next_value=table.c.next_value + size)
+                        .returning(table.c.prefix, table.c.next_value)
+                    ).first()
+                    if row:
+                        return row.prefix, row.next_value - size
+                else:
+                    row = connection.execute(
+                        db.select(table.c.prefix, table.c.next_value).where(where).with_for_update()
+                    ).first()
+                    if row:
+                        connection.execute(
+                            table.update().where(where).values(next_value=row.next_value + size)
+                        )
+                        return row.prefix, row.next_value
+
+            # First number of this tenant and type: create the sequence
+            try:
+                with db.engine.begin() as connection:
+                    prefix = self._tenant_prefix(connection, tenant_id)
+                    now = datetime.utcnow()
+                    connection.execute(table.insert().values(
+                        id=str(uuid.uuid4()),
+                        tenant_id=tenant_id,
+                        name=name,
+                        prefix=prefix,
+                        next_value=1 + size,
+                        created_at=now,
+                        updated_at=now
+                    ))
+                    return prefix, 1
+            except IntegrityError:
+                # Created concurrently; reserve from the existing row
+                continue
+
+        raise RuntimeError(f"Could not reserve {name} numbers for tenant {tenant_id}")
+
+    @staticmethod
+    def _tenant_prefix(connection, tenant_id):
+        from app.models.tenant import Tenant
+        slug = connection.execute(
+            db.select(Tenant.__table__.c.slug).where(Tenant.__table__.c.id == tenant_id)
+        ).scalar()
+        if not slug:
+            raise ValueError("Tenant not found")
+        return tenant_prefix(slug, tenant_id)
+
+    def allocate(self, tenant_id, name, count=1):
+        """Return count formatted numbers, e.g. INV-ACME-000042"""
+        block_size = current_app.config.get('NUMBER_BLOCK_SIZE', 100)
+        label, width = NUMBER_FORMATS[name]
+        key = (tenant_id, name)
+        numbers = []
+
+        with self._sequence_lock(key):
+            while len(numbers) < count:
+                block = self._blocks.get(key)
+                if not block or block[1] >= block[2]:
+                    needed = count - len(numbers)
+                    prefix, start = self._reserve(tenant_id, name, max(block_size, needed))
+                    # Sequences created before prefixes were bounded may hold a long slug
+                    if len(prefix) > MAX_TENANT_PREFIX_LENGTH:
+                        prefix = tenant_prefix(prefix, tenant_id)
+                    block = self._blocks[key] = [prefix, start, start + max(block_size, needed)]
+
+                taken = min(count - len(numbers), block[2] - block[1])
+                numbers.extend(
+                    f"{label}-{block[0]}-{value:0{width}d}" for value in range(block[1], block[1] + taken)
+                )
+                block[1] += taken
+
+        return numbers
+
+    def next_number(self, tenant_id, name):
+        return self.allocate(tenant_id, name, 1)[0]
+
+number_allocator = NumberAllocator()
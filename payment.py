@@ -45,10 +45,13 @@ class Invoice(BaseModel):
 
     tenant_id = db.Column(db.String(36), db.ForeignKey('tenants.id'), nullable=False)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    course_id = db.Column(db.String(36), db.ForeignKey('courses.id'))  # Set for course fees, used by reports
 
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)
     due_date = db.Column(db.Date, nullable=False)
     total_amount = db.Column(db.Numeric(12, 2), nullable=False)
+    # Sum of completed payments, maintained by Invoice.apply_payment
+    paid_amount = db.Column(db.Numeric(12, 2), default=0, nullable=False)
     currency = db.Column(db.String(3), default='USD')
 
     line_items = db.Column(db.JSON, nullable=False)  # [{ description, amount, quantity }]
@@ -64,6 +67,9 @@ class Invoice(BaseModel):
         'tax_rate': 0,
     })
 
+    # Supports keyset pagination of a tenant's invoice list
+    __table_args__ = (db.Index('ix_invoices_tenant_created', 'tenant_id', 'created_at', 'id'),)
+
     # Relationships
     tenant = db.relationship('Tenant')
     user = db.relationship('User')
@@ -71,17 +77,96 @@ class Invoice(BaseModel):
 
     @property
     def amount_paid(self):
-        return sum(payment.amount for payment in self.payments.filter_by(status='completed'))
+        return self.paid_amount or 0
 
     @property
     def balance_due(self):
         return self.total_amount - self.amount_paid
 
+    @staticmethod
+    def apply_payment(invoice_id, amount, paid_at=None):
+        """Add a completed payment to paid_amount and mark the invoice paid once covered"""
+        db.session.execute(
+            db.update(Invoice)
+            .where(Invoice.id == invoice_id)
+            .values(paid_amount=Invoice.paid_amount + amount)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            db.update(Invoice)
+            .where(
+                Invoice.id == invoice_id,
+                Invoice.paid_amount >= Invoice.total_amount,
+                Invoice.status != 'paid'
+            )
+            .values(status='paid', paid_at=paid_at or datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
     def to_dict(self):
         data = super().to_dict()
         # Convert Decimal to float for JSON serialization
         if data.get('total_amount'):
             data['total_amount'] = float(data['total_amount'])
+        data.pop('paid_amount', None)
         data['amount_paid'] = float(self.amount_paid)
         data['balance_due'] = float(self.balance_due)
         return data
+
+class WebhookEvent(BaseModel):
+    __tablename__ = 'webhook_events'
+
+    # Inbox of gateway events; the unique event id makes redeliveries no-ops
+    provider = db.Column(db.String(20), nullable=False, default='stripe')
+    event_id = db.Column(db.String(255), nullable=False)
+    event_type = db.Column(db.String(100), nullable=False)
+    # Events with the same key (the payment intent) are processed in the order
+    # the gateway created them (its 'created' timestamp), then in arrival order
+    ordering_key = db.Column(db.String(255))
+    event_created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.JSON, nullable=False)
+
+    status = db.Column(db.Enum('received', 'processing', 'processed', 'ignored', 'failed'), default='received')
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('provider', 'event_id', name='uq_webhook_events_provider_event'),
+        db.Index('ix_webhook_events_status_received', 'status', 'received_at'),
+        db.Index('ix_webhook_events_ordering', 'ordering_key', 'event_created_at', 'received_at'),
+    )
+
+class RevenueDaily(BaseModel):
+    __tablename__ = 'revenue_daily'
+
+    # Pre-aggregated payments per day, maintained by app.services.financial_reports
+    tenant_id = db.Column(db.String(36), db.ForeignKey('tenants.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    course_id = db.Column(db.String(36))  # '' for payments not tied to a course
+    payment_method = db.Column(db.String(20), nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+
+    payments_count = db.Column(db.Integer, default=0, nullable=False)
+    gross_amount = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    refunds_count = db.Column(db.Integer, default=0, nullable=False)
+    refunded_amount = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'day', 'course_id', 'payment_method', 'currency',
+                            name='uq_revenue_daily_key'),
+    )
+
+class BillingRun(BaseModel):
+    __tablename__ = 'billing_runs'
+
+    # One row per bulk invoicing job; the unique key makes a resubmitted job a no-op
+    tenant_id = db.Column(db.String(36), db.ForeignKey('tenants.id'), nullable=False)
+    idempotency_key = db.Column(db.String(255), nullable=False)
+    summary = db.Column(db.JSON)  # Final summary, returned again for duplicates
+
+    __table_args__ = (
+        db.UniqueConstraint('tenant_id', 'idempotency_key', name='uq_billing_runs_tenant_key'),
+    )
@@ -1,27 +1,33 @@
-from app.models import db, Payment, Invoice, User
+from app.models import db, Payment, Invoice, User, Enrollment
+from app.models.payment import BillingRun
+from app.utils.number_allocator import number_allocator
+from app.services.financial_reports import record_payment
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+import stripe
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
 
 class PaymentService:
     @staticmethod
     def create_invoice(tenant_id, user_id, due_date, line_items, **kwargs):
         """Create a new invoice"""
 
-        # Calculate total amount
-        total_amount = sum(item.get('amount', 0) * item.get('quantity', 1) for item in line_items)
-
-        # Apply tax if provided
-        tax_rate = kwargs.get('tax_rate', 0)
-        tax_amount = total_amount * (tax_rate / 100)
-        total_amount += tax_amount
+        line_items, tax_rate, tax_amount, total_amount = PaymentService.calculate_invoice_totals(
+            line_items, kwargs.get('tax_rate', 0)
+        )
 
         # Generate invoice number
-        invoice_number = PaymentService.generate_invoice_number()
+        invoice_number = PaymentService.generate_invoice_number(tenant_id)
 
         invoice = Invoice(
             id=str(uuid.uuid4()),
             tenant_id=tenant_id,
             user_id=user_id,
+            course_id=kwargs.get('course_id'),
             invoice_number=invoice_number,
             due_date=due_date,
             total_amount=total_amount,
@@ -29,8 +35,8 @@ class PaymentService:
             invoice_metadata={
                 'notes': kwargs.get('notes'),
                 'terms': kwargs.get('terms'),
-                'tax_rate': tax_rate,
-                'tax_amount': tax_amount
+                'tax_rate': float(tax_rate),
+                'tax_amount': float(tax_amount)
             }
         )
 
@@ -39,6 +45,191 @@ class PaymentService:
 
         return invoice
 
+    @staticmethod
+    def calculate_invoice_totals(line_items, tax_rate=0):
+        """Validate line items and compute (items, tax_rate, tax_amount, total) with Decimal.
+
+        Line totals are rounded to cents before summing and tax is rounded
+        once on the subtotal, half up. Negative lines (discounts) are allowed
+        as long as the subtotal is not negative.
+        """
+        if not line_items:
+            raise ValueError("At least one line item is required")
+
+        try:
+            tax_rate = Decimal(str(tax_rate or 0))
+        except InvalidOperation:
+            raise ValueError("Invalid tax rate")
+        if tax_rate < 0:
+            raise ValueError("Invalid tax rate")
+
+        items = []
+        subtotal = Decimal('0')
+        for item in line_items:
+            try:
+                amount = Decimal(str(item.get('amount', 0))).quantize(CENT, ROUND_HALF_UP)
+                quantity = int(item.get('quantity', 1))
+            except (InvalidOperation, TypeError, ValueError, AttributeError):
+                raise ValueError("Line items need a numeric amount and quantity")
+            if quantity < 1:
+                raise ValueError("Line item quantities must be positive")
+
+            subtotal += (amount * quantity).quantize(CENT, ROUND_HALF_UP)
+            # JSON column: amounts are stored as numbers rounded to cents
+            items.append({**item, 'amount': float(amount), 'quantity': quantity})
+
+        if subtotal < 0:
+            raise ValueError("Invoice total cannot be negative")
+
+        tax_amount = (subtotal * tax_rate / 100).quantize(CENT, ROUND_HALF_UP)
+        return items, tax_rate, tax_amount, subtotal + tax_amount
+
+    @staticmethod
+    def iter_bulk_invoices(tenant_id, line_items, due_date, course_id=None, batch_id=None,
+                           user_ids=None, chunk_size=500, idempotency_key=None, **kwargs):
+        """Invoice every enrolled student of a course or batch, yielding progress.
+
+        Recipients are resolved and validated in one query, totals are
+        computed once for the shared fee lines, numbers are reserved in one
+        block and invoices are inserted in chunks in a single transaction.
+        A run submitted again with the same idempotency_key bills nobody and
+        returns the summary of the first one.
+        """
+        if not course_id and not batch_id:
+            raise ValueError("Course or batch required")
+        if idempotency_key is not None and (
+            not isinstance(idempotency_key, str) or not 0 < len(idempotency_key) <= 255
+        ):
+            raise ValueError("Idempotency key must be a string of 1 to 255 characters")
+        chunk_size = max(1, chunk_size)
+        if kwargs.get('status', 'draft') not in ('draft', 'sent'):
+            raise ValueError("Status must be draft or sent")
+
+        if isinstance(due_date, str):
+            try:
+                due_date = datetime.strptime(due_date, '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError("Due date must be YYYY-MM-DD")
+        if not isinstance(due_date, date):
+            raise ValueError("Due date required")
+
+        items, tax_rate, tax_amount, total_amount = PaymentService.calculate_invoice_totals(
+            line_items, kwargs.get('tax_rate', 0)
+        )
+
+        query = db.session.query(Enrollment.user_id).join(User, User.id == Enrollment.user_id).filter(
+            User.tenant_id == tenant_id,
+            Enrollment.status.in_(['pending', 'confirmed'])
+        )
+        if course_id:
+            query = query.filter(Enrollment.course_id == course_id)
+        if batch_id:
+            query = query.filter(Enrollment.batch_id == batch_id)
+        if user_ids is not None:
+            query = query.filter(Enrollment.user_id.in_(user_ids))
+
+        if idempotency_key:
+            previous = PaymentService._billing_run_summary(tenant_id, idempotency_key)
+            if previous:
+                yield previous
+                return
+
+        recipients = list(dict.fromkeys(user_id for user_id, in query))
+        # Requested users that are not enrolled students of this tenant
+        found = set(recipients)
+        skipped = [user_id for user_id in dict.fromkeys(user_ids or []) if user_id not in found]
+
+        numbers = number_allocator.allocate(tenant_id, 'invoice', len(recipients)) if recipients else []
+
+        billing_run = str(uuid.uuid4())
+        invoice_metadata = {
+            'notes': kwargs.get('notes'),
+            'terms': kwargs.get('terms'),
+            'tax_rate': float(tax_rate),
+            'tax_amount': float(tax_amount),
+            'billing_run': billing_run
+        }
+
+        now = datetime.utcnow()
+        created = 0
+        try:
+            if idempotency_key:
+                # Claimed before any invoice is written: a concurrent submit of
+                # the same key waits on this row and then fails to insert it
+                db.session.execute(db.insert(BillingRun).values(
+                    id=billing_run,
+                    tenant_id=tenant_id,
+                    idempotency_key=idempotency_key,
+                    created_at=now,
+                    updated_at=now
+                ))
+
+            for start in range(0, len(recipients), chunk_size):
+                rows = [{
+                    'id': str(uuid.uuid4()),
+                    'tenant_id': tenant_id,
+                    'user_id': user_id,
+                    'course_id': course_id,
+                    'invoice_number': invoice_number,
+                    'due_date': due_date,
+                    'total_amount': total_amount,
+                    'paid_amount': Decimal('0'),
+                    'currency': kwargs.get('currency', 'USD'),
+                    'line_items': items,
+                    'status': kwargs.get('status', 'draft'),
+                    'sent_at': now if kwargs.get('status') == 'sent' else None,
+                    'invoice_metadata': invoice_metadata,
+                    'created_at': now,
+                    'updated_at': now
+                } for user_id, invoice_number in zip(
+                    recipients[start:start + chunk_size], numbers[start:start + chunk_size]
+                )]
+                db.session.execute(db.insert(Invoice), rows)
+                created += len(rows)
+                yield {'processed': created, 'total': len(recipients)}
+
+            summary = {
+                'billing_run': billing_run,
+                'created': created,
+                'skipped': skipped,
+                'total_amount_per_invoice': float(total_amount),
+                'total_billed': float(total_amount * created),
+                'done': True
+            }
+            if idempotency_key:
+                db.session.execute(
+                    db.update(BillingRun).where(BillingRun.id == billing_run).values(summary=summary)
+                )
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            previous = idempotency_key and PaymentService._billing_run_summary(tenant_id, idempotency_key)
+            if not previous:
+                raise
+            yield previous
+            return
+        except Exception:
+            db.session.rollback()
+            raise
+
+        yield summary
+
+    @staticmethod
+    def _billing_run_summary(tenant_id, idempotency_key):
+        """Summary of an earlier run with this key, marked as a duplicate, or None"""
+        run = BillingRun.query.filter_by(tenant_id=tenant_id, idempotency_key=idempotency_key).first()
+        if not run:
+            return None
+        return {**run.summary, 'duplicate': True}
+
+    @staticmethod
+    def bulk_create_invoices(tenant_id, line_items, due_date, **kwargs):
+        """Run a bulk invoicing job and return the final summary"""
+        summary = None
+        for summary in PaymentService.iter_bulk_invoices(tenant_id, line_items, due_date, **kwargs):
+            pass
+        return summary
+
     @staticmethod
     def create_payment(tenant_id, user_id, invoice_id, amount, payment_method, **kwargs):
         """Create a payment record"""
@@ -50,6 +241,8 @@ class PaymentService:
             invoice_id=invoice_id,
             amount=amount,
             payment_method=payment_method,
+            # The gateway's payment intent; webhook events are matched on it
+            gateway_transaction_id=kwargs.get('gateway_transaction_id'),
             payment_metadata={
                 'description': kwargs.get('description'),
                 'tax_amount': kwargs.get('tax_amount', 0),
@@ -73,46 +266,78 @@ class PaymentService:
     def confirm_payment(payment_id, gateway_transaction_id=None):
         """Confirm a payment as completed"""
 
-        payment = Payment.query.get(payment_id)
+        payment = Payment.query.filter_by(id=payment_id).with_for_update().first()
         if not payment:
             raise ValueError("Payment not found")
 
-        payment.status = 'completed'
-        payment.paid_at = datetime.utcnow()
-
         if gateway_transaction_id:
             payment.gateway_transaction_id = gateway_transaction_id
 
-        # Update related invoice status
-        invoice = payment.invoice
-        if invoice.amount_paid >= invoice.total_amount:
-            invoice.status = 'paid'
-            invoice.paid_at = datetime.utcnow()
+        # Confirming twice must not count the amount twice, and a replayed or
+        # late success event must not revive a refunded payment
+        if payment.status not in ('completed', 'refunded'):
+            payment.status = 'completed'
+            payment.paid_at = datetime.utcnow()
+
+            course_id = None
+            if payment.invoice_id:
+                Invoice.apply_payment(payment.invoice_id, payment.amount, payment.paid_at)
+                course_id = db.session.query(Invoice.course_id).filter_by(id=payment.invoice_id).scalar()
+
+            # Keep the daily revenue rollup in step, in the same transaction
+            record_payment(payment, course_id)
 
         db.session.commit()
 
         return payment
 
     @staticmethod
-    def handle_stripe_webhook(payload, signature):
-        """Handle Stripe webhook events"""
-        # This is a simplified version - in a real app, you'd verify the signature
-        # and process different Stripe event types
+    def reconcile_invoice_totals(invoice_ids=None):
+        """Recompute Invoice.paid_amount from completed payments"""
+        totals = db.session.query(
+            Payment.invoice_id, db.func.coalesce(db.func.sum(Payment.amount), 0)
+        ).filter(
+            Payment.invoice_id.isnot(None),
+            Payment.status == 'completed'
+        ).group_by(Payment.invoice_id)
+
+        invoices = Invoice.query
+        if invoice_ids is not None:
+            totals = totals.filter(Payment.invoice_id.in_(invoice_ids))
+            invoices = invoices.filter(Invoice.id.in_(invoice_ids))
+
+        paid = dict(totals.all())
+
+        updated = 0
+        for invoice in invoices.with_for_update().all():
+            amount = paid.get(invoice.id, 0)
+            if invoice.paid_amount != amount:
+                invoice.paid_amount = amount
+                updated += 1
+
+        db.session.commit()
+        return updated
 
-        import json
-        event = json.loads(payload)
+    @staticmethod
+    def handle_stripe_webhook(payload, signature):
+        """Verify and store a Stripe webhook event in the inbox for the webhook workers.
 
-        if event.get('type') == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            # Find and confirm the payment
-            payment = Payment.query.filter_by(
-                gateway_transaction_id=payment_intent['id']
-            ).first()
+        Returns (event_id, duplicate); the event's effects are applied by
+        app.services.webhook_inbox.process_events.
+        """
+        from app.services.webhook_inbox import ingest_event
 
-            if payment:
-                PaymentService.confirm_payment(payment.id, payment_intent['id'])
+        secret = current_app.config.get('STRIPE_WEBHOOK_SECRET')
+        if not secret:
+            raise ValueError("Webhook secret not configured")
+        if not signature:
+            raise ValueError("Webhook signature required")
+        try:
+            stripe.Webhook.construct_event(payload, signature, secret)
+        except stripe.error.SignatureVerificationError:
+            raise ValueError("Invalid webhook signature")
 
-        return event
+        return ingest_event(payload, provider='stripe')
 
     @staticmethod
     def upgrade_subscription(tenant_id, plan, payment_method_id=None):
@@ -157,10 +382,9 @@ class PaymentService:
         return {'tenant': tenant}
 
     @staticmethod
-    def generate_invoice_number():
-        """Generate unique invoice number"""
-        timestamp = int(datetime.utcnow().timestamp())
-        return f"INV-{timestamp}-{str(uuid.uuid4())[:6].upper()}"
+    def generate_invoice_number(tenant_id):
+        """Next invoice number of the tenant, e.g. INV-ACME-000042"""
+        return number_allocator.next_number(tenant_id, 'invoice')
 
     @staticmethod
     def get_plan_price(plan):
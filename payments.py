@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify, g
-from app.models import db, Payment, Invoice, User
+from flask import Blueprint, request, jsonify, g, Response, stream_with_context
+from flask_login import current_user
+from app.models import db, Payment, Invoice, User, Course, Batch
 from app.services.payment_service import PaymentService
-from app.utils.decorators import tenant_required, login_required, admin_required
+from app.services.financial_reports import revenue_report, receivables_ageing
+from app.utils.decorators import tenant_required, login_required, admin_required, finance_required
+from app.utils.helpers import keyset_paginate_query, get_keyset_pagination_info
+import json
+from datetime import datetime, timedelta
 
 payments_bp = Blueprint('payments', __name__)
 
@@ -21,6 +26,23 @@ def get_invoices():
         if status != 'all':
             query = query.filter_by(status=status)
 
+        # Cursor mode: ?cursor= (empty for the first page) with optional ?total=
+        if 'cursor' in request.args:
+            try:
+                invoices = keyset_paginate_query(
+                    query, Invoice.created_at, Invoice.id,
+                    cursor=request.args.get('cursor'),
+                    per_page=per_page,
+                    total=request.args.get('total', 'none')
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            return jsonify({
+                'invoices': [invoice.to_dict() for invoice in invoices['items']],
+                'pagination': get_keyset_pagination_info(invoices)
+            })
+
         invoices = query.order_by(Invoice.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -59,6 +81,9 @@ def create_invoice():
         tenant_id=g.tenant_id
     ).first_or_404()
 
+    if data.get('course_id'):
+        Course.query.filter_by(id=data['course_id'], tenant_id=g.tenant_id).first_or_404()
+
     try:
         invoice = PaymentService.create_invoice(
             tenant_id=g.tenant_id,
@@ -66,7 +91,8 @@ def create_invoice():
             due_date=data['due_date'],
             line_items=data['line_items'],
             notes=data.get('notes'),
-            tax_rate=data.get('tax_rate', 0)
+            tax_rate=data.get('tax_rate', 0),
+            course_id=data.get('course_id')
         )
 
         return jsonify({
@@ -77,6 +103,67 @@ def create_invoice():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@payments_bp.route('/invoices/bulk', methods=['POST'])
+@tenant_required
+@admin_required
+def bulk_create_invoices():
+    """Invoice all enrolled students of a course or batch"""
+    data = request.get_json()
+
+    if not data or not data.get('line_items') or not data.get('due_date'):
+        return jsonify({'error': 'Line items and due date required'}), 400
+    if not data.get('course_id') and not data.get('batch_id'):
+        return jsonify({'error': 'Course or batch required'}), 400
+
+    course_id = data.get('course_id')
+    if data.get('batch_id'):
+        batch = Batch.query.join(Course).filter(
+            Batch.id == data['batch_id'],
+            Course.tenant_id == g.tenant_id
+        ).first_or_404()
+        course_id = course_id or batch.course_id
+    Course.query.filter_by(id=course_id, tenant_id=g.tenant_id).first_or_404()
+
+    kwargs = dict(
+        course_id=course_id,
+        batch_id=data.get('batch_id'),
+        user_ids=data.get('user_ids'),
+        tax_rate=data.get('tax_rate', 0),
+        notes=data.get('notes'),
+        terms=data.get('terms'),
+        currency=data.get('currency', 'USD'),
+        status=data.get('status', 'draft'),
+        chunk_size=min(max(request.args.get('chunk_size', 500, type=int), 1), 5000),
+        # Resubmitting with the same key returns the first run instead of billing again
+        idempotency_key=data.get('idempotency_key') or request.headers.get('Idempotency-Key')
+    )
+
+    # ?progress=1 streams one JSON line per inserted chunk, then the summary
+    if request.args.get('progress'):
+        def generate():
+            try:
+                for progress in PaymentService.iter_bulk_invoices(
+                    g.tenant_id, data['line_items'], data['due_date'], **kwargs
+                ):
+                    yield json.dumps(progress) + '\n'
+            except ValueError as e:
+                yield json.dumps({'error': str(e), 'done': True}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    try:
+        summary = PaymentService.bulk_create_invoices(g.tenant_id, data['line_items'], data['due_date'], **kwargs)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if summary.get('duplicate'):
+        return jsonify({'message': 'Billing run already processed', 'summary': summary}), 200
+
+    return jsonify({
+        'message': f"Created {summary['created']} invoices",
+        'summary': summary
+    }), 201 if summary['created'] else 200
+
 @payments_bp.route('/invoices/<invoice_id>', methods=['GET'])
 @tenant_required
 @login_required
@@ -130,6 +217,31 @@ def create_payment():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@payments_bp.route('/reports', methods=['GET'])
+@tenant_required
+@finance_required
+def get_reports():
+    """Revenue, refund rates and receivables ageing from the daily rollups"""
+    group_by = request.args.get('group_by', 'day')
+
+    try:
+        until = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') \
+            else datetime.utcnow().date()
+        since = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') \
+            else until - timedelta(days=30)
+        # 'to' is inclusive for callers; the rollup query is end-exclusive
+        revenue = revenue_report(g.tenant_id, since, until + timedelta(days=1), group_by)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'from': since.isoformat(),
+        'to': until.isoformat(),
+        'group_by': group_by,
+        'revenue': revenue,
+        'receivables_ageing': receivables_ageing(g.tenant_id)
+    })
+
 @payments_bp.route('/webhook/stripe', methods=['POST'])
 def stripe_webhook():
     """Handle Stripe webhook events"""
@@ -137,14 +249,10 @@ def stripe_webhook():
     sig_header = request.headers.get('Stripe-Signature')
 
     try:
-        event = PaymentService.handle_stripe_webhook(payload, sig_header)
-
-        # Process the event
-        if event['type'] == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            PaymentService.confirm_payment(payment_intent['id'])
+        # Persisted and acknowledged at once; the webhook workers apply it
+        event_id, duplicate = PaymentService.handle_stripe_webhook(payload, sig_header)
 
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'event_id': event_id, 'duplicate': duplicate})
 
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -0,0 +1,107 @@
+import threading
+import time
+from flask import current_app
+from app.extensions import db
+from app.models.enrollment import Enrollment
+
+class ProgressBuffer:
+    """Coalesces enrollment progress updates in memory and writes them in batches.
+
+    Only the latest progress value and the summed time spent are kept per
+    enrollment between flushes, which BufferFlusher runs outside requests.
+    Completions bypass the buffer (see record_progress) so completed_at is
+    set when it happens.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def add(self, enrollment_id, progress, time_spent_seconds=0):
+        with self._lock:
+            _, seconds = self._pending.get(enrollment_id, (None, 0))
+            self._pending[enrollment_id] = (progress, seconds + time_spent_seconds)
+
+    def pop(self, enrollment_id):
+        """Remove and return (progress, seconds) of an enrollment, or None"""
+        with self._lock:
+            return self._pending.pop(enrollment_id, None)
+
+    def pending_progress(self, enrollment_id):
+        with self._lock:
+            pending = self._pending.get(enrollment_id)
+            return pending[0] if pending else None
+
+    def flush_if_due(self):
+        interval = current_app.config.get('ENROLLMENT_PROGRESS_FLUSH_SECONDS', 10)
+        max_pending = current_app.config.get('ENROLLMENT_PROGRESS_MAX_PENDING', 5000)
+        if time.monotonic() - self._last_flush >= interval or len(self._pending) >= max_pending:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered progress with one bulk UPDATE by primary key"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        table = Enrollment.__table__
+        rows = [{
+            'b_id': enrollment_id,
+            'b_progress': progress,
+            'b_seconds': seconds
+        } for enrollment_id, (progress, seconds) in pending.items()]
+
+        try:
+            # A transaction of its own: never the session of a request. The
+            # progress of a completed enrollment is never overwritten, and
+            # time spent is added in SQL so concurrent writers cannot lose it
+            with db.engine.begin() as connection:
+                connection.execute(
+                    table.update().where(table.c.id == db.bindparam('b_id')).values(
+                        progress_decimal=db.case(
+                            (table.c.status == 'completed', table.c.progress_decimal),
+                            else_=db.bindparam('b_progress')
+                        ),
+                        time_spent_seconds=table.c.time_spent_seconds + db.bindparam('b_seconds')
+                    ),
+                    rows
+                )
+        except Exception:
+            # Keep the updates for the next flush, merged with newer ones
+            with self._lock:
+                for enrollment_id, (progress, seconds) in pending.items():
+                    newer = self._pending.get(enrollment_id)
+                    self._pending[enrollment_id] = (
+                        newer[0] if newer else progress,
+                        seconds + (newer[1] if newer else 0)
+                    )
+            raise
+
+        return len(rows)
+
+def record_progress(enrollment, progress, time_spent_seconds=0):
+    """Buffer a progress update, or apply it at once when it completes the enrollment"""
+    progress = min(100, max(0, progress))
+    # A single update cannot account for more than ENROLLMENT_PROGRESS_MAX_SECONDS
+    time_spent_seconds = min(
+        max(0, int(time_spent_seconds or 0)),
+        current_app.config.get('ENROLLMENT_PROGRESS_MAX_SECONDS', 3600)
+    )
+
+    if progress < 100 or enrollment.status == 'completed':
+        # Only an append: BufferFlusher writes the buffer from its own thread
+        progress_buffer.add(enrollment.id, progress, time_spent_seconds)
+        return False
+
+    # Completion: write now together with anything still buffered for it
+    pending = progress_buffer.pop(enrollment.id)
+    Enrollment.add_time_spent(enrollment.id, time_spent_seconds + (pending[1] if pending else 0))
+    enrollment.update_progress(progress)
+    db.session.commit()
+    return True
+
+progress_buffer = ProgressBuffer()
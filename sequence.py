@@ -0,0 +1,14 @@
+from app.extensions import db
+from app.models.base import BaseModel
+
+class NumberSequence(BaseModel):
+    __tablename__ = 'number_sequences'
+
+    # One counter per tenant and document type ('invoice', 'certificate'),
+    # handed out in blocks by app.services.number_allocator
+    tenant_id = db.Column(db.String(36), db.ForeignKey('tenants.id'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+    prefix = db.Column(db.String(50), nullable=False)  # Tenant part of the number, e.g. ACME
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+
+    __table_args__ = (db.UniqueConstraint('tenant_id', 'name', name='uq_number_sequences_tenant_name'),)
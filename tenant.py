@@ -1,6 +1,60 @@
 from app.extensions import db
 from app.models.base import BaseModel
+from app.utils.usage_buffer import usage_buffer
 from datetime import datetime
+from types import MappingProxyType
+
+def _build_tier_features():
+    """Build the read-only feature/limit table for every subscription tier"""
+    paid = ['starter', 'professional', 'enterprise']
+    premium = ['professional', 'enterprise']
+    storage_limits = {
+        'free': 500 * 1024 * 1024,  # 500MB
+        'starter': 5 * 1024 * 1024 * 1024,  # 5GB
+        'professional': 50 * 1024 * 1024 * 1024,  # 50GB
+        'enterprise': 250 * 1024 * 1024 * 1024,  # 250GB
+    }
+    max_students = {
+        'free': 50,
+        'starter': 500,
+        'professional': 2000,
+        'enterprise': None,  # unlimited
+    }
+    max_courses = {
+        'free': 3,
+        'starter': 20,
+        'professional': None,  # unlimited
+        'enterprise': None,  # unlimited
+    }
+    max_instructors = {
+        'free': 5,
+        'starter': 20,
+        'professional': 100,
+        'enterprise': None,  # unlimited
+    }
+
+    return MappingProxyType({
+        tier: MappingProxyType({
+            'custom_domain': tier in premium,
+            'advanced_analytics': tier in premium,
+            'api_access': tier in premium,
+            'white_label': tier in premium,
+            'payment_integration': tier in paid,
+            'scorm_support': tier in paid,
+            'multi_branch': tier in premium,
+            'sso_integration': tier == 'enterprise',
+            'storage_limit': storage_limits[tier],
+            'max_students': max_students[tier],
+            'max_courses': max_courses[tier],
+            'max_instructors': max_instructors[tier],
+        })
+        for tier in ['free', 'starter', 'professional', 'enterprise']
+    })
+
+TIER_FEATURES = _build_tier_features()
+
+# Settings keys that tenant admins must not write through the settings API
+PROTECTED_SETTINGS = frozenset({'feature_overrides', 'custom_domain'})
 
 class Tenant(BaseModel):
     __tablename__ = 'tenants'
@@ -17,6 +71,15 @@ class Tenant(BaseModel):
     stripe_customer_id = db.Column(db.String(100))
     stripe_subscription_id = db.Column(db.String(100))
 
+    # Per-tenant exceptions to the tier features; platform admins only
+    feature_overrides = db.Column(db.JSON)
+
+    # Custom domain: only a domain proven through a DNS TXT record is routed
+    custom_domain = db.Column(db.String(255), unique=True)
+    pending_custom_domain = db.Column(db.String(255))
+    custom_domain_token = db.Column(db.String(64))
+    custom_domain_verified_at = db.Column(db.DateTime)
+
     # Settings and branding
     settings = db.Column(db.JSON, default=lambda: {
         'timezone': 'UTC',
@@ -44,62 +107,32 @@ class Tenant(BaseModel):
 
     def to_dict(self):
         data = super().to_dict()
-        data['features'] = self.features
+        data['features'] = dict(self.features)
         return data
 
     @property
     def features(self):
-        """Return feature flags based on subscription tier"""
-        return {
-            'custom_domain': self.subscription_tier in ['professional', 'enterprise'],
-            'advanced_analytics': self.subscription_tier in ['professional', 'enterprise'],
-            'api_access': self.subscription_tier in ['professional', 'enterprise'],
-            'white_label': self.subscription_tier in ['professional', 'enterprise'],
-            'payment_integration': self.subscription_tier in ['starter', 'professional', 'enterprise'],
-            'scorm_support': self.subscription_tier in ['starter', 'professional', 'enterprise'],
-            'multi_branch': self.subscription_tier in ['professional', 'enterprise'],
-            'sso_integration': self.subscription_tier == 'enterprise',
-            'storage_limit': self.get_storage_limit(),
-            'max_students': self.get_max_students(),
-            'max_courses': self.get_max_courses(),
-            'max_instructors': self.get_max_instructors(),
-        }
+        """Return feature flags and limits for the subscription tier.
+
+        Per-tenant exceptions live in the feature_overrides column, which
+        tenant admins cannot write.
+        """
+        features = TIER_FEATURES.get(self.subscription_tier, TIER_FEATURES['free'])
+        if self.feature_overrides:
+            features = MappingProxyType({**features, **self.feature_overrides})
+        return features
 
     def get_storage_limit(self):
-        limits = {
-            'free': 500 * 1024 * 1024,  # 500MB
-            'starter': 5 * 1024 * 1024 * 1024,  # 5GB
-            'professional': 50 * 1024 * 1024 * 1024,  # 50GB
-            'enterprise': 250 * 1024 * 1024 * 1024,  # 250GB
-        }
-        return limits.get(self.subscription_tier, limits['free'])
+        return self.features['storage_limit']
 
     def get_max_students(self):
-        limits = {
-            'free': 50,
-            'starter': 500,
-            'professional': 2000,
-            'enterprise': None,  # unlimited
-        }
-        return limits.get(self.subscription_tier)
+        return self.features['max_students']
 
     def get_max_courses(self):
-        limits = {
-            'free': 3,
-            'starter': 20,
-            'professional': None,  # unlimited
-            'enterprise': None,  # unlimited
-        }
-        return limits.get(self.subscription_tier)
+        return self.features['max_courses']
 
     def get_max_instructors(self):
-        limits = {
-            'free': 5,
-            'starter': 20,
-            'professional': 100,
-            'enterprise': None,  # unlimited
-        }
-        return limits.get(self.subscription_tier)
+        return self.features['max_instructors']
 
     def can_add_student(self):
         max_students = self.get_max_students()
@@ -114,11 +147,55 @@ class Tenant(BaseModel):
         return self.course_count < max_courses
 
     def can_use_storage(self, additional_bytes):
-        return (self.storage_used + additional_bytes) <= self.get_storage_limit()
+        storage_used = self.storage_used
+        if usage_buffer.is_buffered(self):
+            storage_used += usage_buffer.pending(self.id)['storage_used']
+        return (storage_used + additional_bytes) <= self.get_storage_limit()
 
     def update_usage(self, student_delta=0, course_delta=0, storage_delta=0):
-        """Update usage counters"""
-        self.student_count += student_delta
-        self.course_count += course_delta
-        self.storage_used += storage_delta
+        """Update usage counters with atomic SQL increments.
+
+        Tenants listed in TENANT_USAGE_BUFFERED_TENANTS append their deltas to
+        tenant_usage_deltas instead, drained into the counters in batches.
+        """
+        if usage_buffer.is_buffered(self):
+            usage_buffer.add(self.id, student_delta, course_delta, storage_delta)
+            db.session.commit()
+            return
+
+        Tenant.apply_usage_deltas(self.id, student_delta, course_delta, storage_delta)
         db.session.commit()
+
+    @staticmethod
+    def apply_usage_deltas(tenant_id, student_delta=0, course_delta=0, storage_delta=0, connection=None):
+        """Increment usage counters in the database without reading them first"""
+        values = {}
+        if student_delta:
+            values['student_count'] = Tenant.student_count + student_delta
+        if course_delta:
+            values['course_count'] = Tenant.course_count + course_delta
+        if storage_delta:
+            values['storage_used'] = Tenant.storage_used + storage_delta
+
+        if not values:
+            return
+
+        if connection is not None:
+            connection.execute(db.update(Tenant).where(Tenant.id == tenant_id).values(**values))
+            return
+
+        db.session.execute(
+            db.update(Tenant)
+            .where(Tenant.id == tenant_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+class TenantUsageDelta(BaseModel):
+    __tablename__ = 'tenant_usage_deltas'
+
+    # Pending usage changes of buffered tenants, see app.utils.usage_buffer
+    tenant_id = db.Column(db.String(36), db.ForeignKey('tenants.id'), nullable=False, index=True)
+    student_delta = db.Column(db.Integer, nullable=False, default=0)
+    course_delta = db.Column(db.Integer, nullable=False, default=0)
+    storage_delta = db.Column(db.BigInteger, nullable=False, default=0)
@@ -1,31 +1,41 @@
 from flask import request, g, abort
-import re
+import copy
+from sqlalchemy.orm import make_transient_to_detached
+from app.extensions import db
 from app.models.tenant import Tenant
+from app.middleware.tenant_resolver import tenant_cache, usage_cache, host_router
+from app.utils.cache import MISSING
 
 class TenantMiddleware:
     def __init__(self, app):
         self.app = app
+        tenant_cache.init_app(app)
+        usage_cache.init_app(app)
+        host_router.init_app(app)
         self.app.before_request(self.identify_tenant)
 
     def identify_tenant(self):
-        # Skip tenant identification for tenant creation endpoints
-        if request.path.startswith('/api/tenants/create'):
+        # Skip tenant identification for tenant creation, health check and
+        # public endpoints
+        if host_router.is_public_path(request.path):
             return
 
-        # Skip for health check and public endpoints
-        if request.path in ['/health', '/api/auth/register']:
-            return
-
-        host = request.host.lower()
+        host = request.host.lower().split(':')[0]
 
-        # Extract subdomain
-        subdomain = self.extract_subdomain(host)
+        # Find tenant by host, going to the database only on a cache miss
+        snapshot = tenant_cache.get(host)
+        if snapshot is MISSING:
+            # Map the host (subdomain or custom domain) to the tenant subdomain
+            subdomain = host_router.resolve(host)
 
-        if not subdomain:
-            abort(400, description="Tenant subdomain required")
+            if not subdomain:
+                abort(400, description="Tenant subdomain required")
 
-        # Find tenant by subdomain
-        tenant = Tenant.query.filter_by(subdomain=f"{subdomain}.xyz.com").first()
+            tenant = Tenant.query.filter_by(subdomain=subdomain).first()
+            snapshot = self.snapshot_tenant(tenant) if tenant else None
+            tenant_cache.set(host, snapshot)
+        else:
+            tenant = self.restore_tenant(snapshot) if snapshot else None
 
         if not tenant:
             abort(404, description="Tenant not found")
@@ -37,17 +47,20 @@ class TenantMiddleware:
         g.tenant = tenant
         g.tenant_id = tenant.id
 
-    def extract_subdomain(self, host):
-        # Remove port if present
-        host = host.split(':')[0]
+    @staticmethod
+    def snapshot_tenant(tenant):
+        """Copy the loaded column values of a tenant for caching"""
+        return copy.deepcopy({
+            column.name: getattr(tenant, column.name)
+            for column in Tenant.__table__.columns
+        })
 
-        # Match subdomain.xyz.com pattern
-        pattern = r'^(?:([a-zA-Z0-9-]+)\.)?xyz\.com$'
-        match = re.match(pattern, host)
+    @staticmethod
+    def restore_tenant(snapshot):
+        """Attach a cached tenant snapshot to the current session without a query"""
+        tenant = Tenant(**copy.deepcopy(snapshot))
+        make_transient_to_detached(tenant)
+        return db.session.merge(tenant, load=False)
 
-        if match:
-            subdomain = match.group(1)
-            if subdomain and subdomain not in ['www', 'app', 'api']:
-                return subdomain
-
-        return None
+    def extract_subdomain(self, host):
+        return host_router.extract_subdomain(host)
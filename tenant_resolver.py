@@ -0,0 +1,152 @@
+import threading
+import time
+from app.utils.cache import TTLCache
+
+class TenantCache(TTLCache):
+    """Cache of tenant column snapshots keyed by request host (None for unknown hosts)"""
+
+    def __init__(self, app=None, config_prefix='TENANT_CACHE'):
+        super().__init__(app, config_prefix)
+
+    def invalidate_host(self, host):
+        self.invalidate(host)
+
+    def invalidate_tenant(self, tenant_id):
+        """Drop every cached host that resolves to the given tenant"""
+        self.invalidate_where(lambda snapshot: snapshot.get('id') == tenant_id)
+
+tenant_cache = TenantCache()
+usage_cache = TTLCache(config_prefix='TENANT_USAGE_CACHE')
+
+class PathPrefixTrie:
+    """Segment trie answering "is this path public?" in one walk of the path"""
+
+    def __init__(self, prefixes=(), exact_paths=()):
+        self._root = {}
+        for prefix in prefixes:
+            self.add(prefix, exact=False)
+        for path in exact_paths:
+            self.add(path, exact=True)
+
+    def add(self, path, exact=False):
+        node = self._root
+        for segment in path.strip('/').split('/'):
+            node = node.setdefault(segment, {})
+        node['$exact' if exact else '$prefix'] = True
+
+    def matches(self, path):
+        node = self._root
+        for segment in path.strip('/').split('/'):
+            node = node.get(segment)
+            if node is None:
+                return False
+            if '$prefix' in node:
+                return True
+        return '$exact' in node
+
+class HostRouter:
+    """Maps request hosts to the tenant subdomain they belong to.
+
+    Built once per app from MAIN_DOMAIN; verified custom domains of tenants
+    whose features include custom_domain are kept in an in-memory host map.
+    """
+
+    RESERVED_SUBDOMAINS = frozenset(['www', 'app', 'api'])
+    _LABEL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789-')
+
+    def __init__(self, app=None):
+        self.main_domain = 'xyz.com'
+        self.refresh_interval = 300
+        self.public_paths = PathPrefixTrie(
+            prefixes=['/api/tenants/create'],
+            exact_paths=['/health', '/api/auth/register']
+        )
+        self._suffix = '.' + self.main_domain
+        self._custom_domains = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.main_domain = app.config.get('MAIN_DOMAIN', self.main_domain).lower()
+        self.refresh_interval = app.config.get('TENANT_CUSTOM_DOMAIN_REFRESH_SECONDS', self.refresh_interval)
+        self._suffix = '.' + self.main_domain
+        with self._lock:
+            self._custom_domains = {}
+            self._loaded_at = None
+
+    def is_public_path(self, path):
+        return self.public_paths.matches(path)
+
+    def tenant_host(self, slug):
+        """Canonical host (and Tenant.subdomain value) for a tenant slug"""
+        return f"{slug}{self._suffix}"
+
+    def extract_subdomain(self, host):
+        """Return the tenant label of a MAIN_DOMAIN host, or None"""
+        host = host.split(':', 1)[0].lower()
+        if not host.endswith(self._suffix):
+            return None
+
+        label = host[:-len(self._suffix)]
+        if not label or label in self.RESERVED_SUBDOMAINS:
+            return None
+        if not self._LABEL_CHARS.issuperset(label):
+            return None
+        return label
+
+    def resolve(self, host):
+        """Return the Tenant.subdomain value that host routes to, or None"""
+        host = host.split(':', 1)[0].lower()
+        label = self.extract_subdomain(host)
+        if label:
+            return host
+
+        self._ensure_custom_domains()
+        return self._custom_domains.get(host)
+
+    def register_tenant(self, tenant):
+        """Sync the custom domain mapping of a tenant after plan or settings changes"""
+        with self._lock:
+            self._custom_domains = {
+                host: subdomain for host, subdomain in self._custom_domains.items()
+                if subdomain != tenant.subdomain
+            }
+            custom_domain = self._custom_domain_for(tenant)
+            if custom_domain:
+                self._custom_domains[custom_domain] = tenant.subdomain
+
+    def _custom_domain_for(self, tenant):
+        if not tenant.custom_domain or tenant.status != 'active':
+            return None
+        if not tenant.features.get('custom_domain'):
+            return None
+        return tenant.custom_domain
+
+    def _ensure_custom_domains(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_interval:
+            return
+
+        # Imported lazily: the router is created before the models are bound
+        from app.models.tenant import Tenant
+
+        # Plan and overrides are checked per tenant through Tenant.features
+        tenants = Tenant.query.filter(
+            Tenant.custom_domain.isnot(None),
+            Tenant.status == 'active'
+        ).all()
+
+        custom_domains = {}
+        for tenant in tenants:
+            custom_domain = self._custom_domain_for(tenant)
+            if custom_domain:
+                custom_domains[custom_domain] = tenant.subdomain
+
+        with self._lock:
+            self._custom_domains = custom_domains
+            self._loaded_at = time.monotonic()
+
+host_router = HostRouter()
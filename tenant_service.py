@@ -1,4 +1,6 @@
 from app.models import db, Tenant, User, Course
+from app.middleware.tenant_resolver import tenant_cache, usage_cache, host_router
+from app.utils.cache import MISSING
 import uuid
 from datetime import datetime
 
@@ -20,8 +22,8 @@ class TenantService:
             id=str(uuid.uuid4()),
             name=tenant_data['name'],
             slug=tenant_data['slug'],
-            subdomain=f"{tenant_data['slug']}.xyz.com",
-            settings=tenant_data.get('settings', {}),
+            subdomain=host_router.tenant_host(tenant_data['slug']),
+            settings=TenantService.clean_settings(tenant_data.get('settings', {})),
             branding=tenant_data.get('branding', {})
         )
 
@@ -40,6 +42,126 @@ class TenantService:
         db.session.add(admin_user)
 
         db.session.commit()
+
+        # Forget any cached "unknown host" answer for the new subdomain
+        tenant_cache.invalidate_host(tenant.subdomain)
+
+        return tenant
+
+    @staticmethod
+    def clean_settings(settings):
+        """Drop settings keys tenant admins are not allowed to set"""
+        from app.models.tenant import PROTECTED_SETTINGS
+
+        if not isinstance(settings, dict):
+            raise ValueError("Settings must be an object")
+        return {key: value for key, value in settings.items() if key not in PROTECTED_SETTINGS}
+
+    @staticmethod
+    def set_feature_overrides(slug, overrides):
+        """Replace a tenant's feature overrides (platform administration only)"""
+        from app.models.tenant import TIER_FEATURES
+
+        tenant = Tenant.query.filter_by(slug=slug).first()
+        if not tenant:
+            raise ValueError("Tenant not found")
+
+        if overrides is not None:
+            if not isinstance(overrides, dict):
+                raise ValueError("Feature overrides must be an object")
+            unknown = set(overrides) - set(TIER_FEATURES['free'])
+            if unknown:
+                raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
+
+        tenant.feature_overrides = overrides or None
+        db.session.commit()
+        tenant_cache.invalidate_tenant(tenant.id)
+        return tenant
+
+    @staticmethod
+    def request_custom_domain(tenant, domain):
+        """Start verification of a custom domain; returns the TXT record to publish"""
+        import re
+        import secrets
+        from flask import current_app
+
+        if not tenant.features.get('custom_domain'):
+            raise ValueError("Custom domains are not included in your plan")
+
+        domain = (domain or '').strip().lower().rstrip('.')
+        if len(domain) > 253 or not re.match(
+            r'^(?=.{1,253}$)([a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$', domain
+        ):
+            raise ValueError("Invalid domain name")
+
+        main_domain = host_router.main_domain
+        if domain == main_domain or domain.endswith('.' + main_domain):
+            raise ValueError("Subdomains of the platform domain cannot be used")
+
+        owner = Tenant.query.filter(Tenant.custom_domain == domain).first()
+        if owner and owner.id != tenant.id:
+            raise ValueError("Domain is already in use")
+
+        tenant.pending_custom_domain = domain
+        tenant.custom_domain_token = secrets.token_hex(16)
+        db.session.commit()
+        tenant_cache.invalidate_tenant(tenant.id)
+
+        prefix = current_app.config.get('CUSTOM_DOMAIN_VERIFICATION_PREFIX', '_lms-verification')
+        return {'type': 'TXT', 'name': f"{prefix}.{domain}", 'value': tenant.custom_domain_token}
+
+    @staticmethod
+    def verify_custom_domain(tenant):
+        """Activate the pending custom domain once its TXT record is published"""
+        import dns.exception
+        import dns.resolver
+        from flask import current_app
+        from sqlalchemy.exc import IntegrityError
+
+        domain = tenant.pending_custom_domain
+        if not domain or not tenant.custom_domain_token:
+            raise ValueError("No custom domain awaiting verification")
+        if not tenant.features.get('custom_domain'):
+            raise ValueError("Custom domains are not included in your plan")
+
+        prefix = current_app.config.get('CUSTOM_DOMAIN_VERIFICATION_PREFIX', '_lms-verification')
+        try:
+            answers = dns.resolver.resolve(f"{prefix}.{domain}", 'TXT', lifetime=5)
+            records = {b''.join(answer.strings).decode('utf-8', 'replace') for answer in answers}
+        except dns.exception.DNSException:
+            records = set()
+
+        if tenant.custom_domain_token not in records:
+            raise ValueError("Verification TXT record not found")
+
+        tenant.custom_domain = domain
+        tenant.pending_custom_domain = None
+        tenant.custom_domain_token = None
+        tenant.custom_domain_verified_at = datetime.utcnow()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise ValueError("Domain is already in use")
+
+        tenant_cache.invalidate_tenant(tenant.id)
+        host_router.register_tenant(tenant)
+        return tenant
+
+    @staticmethod
+    def remove_custom_domain(tenant):
+        """Stop routing the tenant's custom domain"""
+        domain = tenant.custom_domain
+        tenant.custom_domain = None
+        tenant.pending_custom_domain = None
+        tenant.custom_domain_token = None
+        tenant.custom_domain_verified_at = None
+        db.session.commit()
+
+        tenant_cache.invalidate_tenant(tenant.id)
+        if domain:
+            tenant_cache.invalidate_host(domain)
+        host_router.register_tenant(tenant)
         return tenant
 
     @staticmethod
@@ -82,4 +204,127 @@ class TenantService:
         tenant.subscription_expires_at = datetime.utcnow().replace(year=datetime.utcnow().year + 1)
 
         db.session.commit()
+        tenant_cache.invalidate_tenant(tenant.id)
+        host_router.register_tenant(tenant)
         return tenant
+
+    @staticmethod
+    def reconcile_usage(tenant_ids=None):
+        """Correct usage counters from users, courses and materials.
+
+        Counters, undrained deltas and source rows are read in one snapshot
+        (REPEATABLE READ), and the drift found there is applied as an
+        increment. Deltas drained or appended after the snapshot therefore
+        keep counting once, and nothing is counted twice.
+        """
+        from app.models import Material
+        from app.models.tenant import TenantUsageDelta
+
+        # Start a fresh transaction at an isolation level with a stable snapshot
+        dialect = db.engine.dialect.name
+        db.session.rollback()
+        db.session.connection(execution_options={
+            'isolation_level': 'SERIALIZABLE' if dialect == 'sqlite' else 'REPEATABLE READ'
+        })
+
+        student_counts = db.session.query(
+            User.tenant_id, db.func.count(User.id)
+        ).filter(
+            User.role == 'student',
+            User.status == 'active'
+        ).group_by(User.tenant_id)
+
+        course_counts = db.session.query(
+            Course.tenant_id, db.func.count(Course.id)
+        ).group_by(Course.tenant_id)
+
+        storage_totals = db.session.query(
+            Course.tenant_id, db.func.coalesce(db.func.sum(Material.size_bytes), 0)
+        ).join(Material, Material.course_id == Course.id).group_by(Course.tenant_id)
+
+        pending_deltas = db.session.query(
+            TenantUsageDelta.tenant_id,
+            db.func.sum(TenantUsageDelta.student_delta),
+            db.func.sum(TenantUsageDelta.course_delta),
+            db.func.sum(TenantUsageDelta.storage_delta)
+        ).group_by(TenantUsageDelta.tenant_id)
+
+        counters = db.session.query(
+            Tenant.id, Tenant.student_count, Tenant.course_count, Tenant.storage_used
+        )
+        if tenant_ids is not None:
+            student_counts = student_counts.filter(User.tenant_id.in_(tenant_ids))
+            course_counts = course_counts.filter(Course.tenant_id.in_(tenant_ids))
+            storage_totals = storage_totals.filter(Course.tenant_id.in_(tenant_ids))
+            pending_deltas = pending_deltas.filter(TenantUsageDelta.tenant_id.in_(tenant_ids))
+            counters = counters.filter(Tenant.id.in_(tenant_ids))
+
+        students = dict(student_counts.all())
+        courses = dict(course_counts.all())
+        storage = dict(storage_totals.all())
+        pending = {tenant_id: deltas for tenant_id, *deltas in pending_deltas.all()}
+
+        updated = 0
+        for tenant_id, student_count, course_count, storage_used in counters.all():
+            deltas = pending.get(tenant_id, (0, 0, 0))
+            drift = (
+                students.get(tenant_id, 0) - (student_count or 0) - int(deltas[0] or 0),
+                courses.get(tenant_id, 0) - (course_count or 0) - int(deltas[1] or 0),
+                int(storage.get(tenant_id, 0)) - (storage_used or 0) - int(deltas[2] or 0),
+            )
+            if any(drift):
+                Tenant.apply_usage_deltas(tenant_id, *drift)
+                updated += 1
+
+        db.session.commit()
+        return updated
+
+    @staticmethod
+    def get_usage_counts(tenant_id):
+        """Return usage counts of a tenant from a single aggregate query"""
+        from app.models import Enrollment
+
+        cached = usage_cache.get(tenant_id)
+        if cached is not MISSING:
+            return cached
+
+        def count_users(role):
+            return db.session.query(db.func.count(User.id)).filter(
+                User.tenant_id == tenant_id,
+                User.role == role,
+                User.status == 'active'
+            ).scalar_subquery()
+
+        def count_courses(*criteria):
+            return db.session.query(db.func.count(Course.id)).filter(
+                Course.tenant_id == tenant_id, *criteria
+            ).scalar_subquery()
+
+        def count_enrollments(*criteria):
+            return db.session.query(db.func.count(Enrollment.id)).join(
+                Course, Enrollment.course_id == Course.id
+            ).filter(Course.tenant_id == tenant_id, *criteria).scalar_subquery()
+
+        # Every count is a scalar subquery of one statement: a single round trip
+        row = db.session.query(
+            count_users('student'),
+            count_users('instructor'),
+            count_courses(),
+            count_courses(Course.is_published == True),
+            count_enrollments(),
+            count_enrollments(Enrollment.status == 'confirmed'),
+            Tenant.storage_used
+        ).filter(Tenant.id == tenant_id).one()
+
+        counts = {
+            'students': row[0],
+            'instructors': row[1],
+            'courses': row[2],
+            'published_courses': row[3],
+            'enrollments': row[4],
+            'confirmed_enrollments': row[5],
+            'storage_used': row[6] or 0,
+        }
+
+        usage_cache.set(tenant_id, counts)
+        return counts
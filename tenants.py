@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, g
-from app.models import db, Tenant, User, Course
+from app.models import db, Tenant
 from app.services.tenant_service import TenantService
-from app.utils.decorators import tenant_required, admin_required
+from app.middleware.tenant_resolver import tenant_cache, usage_cache, host_router
+from app.utils.decorators import tenant_required, admin_required, superadmin_required
 
 tenants_bp = Blueprint('tenants', __name__)
 
@@ -33,7 +34,7 @@ def create_tenant():
         return jsonify({
             'message': 'Tenant created successfully',
             'tenant': tenant.to_dict(),
-            'redirect_url': f"https://{tenant.slug}.xyz.com"
+            'redirect_url': f"https://{tenant.subdomain}"
         }), 201
 
     except ValueError as e:
@@ -65,51 +66,111 @@ def manage_tenant_settings():
     data = request.get_json()
 
     if 'settings' in data:
-        g.tenant.settings = {**g.tenant.settings, **data['settings']}
+        try:
+            settings = TenantService.clean_settings(data['settings'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        g.tenant.settings = {**g.tenant.settings, **settings}
 
     if 'branding' in data:
         g.tenant.branding = {**g.tenant.branding, **data['branding']}
 
     db.session.commit()
+    tenant_cache.invalidate_tenant(g.tenant_id)
+    host_router.register_tenant(g.tenant)
 
     return jsonify({
         'message': 'Settings updated successfully',
         'tenant': g.tenant.to_dict()
     })
 
+@tenants_bp.route('/custom-domain', methods=['POST', 'DELETE'])
+@tenant_required
+@admin_required
+def manage_custom_domain():
+    """Request a custom domain (verified through DNS) or remove the current one"""
+    if request.method == 'DELETE':
+        tenant = TenantService.remove_custom_domain(g.tenant)
+        return jsonify({'message': 'Custom domain removed', 'tenant': tenant.to_dict()})
+
+    data = request.get_json() or {}
+    try:
+        record = TenantService.request_custom_domain(g.tenant, data.get('domain'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'message': 'Publish the DNS record below, then verify the domain',
+        'dns_record': record
+    })
+
+@tenants_bp.route('/custom-domain/verify', methods=['POST'])
+@tenant_required
+@admin_required
+def verify_custom_domain():
+    """Activate the pending custom domain after checking its DNS record"""
+    try:
+        tenant = TenantService.verify_custom_domain(g.tenant)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'message': 'Custom domain verified',
+        'tenant': tenant.to_dict()
+    })
+
 @tenants_bp.route('/usage', methods=['GET'])
 @tenant_required
 @admin_required
 def get_tenant_usage():
     """Get tenant usage statistics"""
-    total_students = User.query.filter_by(
-        tenant_id=g.tenant_id,
-        role='student',
-        status='active'
-    ).count()
+    counts = TenantService.get_usage_counts(g.tenant_id)
 
-    total_courses = Course.query.filter_by(tenant_id=g.tenant_id).count()
-    active_courses = Course.query.filter_by(tenant_id=g.tenant_id, is_published=True).count()
+    limits = g.tenant.features
+    max_students = limits['max_students']
+    max_courses = limits['max_courses']
+    max_instructors = limits['max_instructors']
+    storage_limit = limits['storage_limit']
 
     return jsonify({
         'usage': {
             'students': {
-                'used': total_students,
-                'limit': g.tenant.get_max_students(),
-                'percentage': (total_students / g.tenant.get_max_students() * 100) if g.tenant.get_max_students() else 0
+                'used': counts['students'],
+                'limit': max_students,
+                'percentage': (counts['students'] / max_students * 100) if max_students else 0
             },
             'courses': {
-                'used': total_courses,
-                'limit': g.tenant.get_max_courses(),
-                'percentage': (total_courses / g.tenant.get_max_courses() * 100) if g.tenant.get_max_courses() else 0
+                'used': counts['courses'],
+                'published': counts['published_courses'],
+                'limit': max_courses,
+                'percentage': (counts['courses'] / max_courses * 100) if max_courses else 0
+            },
+            'instructors': {
+                'used': counts['instructors'],
+                'limit': max_instructors,
+                'percentage': (counts['instructors'] / max_instructors * 100) if max_instructors else 0
+            },
+            'enrollments': {
+                'total': counts['enrollments'],
+                'confirmed': counts['confirmed_enrollments']
             },
             'storage': {
-                'used_bytes': g.tenant.storage_used,
-                'limit_bytes': g.tenant.get_storage_limit(),
-                'percentage': (g.tenant.storage_used / g.tenant.get_storage_limit() * 100) if g.tenant.get_storage_limit() else 0
+                'used_bytes': counts['storage_used'],
+                'limit_bytes': storage_limit,
+                'percentage': (counts['storage_used'] / storage_limit * 100) if storage_limit else 0
             }
         },
-        'features': g.tenant.features
+        'features': dict(limits)
+    })
+
+@tenants_bp.route('/cache-stats', methods=['GET'])
+@tenant_required
+@superadmin_required
+def get_tenant_cache_stats():
+    """Get hit/miss counters of this worker's caches (process-wide, so superadmin only)"""
+    return jsonify({
+        'cache': tenant_cache.stats(),
+        'usage_cache': usage_cache.stats()
     })
 
 @tenants_bp.route('/validate-slug/<slug>', methods=['GET'])
@@ -0,0 +1,112 @@
+import uuid
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db as _db
+from app.models.tenant import Tenant
+from app.models.user import User
+
+def pytest_addoption(parser):
+    parser.addoption('--run-benchmarks', action='store_true', help="also run tests marked benchmark")
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "benchmark: opt-in load/latency test (--run-benchmarks)")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-benchmarks'):
+        return
+    skip = pytest.mark.skip(reason="benchmark; run with --run-benchmarks")
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        # A file database so connections of worker threads share the data
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+
+    app = create_app(Config)
+    with app.app_context():
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+
+@pytest.fixture
+def db(app):
+    return _db
+
+@pytest.fixture
+def tenant(db):
+    tenant = Tenant(
+        id=str(uuid.uuid4()),
+        name='Acme Academy',
+        slug='acme',
+        subdomain='acme.xyz.com',
+        student_count=0,
+        course_count=0,
+        storage_used=0
+    )
+    db.session.add(tenant)
+    db.session.commit()
+    return tenant
+
+@pytest.fixture
+def make_user(db, tenant):
+    """Factory adding an active user of the test tenant"""
+    def factory(role='student', **fields):
+        user = User(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant.id,
+            email=f"{uuid.uuid4().hex[:12]}@example.com",
+            password_hash='x',
+            full_name=fields.pop('full_name', f"{role.title()} User"),
+            role=role,
+            status='active',
+            **fields
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    return factory
+
+@pytest.fixture
+def base_url(tenant):
+    """URL root of the test tenant; pass as base_url= so requests carry its Host"""
+    return f"http://{tenant.subdomain}"
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def login(client, base_url):
+    """Authenticate the client's session as a user (Flask-Login session keys)"""
+    def authenticate(user):
+        with client.session_transaction(base_url=base_url) as session:
+            session['_user_id'] = user.id
+            session['_fresh'] = True
+
+    return authenticate
+
+@pytest.fixture
+def count_queries(db):
+    """Context manager collecting the SQL statements executed inside it"""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
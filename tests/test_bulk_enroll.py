@@ -0,0 +1,64 @@
+import uuid
+from datetime import date
+import pytest
+from app.models.course import Batch, Course
+from app.models.enrollment import Enrollment
+from app.services.enrollment_service import EnrollmentService
+
+@pytest.fixture
+def course(db, tenant):
+    course = Course(id=str(uuid.uuid4()), tenant_id=tenant.id, code='C-1', title='Welding', delivery='offline')
+    db.session.add(course)
+    db.session.commit()
+    return course
+
+def add_batch(db, course, capacity, status='upcoming', confirmed=0):
+    batch = Batch(id=str(uuid.uuid4()), course_id=course.id, name=f"Batch {uuid.uuid4().hex[:4]}",
+                  start_date=date(2026, 1, 1), end_date=date(2026, 6, 1),
+                  max_capacity=capacity, status=status, confirmed_count=confirmed)
+    db.session.add(batch)
+    db.session.commit()
+    return batch
+
+def statuses(summary):
+    return [result['status'] for result in summary['results']]
+
+def test_pending_imports_hold_their_places(db, tenant, course, make_user):
+    batch = add_batch(db, course, capacity=3, confirmed=1)
+    students = [make_user('student') for _ in range(4)]
+
+    first = EnrollmentService.bulk_enroll(course.id, tenant.id, [s.id for s in students[:1]])
+    second = EnrollmentService.bulk_enroll(course.id, tenant.id, [s.id for s in students[1:]])
+
+    assert statuses(first) == ['enrolled']
+    assert statuses(second) == ['enrolled', 'no_capacity', 'no_capacity']
+    db.session.expire_all()
+    assert db.session.get(Batch, batch.id).confirmed_count == 1
+
+def test_confirmed_imports_reserve_seats(db, tenant, course, make_user):
+    batch = add_batch(db, course, capacity=2)
+    students = [make_user('student') for _ in range(3)]
+
+    summary = EnrollmentService.bulk_enroll(course.id, tenant.id, [s.id for s in students], status='confirmed')
+
+    assert statuses(summary) == ['enrolled', 'enrolled', 'no_capacity']
+    db.session.expire_all()
+    assert db.session.get(Batch, batch.id).confirmed_count == 2
+
+def test_users_without_an_open_batch_are_reported(db, tenant, course, make_user):
+    add_batch(db, course, capacity=30, status='completed')
+    student = make_user('student')
+
+    summary = EnrollmentService.bulk_enroll(course.id, tenant.id, [student.id])
+
+    assert statuses(summary) == ['no_open_batch']
+    assert summary['enrolled'] == 0
+    assert Enrollment.query.count() == 0
+
+def test_courses_without_batches_enroll_without_one(db, tenant, course, make_user):
+    student = make_user('student')
+
+    summary = EnrollmentService.bulk_enroll(course.id, tenant.id, [student.id])
+
+    assert statuses(summary) == ['enrolled']
+    assert summary['results'][0]['batch_id'] is None
@@ -0,0 +1,12 @@
+def test_tenant_admin_cannot_read_process_cache_stats(client, base_url, login, make_user):
+    login(make_user('admin'))
+
+    response = client.get('/api/tenants/cache-stats', base_url=base_url)
+    assert response.status_code == 403
+
+def test_superadmin_reads_cache_stats(client, base_url, login, make_user):
+    login(make_user('superadmin'))
+
+    response = client.get('/api/tenants/cache-stats', base_url=base_url)
+    assert response.status_code == 200
+    assert set(response.get_json()) == {'cache', 'usage_cache'}
@@ -0,0 +1,71 @@
+import subprocess
+import sys
+import pytest
+from app.services.code_runner import _communicate, run_test_suite, score_results
+from app.utils.validators import Validators
+
+LIMITS = {'time_limit': 3, 'memory_limit_mb': 256, 'output_limit': 64 * 1024}
+
+def start(code):
+    return subprocess.Popen(
+        [sys.executable, '-c', code],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        start_new_session=True
+    )
+
+def test_output_is_capped_while_the_process_runs():
+    process = start("while True: print('x' * 1000)")
+    stdout, _, error = _communicate(process, b'', timeout=10, limit=64 * 1024)
+
+    assert error == 'Output limit exceeded'
+    assert len(stdout) == 64 * 1024
+    assert process.returncode is not None
+
+def test_input_is_fed_and_output_collected():
+    process = start("import sys; data = sys.stdin.read(); print(len(data))")
+    stdout, _, error = _communicate(process, b'x' * 200000, timeout=10, limit=1024)
+
+    assert error is None
+    assert stdout.strip() == '200000'
+
+def test_silent_process_hits_the_time_limit():
+    process = start("import time; time.sleep(30)")
+    _, _, error = _communicate(process, b'', timeout=0.5, limit=1024)
+
+    assert error == 'Time limit exceeded'
+
+def test_invalid_weights_are_rejected_and_do_not_break_scoring():
+    test_cases = [{'weight': 'heavy'}, {'weight': 3}, {}]
+    content = {'prompt': 'Reverse a string', 'test_cases': test_cases}
+
+    assert Validators.validate_question('code', content, 10) == [
+        "Code question test case weights must be non-negative numbers"
+    ]
+    results = [{'passed': True}, {'passed': True}, {'passed': False}]
+    assert score_results(8, test_cases, results) == 6
+
+def test_sandboxed_run_needs_no_privileges_and_stays_contained(tmp_path):
+    sandbox = {
+        'max_processes': 16,
+        'hidden_paths': [str(tmp_path)],
+        'chroot': None,
+        'interpreters': {'python': sys.executable},
+    }
+    (tmp_path / 'secret.txt').write_text('s3cret')
+    suite = [{'input': 'abc', 'expected_output': 'cba'}]
+
+    try:
+        reverse = run_test_suite('python', "print(input()[::-1])", suite, LIMITS, sandbox)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+
+    assert reverse == [{'passed': True, 'error': None}]
+    for code, expected in [
+        (f"import os; print(os.path.exists({str(tmp_path / 'secret.txt')!r}))", 'False'),
+        ("open('x.txt', 'w')", None),
+        ("import socket; socket.create_connection(('1.1.1.1', 80), timeout=1)", None),
+    ]:
+        result, = run_test_suite('python', code, [{'expected_output': expected or ''}], LIMITS, sandbox)
+        assert result['passed'] is (expected is not None)
+    flood, = run_test_suite('python', "while True: print('x' * 1000)", suite, LIMITS, sandbox)
+    assert flood == {'passed': False, 'error': 'Output limit exceeded'}
@@ -0,0 +1,57 @@
+import uuid
+from datetime import date
+from app.models.course import Course, Batch
+from app.models.enrollment import Enrollment
+
+def make_course(db, tenant, instructor, batches, students_per_batch):
+    course = Course(
+        id=str(uuid.uuid4()),
+        tenant_id=tenant.id,
+        instructor_id=instructor.id,
+        code=f"C-{uuid.uuid4().hex[:6]}",
+        title='Data Engineering',
+        delivery='offline'
+    )
+    db.session.add(course)
+    for number in range(batches):
+        batch = Batch(
+            id=str(uuid.uuid4()),
+            course_id=course.id,
+            name=f"Batch {number}",
+            start_date=date(2026, 1, 1 + number),
+            end_date=date(2026, 6, 1),
+            confirmed_count=students_per_batch
+        )
+        db.session.add(batch)
+        db.session.add_all(Enrollment(
+            id=str(uuid.uuid4()),
+            user_id=instructor.id,
+            course_id=course.id,
+            batch_id=batch.id,
+            status='confirmed'
+        ) for _ in range(students_per_batch))
+    db.session.commit()
+    return course
+
+def fetch_course(client, base_url, count_queries, course_id):
+    with count_queries() as statements:
+        response = client.get(f'/api/courses/{course_id}', base_url=base_url)
+    assert response.status_code == 200
+    return response.get_json(), statements
+
+def test_get_course_query_count_does_not_grow_with_batches(db, tenant, make_user, client, base_url, count_queries):
+    instructor = make_user('instructor', full_name='Ada Instructor')
+    small = make_course(db, tenant, instructor, batches=1, students_per_batch=1)
+    large = make_course(db, tenant, instructor, batches=8, students_per_batch=5)
+
+    _, small_statements = fetch_course(client, base_url, count_queries, small.id)
+    data, large_statements = fetch_course(client, base_url, count_queries, large.id)
+
+    # Tenant lookup, course with its instructor, batches, confirmed COUNT
+    assert len(small_statements) <= 4
+    assert len(large_statements) == len(small_statements)
+
+    assert data['instructor']['full_name'] == 'Ada Instructor'
+    assert len(data['batches']) == 8
+    assert all(batch['enrolled_count'] == 5 for batch in data['batches'])
+    assert data['enrollment_count'] == 40
@@ -0,0 +1,55 @@
+import uuid
+import pytest
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.services.progress_buffer import progress_buffer
+
+@pytest.fixture
+def enrollment(db, tenant, make_user):
+    student = make_user()
+    course = Course(
+        id=str(uuid.uuid4()),
+        tenant_id=tenant.id,
+        code=f"C-{uuid.uuid4().hex[:6]}",
+        title='Linear Algebra',
+        delivery='online'
+    )
+    enrollment = Enrollment(
+        id=str(uuid.uuid4()),
+        user_id=student.id,
+        course_id=course.id,
+        status='confirmed'
+    )
+    db.session.add_all([course, enrollment])
+    db.session.commit()
+    yield enrollment
+    progress_buffer.pop(enrollment.id)
+
+def put_progress(client, base_url, login, enrollment, payload):
+    login(enrollment.user)
+    return client.put(f'/api/enrollments/{enrollment.id}/progress', json=payload, base_url=base_url)
+
+@pytest.mark.parametrize('payload', [
+    {'progress': 40, 'time_spent_seconds': 'soon'},
+    {'progress': 40, 'time_spent_seconds': [30]},
+    {'progress': {'value': 40}}
+])
+def test_malformed_values_are_rejected(client, base_url, login, enrollment, payload):
+    response = put_progress(client, base_url, login, enrollment, payload)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid progress value'
+
+def test_progress_is_only_buffered_in_the_request(app, db, client, base_url, login, enrollment, count_queries):
+    app.config['ENROLLMENT_PROGRESS_FLUSH_SECONDS'] = 0
+    with count_queries() as statements:
+        response = put_progress(client, base_url, login, enrollment, {'progress': 40, 'time_spent_seconds': 30})
+
+    assert response.status_code == 200
+    assert response.get_json()['enrollment']['progress_decimal'] == 40
+    assert not any(statement.lstrip().upper().startswith('UPDATE ENROLLMENTS') for statement in statements)
+
+    progress_buffer.flush()
+    db.session.expire_all()
+    stored = db.session.get(Enrollment, enrollment.id)
+    assert float(stored.progress_decimal) == 40
+    assert stored.time_spent_seconds == 30
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timedelta
+from app.models.assessment import Assessment, Exam
+from app.models.course import Course
+from app.services.assessment_service import AssessmentService
+from app.services.exam_sweeper import ExamSweeper
+
+def make_overdue_exams(db, tenant, student, count):
+    course = Course(id=str(uuid.uuid4()), tenant_id=tenant.id, code='C-1', title='Algebra', delivery='online')
+    assessment = Assessment(id=str(uuid.uuid4()), course_id=course.id, title='Final', type='exam',
+                            settings={'timed': True, 'duration_minutes': 30})
+    db.session.add_all([course, assessment])
+    now = datetime.utcnow()
+    exams = [Exam(
+        id=str(uuid.uuid4()),
+        assessment_id=assessment.id,
+        user_id=student.id,
+        status='in_progress',
+        started_at=now - timedelta(hours=2),
+        # The first ones are the oldest, at the head of every batch
+        expires_at=now - timedelta(hours=1) + timedelta(minutes=number)
+    ) for number in range(count)]
+    db.session.add_all(exams)
+    db.session.commit()
+    return [exam.id for exam in exams]
+
+def test_failing_exams_do_not_stall_the_sweep(app, db, tenant, make_user, monkeypatch):
+    app.config.update(EXAM_SWEEP_BATCH_SIZE=2, EXAM_SWEEP_BATCH_PAUSE_SECONDS=0, EXAM_SWEEP_MAX_ATTEMPTS=3)
+    exam_ids = make_overdue_exams(db, tenant, make_user('student'), 5)
+    broken = set(exam_ids[:2])
+
+    def submit_exam(exam_id, expired=False):
+        if exam_id in broken:
+            raise RuntimeError("grading backend down")
+        db.session.execute(db.update(Exam).where(Exam.id == exam_id).values(status='expired'))
+        db.session.commit()
+        return {'status': 'expired'}
+
+    monkeypatch.setattr(AssessmentService, 'submit_exam', staticmethod(submit_exam))
+
+    sweeper = ExamSweeper(app)
+    assert sweeper.run_once() == 5
+
+    db.session.expire_all()
+    exams = {exam.id: exam for exam in Exam.query.filter(Exam.id.in_(exam_ids))}
+    assert {exams[exam_id].status for exam_id in exam_ids[2:]} == {'expired'}
+    for exam_id in broken:
+        assert exams[exam_id].status == 'in_progress'
+        assert exams[exam_id].sweep_attempts == 1
+        assert exams[exam_id].sweep_retry_at > datetime.utcnow()
+
+    # Not retried before their retry time, then given up after the last attempt
+    assert sweeper.run_once() == 0
+    for attempt in range(2, 5):
+        Exam.query.filter(Exam.id.in_(broken)).update({'sweep_retry_at': None}, synchronize_session=False)
+        db.session.commit()
+        assert sweeper.run_once() == (2 if attempt <= 3 else 0)
+    db.session.expire_all()
+    assert {exams[exam_id].sweep_attempts for exam_id in broken} == {3}
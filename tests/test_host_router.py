@@ -0,0 +1,78 @@
+import re
+import time
+import uuid
+from datetime import datetime
+import pytest
+from app.middleware.tenant_resolver import host_router
+from app.models.tenant import Tenant
+
+def add_tenants(db, count, custom_every=2):
+    """count tenants on <slug>.xyz.com; every custom_every-th one also has a verified custom domain"""
+    now = datetime.utcnow()
+    rows = [{
+        'id': str(uuid.uuid4()),
+        'name': f"Tenant {number}",
+        'slug': f"t{number}",
+        'subdomain': f"t{number}.xyz.com",
+        'subscription_tier': 'professional' if number % custom_every == 0 else 'free',
+        'custom_domain': f"learn.t{number}.example.org" if number % custom_every == 0 else None,
+        'custom_domain_verified_at': now if number % custom_every == 0 else None,
+        'status': 'active',
+        'created_at': now,
+        'updated_at': now
+    } for number in range(count)]
+    for start in range(0, len(rows), 1000):
+        db.session.execute(db.insert(Tenant), rows[start:start + 1000])
+    db.session.commit()
+    return rows
+
+def test_resolves_subdomains_and_verified_custom_domains(db):
+    add_tenants(db, 4)
+
+    assert host_router.resolve('T1.xyz.com:443') == 't1.xyz.com'
+    assert host_router.resolve('learn.t2.example.org') == 't2.xyz.com'
+    assert host_router.resolve('www.xyz.com') is None
+    assert host_router.resolve('unknown.example.org') is None
+    assert host_router.is_public_path('/api/tenants/create/step-1')
+    assert not host_router.is_public_path('/api/courses')
+
+# The extract_subdomain and path checks the router replaced, for comparison
+LEGACY_PATTERN = r'^(?:([a-zA-Z0-9-]+)\.)?xyz\.com$'
+
+def legacy_route(host, path):
+    if path.startswith('/api/tenants/create') or path in ['/health', '/api/auth/register']:
+        return None
+    match = re.match(LEGACY_PATTERN, host.split(':')[0])
+    if match and match.group(1) and match.group(1) not in ['www', 'app', 'api']:
+        return match.group(1)
+    return None
+
+def per_call_microseconds(function, hosts, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for host in hosts:
+            function(host)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(hosts) * 1e6
+
+@pytest.mark.benchmark
+def test_routing_cost_per_request_for_10k_hosts(db):
+    rows = add_tenants(db, 5000)
+    hosts = [row['subdomain'] for row in rows] + [row['custom_domain'] for row in rows if row['custom_domain']]
+    hosts += [f"learn.t{number}.example.org" for number in range(1, 5000, 2)]  # unknown custom hosts
+    assert len(set(hosts)) == 10000
+    host_router.resolve(hosts[0])  # loads the custom domain map
+
+    def route(host):
+        if not host_router.is_public_path('/api/courses'):
+            return host_router.resolve(host)
+
+    router = per_call_microseconds(route, hosts)
+    legacy = per_call_microseconds(lambda host: legacy_route(host, '/api/courses'), hosts)
+    print(f"\nhost routing per request over 10k hosts: router {router:.2f} us, "
+          f"legacy regex (subdomains only) {legacy:.2f} us")
+
+    assert router < 20
+    assert all(host_router.resolve(row['custom_domain']) == row['subdomain'] for row in rows if row['custom_domain'])
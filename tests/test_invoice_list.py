@@ -0,0 +1,55 @@
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from app.models.payment import Invoice, Payment
+
+def add_paid_invoices(db, tenant, student, count):
+    for number in range(count):
+        invoice = Invoice(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant.id,
+            user_id=student.id,
+            invoice_number=f"INV-ACME-{uuid.uuid4().hex[:10]}",
+            due_date=date(2026, 1, 31),
+            total_amount=Decimal('100.00'),
+            paid_amount=Decimal('40.00'),
+            line_items=[{'description': 'Tuition', 'amount': 100, 'quantity': 1}],
+            status='sent'
+        )
+        db.session.add(invoice)
+        db.session.add(Payment(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant.id,
+            user_id=student.id,
+            invoice_id=invoice.id,
+            amount=Decimal('40.00'),
+            payment_method='card',
+            status='completed',
+            paid_at=datetime(2026, 1, 10)
+        ))
+    db.session.commit()
+
+def list_invoices(client, base_url, count_queries):
+    with count_queries() as statements:
+        response = client.get('/api/payments/invoices?per_page=50', base_url=base_url)
+    assert response.status_code == 200
+    return response.get_json(), statements
+
+def test_invoice_page_query_count_does_not_grow_with_invoices(db, tenant, make_user, client, base_url, login, count_queries):
+    admin = make_user('admin')
+    student = make_user('student')
+    login(admin)
+
+    add_paid_invoices(db, tenant, student, 2)
+    _, small_statements = list_invoices(client, base_url, count_queries)
+
+    add_paid_invoices(db, tenant, student, 48)
+    data, large_statements = list_invoices(client, base_url, count_queries)
+
+    # Tenant, current user, page total and page rows; paid amounts are a column
+    assert len(small_statements) <= 4
+    assert len(large_statements) == len(small_statements)
+
+    assert len(data['invoices']) == 50
+    assert all(invoice['amount_paid'] == 40.0 for invoice in data['invoices'])
+    assert all(invoice['balance_due'] == 60.0 for invoice in data['invoices'])
@@ -0,0 +1,24 @@
+from decimal import Decimal
+import pytest
+from app.services.payment_service import PaymentService
+
+def test_discount_lines_reduce_the_total():
+    items, _, tax_amount, total = PaymentService.calculate_invoice_totals([
+        {'description': 'Tuition', 'amount': 100, 'quantity': 2},
+        {'description': 'Early bird discount', 'amount': -25.5, 'quantity': 1},
+    ], tax_rate=10)
+
+    assert items[1]['amount'] == -25.5
+    assert tax_amount == Decimal('17.45')
+    assert total == Decimal('191.95')
+
+def test_discounts_cannot_make_the_total_negative():
+    with pytest.raises(ValueError, match="cannot be negative"):
+        PaymentService.calculate_invoice_totals([
+            {'description': 'Tuition', 'amount': 10},
+            {'description': 'Scholarship', 'amount': -20},
+        ])
+
+def test_quantities_must_be_positive():
+    with pytest.raises(ValueError, match="quantities must be positive"):
+        PaymentService.calculate_invoice_totals([{'description': 'Tuition', 'amount': 10, 'quantity': 0}])
@@ -0,0 +1,77 @@
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from app.models.course import Course
+from app.utils.helpers import encode_cursor, keyset_paginate_query
+
+PER_PAGE = 20
+
+def add_courses(db, tenant, count, chunk=20000):
+    started = datetime(2020, 1, 1)
+    for start in range(0, count, chunk):
+        db.session.execute(db.insert(Course), [{
+            'id': str(uuid.uuid4()),
+            'tenant_id': tenant.id,
+            'code': f"C{number}",
+            'title': f"Course {number}",
+            'delivery': 'online',
+            # Pairs share a timestamp so the id tiebreak is exercised
+            'created_at': started + timedelta(seconds=number // 2),
+            'updated_at': started
+        } for number in range(start, min(start + chunk, count))])
+    db.session.commit()
+
+def ordered(tenant):
+    return Course.query.filter_by(tenant_id=tenant.id).order_by(Course.created_at.desc(), Course.id.desc())
+
+def test_cursor_walk_matches_offset_order(db, tenant):
+    add_courses(db, tenant, 95)
+    query = Course.query.filter_by(tenant_id=tenant.id)
+
+    walked, cursor = [], None
+    while True:
+        page = keyset_paginate_query(query, Course.created_at, Course.id, cursor=cursor, per_page=PER_PAGE)
+        walked += [course.id for course in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert walked == [course.id for course in ordered(tenant)]
+
+def median_ms(function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+@pytest.mark.benchmark
+def test_deep_page_latency(db, tenant):
+    rows = int(os.environ.get('BENCHMARK_ROWS', 1000000))
+    add_courses(db, tenant, rows)
+    query = Course.query.filter_by(tenant_id=tenant.id)
+
+    print(f"\n{'depth':>10} {'offset+count ms':>16} {'keyset ms':>10}")
+    results = {}
+    for depth in (0, rows // 100, rows // 2, rows - PER_PAGE):
+        # Cursor of the row just before the page, as a client walking there would hold
+        before = ordered(tenant).offset(depth - 1).first() if depth else None
+        cursor = encode_cursor(before.created_at, before.id) if before else None
+
+        offset = median_ms(lambda: (
+            ordered(tenant).offset(depth).limit(PER_PAGE).all(),
+            query.order_by(None).count()
+        ))
+        keyset = median_ms(lambda: keyset_paginate_query(
+            query, Course.created_at, Course.id, cursor=cursor, per_page=PER_PAGE
+        ))
+        results[depth] = (offset, keyset)
+        print(f"{depth:>10} {offset:>16.2f} {keyset:>10.2f}")
+
+    deepest = rows - PER_PAGE
+    assert results[deepest][1] < results[deepest][0] / 10
+    assert results[deepest][1] < results[0][1] * 5 + 5
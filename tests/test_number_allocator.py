@@ -0,0 +1,61 @@
+import threading
+import uuid
+from app.models.tenant import Tenant
+from app.utils.number_allocator import NumberAllocator
+
+def add_tenant(db, slug):
+    tenant = Tenant(
+        id=str(uuid.uuid4()),
+        name=slug.title(),
+        slug=slug,
+        subdomain=f"{slug}.xyz.com",
+        student_count=0,
+        course_count=0,
+        storage_used=0
+    )
+    db.session.add(tenant)
+    db.session.commit()
+    return tenant
+
+def test_numbers_continue_across_blocks(app, tenant):
+    app.config['NUMBER_BLOCK_SIZE'] = 3
+    allocator = NumberAllocator()
+
+    numbers = allocator.allocate(tenant.id, 'invoice', 4) + [allocator.next_number(tenant.id, 'invoice')]
+    assert numbers == [f"INV-ACME-{value:06d}" for value in range(1, 6)]
+    assert allocator.next_number(tenant.id, 'certificate') == 'CERT-ACME-000001'
+
+def test_refill_of_one_sequence_does_not_block_another(app, db, tenant):
+    other = add_tenant(db, 'globex')
+    allocator = NumberAllocator()
+    reserve = allocator._reserve
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_reserve(tenant_id, name, size):
+        if tenant_id == tenant.id:
+            entered.set()
+            release.wait(5)
+        return reserve(tenant_id, name, size)
+
+    allocator._reserve = slow_reserve
+    results = {}
+
+    def allocate(tenant_id):
+        with app.app_context():
+            results[tenant_id] = allocator.next_number(tenant_id, 'invoice')
+
+    acme = threading.Thread(target=allocate, args=(tenant.id,))
+    globex = threading.Thread(target=allocate, args=(other.id,))
+    acme.start()
+    try:
+        assert entered.wait(5)
+        # Served while the acme refill is still waiting on the database
+        globex.start()
+        globex.join(2)
+        assert results.get(other.id) == 'INV-GLOBEX-000001'
+    finally:
+        release.set()
+        acme.join()
+        globex.join()
+
+    assert results[tenant.id] == 'INV-ACME-000001'
@@ -0,0 +1,73 @@
+import json
+import uuid
+import pytest
+from app.models.assessment import Assessment, Question
+from app.models.course import Course
+from app.models.tenant import Tenant
+
+QUESTION = {'type': 'mcq', 'prompt': 'Pick a', 'options': ['a', 'b'], 'correct_answer': 'a', 'marks': 1}
+
+@pytest.fixture
+def make_assessment(db):
+    def factory(tenant, instructor=None):
+        course = Course(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant.id,
+            instructor_id=instructor.id if instructor else None,
+            code=f"C-{uuid.uuid4().hex[:6]}",
+            title='Chemistry',
+            delivery='online'
+        )
+        assessment = Assessment(id=str(uuid.uuid4()), course_id=course.id, title='Quiz 1', type='quiz')
+        db.session.add_all([course, assessment])
+        db.session.commit()
+        return assessment
+
+    return factory
+
+def import_questions(client, base_url, assessment):
+    return client.post(
+        f'/api/assessments/{assessment.id}/questions/import?format=jsonl',
+        data=json.dumps(QUESTION) + '\n',
+        base_url=base_url
+    )
+
+def test_admin_can_import_into_any_course_of_the_tenant(client, base_url, login, tenant, make_user, make_assessment):
+    assessment = make_assessment(tenant, make_user('instructor'))
+    login(make_user('admin'))
+
+    response = import_questions(client, base_url, assessment)
+    assert response.status_code == 201
+    assert Question.query.filter_by(assessment_id=assessment.id).count() == 1
+
+def test_instructor_cannot_import_into_another_instructors_course(client, base_url, login, tenant, make_user,
+                                                                  make_assessment):
+    assessment = make_assessment(tenant, make_user('instructor'))
+    login(make_user('instructor'))
+
+    assert import_questions(client, base_url, assessment).status_code == 403
+
+def test_instructor_can_import_into_own_course(client, base_url, login, tenant, make_user, make_assessment):
+    owner = make_user('instructor')
+    assessment = make_assessment(tenant, owner)
+    login(owner)
+
+    assert import_questions(client, base_url, assessment).status_code == 201
+
+def test_assessment_of_another_tenant_is_not_found(db, client, base_url, login, make_user, make_assessment):
+    other = Tenant(
+        id=str(uuid.uuid4()),
+        name='Other Academy',
+        slug='other',
+        subdomain='other.xyz.com',
+        student_count=0,
+        course_count=0,
+        storage_used=0
+    )
+    db.session.add(other)
+    db.session.commit()
+    assessment = make_assessment(other)
+    login(make_user('admin'))
+
+    assert import_questions(client, base_url, assessment).status_code == 404
+    assert Question.query.filter_by(assessment_id=assessment.id).count() == 0
@@ -0,0 +1,122 @@
+import os
+import statistics
+import threading
+import time
+import uuid
+import pytest
+from app.models.assessment import Assessment, Question, Exam, Response
+from app.models.course import Course
+from app.services.assessment_service import AssessmentService
+
+OPTIONS = ['a', 'b', 'c', 'd']
+
+def make_assessment(db, tenant, questions):
+    course = Course(
+        id=str(uuid.uuid4()),
+        tenant_id=tenant.id,
+        code=f"C-{uuid.uuid4().hex[:6]}",
+        title='Statistics',
+        delivery='online'
+    )
+    assessment = Assessment(
+        id=str(uuid.uuid4()),
+        course_id=course.id,
+        title=f"{questions}-question exam",
+        type='exam',
+        total_marks=questions
+    )
+    db.session.add_all([course, assessment])
+    db.session.flush()
+    db.session.execute(db.insert(Question), [{
+        'id': str(uuid.uuid4()),
+        'assessment_id': assessment.id,
+        'type': 'mcq',
+        'content': {'prompt': f"Question {number}", 'options': OPTIONS, 'correct_answer': 'a'},
+        'marks': 1,
+        'order_index': number
+    } for number in range(questions)])
+    db.session.commit()
+    return assessment
+
+def start_exams(db, assessment, users):
+    exams = [Exam(
+        id=str(uuid.uuid4()),
+        assessment_id=assessment.id,
+        user_id=user.id,
+        status='in_progress',
+        total_marks=assessment.total_marks
+    ) for user in users]
+    db.session.add_all(exams)
+    db.session.commit()
+    return [exam.id for exam in exams]
+
+def answers(db, assessment):
+    # Every other question answered correctly
+    question_ids = db.session.query(Question.id).filter_by(
+        assessment_id=assessment.id
+    ).order_by(Question.order_index).all()
+    return [
+        {'question_id': question_id, 'answer': OPTIONS[number % 2]}
+        for number, (question_id,) in enumerate(question_ids)
+    ]
+
+def submit_counting(db, count_queries, exam_id, responses):
+    with count_queries() as statements:
+        result = AssessmentService.submit_exam(exam_id, responses)
+    return result, len(statements)
+
+def test_query_count_does_not_grow_with_questions(db, tenant, make_user, count_queries):
+    student = make_user()
+    counts = {}
+    for questions in (50, 1000):
+        assessment = make_assessment(db, tenant, questions)
+        responses = answers(db, assessment)
+        # The first submit compiles the answer key; compare warm submits
+        warm_up, exam_id = start_exams(db, assessment, [student, student])
+        AssessmentService.submit_exam(warm_up, responses)
+
+        result, counts[questions] = submit_counting(db, count_queries, exam_id, responses)
+        assert result['marks_obtained'] == questions // 2
+        assert Response.query.filter_by(exam_id=exam_id).count() == questions
+
+    assert counts[50] == counts[1000]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+@pytest.mark.benchmark
+def test_concurrent_submit_latency(app, db, tenant, make_user):
+    submitters = int(os.environ.get('BENCHMARK_SUBMITTERS', 32))
+    students = [make_user() for _ in range(submitters)]
+
+    print(f"\n{'questions':>10} {'submitters':>11} {'p50 ms':>8} {'p95 ms':>8}")
+    for questions in (50, 200, 1000):
+        assessment = make_assessment(db, tenant, questions)
+        responses = answers(db, assessment)
+        exam_ids = start_exams(db, assessment, students)
+        timings, errors = [], []
+        barrier = threading.Barrier(submitters)
+
+        def submitter(exam_id):
+            with app.app_context():
+                try:
+                    barrier.wait()
+                    started = time.perf_counter()
+                    AssessmentService.submit_exam(exam_id, responses)
+                    timings.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=submitter, args=(exam_id,)) for exam_id in exam_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert Exam.query.filter(Exam.id.in_(exam_ids), Exam.status == 'graded').count() == submitters
+        print(f"{questions:>10} {submitters:>11} "
+              f"{statistics.median(timings) * 1000:>8.1f} {percentile(timings, 0.95) * 1000:>8.1f}")
@@ -0,0 +1,83 @@
+import time
+from flask import g
+import pytest
+from app.models.tenant import TIER_FEATURES
+from app.services.tenant_service import TenantService
+from app.utils.decorators import feature_required
+
+class LegacyTenant:
+    """Tenant.features as it was before the tier table, for comparison"""
+
+    def __init__(self, subscription_tier):
+        self.subscription_tier = subscription_tier
+
+    @property
+    def features(self):
+        return {
+            'custom_domain': self.subscription_tier in ['professional', 'enterprise'],
+            'advanced_analytics': self.subscription_tier in ['professional', 'enterprise'],
+            'api_access': self.subscription_tier in ['professional', 'enterprise'],
+            'white_label': self.subscription_tier in ['professional', 'enterprise'],
+            'payment_integration': self.subscription_tier in ['starter', 'professional', 'enterprise'],
+            'scorm_support': self.subscription_tier in ['starter', 'professional', 'enterprise'],
+            'multi_branch': self.subscription_tier in ['professional', 'enterprise'],
+            'sso_integration': self.subscription_tier == 'enterprise',
+            'storage_limit': self.get_storage_limit(),
+            'max_students': self.get_max_students(),
+            'max_courses': self.get_max_courses(),
+            'max_instructors': self.get_max_instructors(),
+        }
+
+    def get_storage_limit(self):
+        limits = {
+            'free': 500 * 1024 * 1024,
+            'starter': 5 * 1024 * 1024 * 1024,
+            'professional': 50 * 1024 * 1024 * 1024,
+            'enterprise': 250 * 1024 * 1024 * 1024,
+        }
+        return limits.get(self.subscription_tier, limits['free'])
+
+    def get_max_students(self):
+        return {'free': 50, 'starter': 500, 'professional': 2000, 'enterprise': None}.get(self.subscription_tier)
+
+    def get_max_courses(self):
+        return {'free': 3, 'starter': 20, 'professional': None, 'enterprise': None}.get(self.subscription_tier)
+
+    def get_max_instructors(self):
+        return {'free': 5, 'starter': 20, 'professional': 100, 'enterprise': None}.get(self.subscription_tier)
+
+@feature_required('advanced_analytics')
+def analytics_view():
+    return 'ok'
+
+def test_tier_table_matches_the_legacy_features():
+    for tier in ('free', 'starter', 'professional', 'enterprise'):
+        assert dict(TIER_FEATURES[tier]) == LegacyTenant(tier).features
+
+def test_overrides_apply_on_top_of_the_tier(db, tenant):
+    TenantService.set_feature_overrides(tenant.slug, {'advanced_analytics': True})
+    db.session.refresh(tenant)
+
+    assert tenant.subscription_tier == 'free'
+    assert tenant.features['advanced_analytics'] is True
+    assert TIER_FEATURES['free']['advanced_analytics'] is False
+
+def per_call_microseconds(function, calls=200000):
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started) / calls * 1e6
+
+@pytest.mark.benchmark
+def test_feature_required_cost(app, tenant):
+    tenant.subscription_tier = 'professional'
+    with app.test_request_context():
+        g.tenant_id = tenant.id
+
+        g.tenant = LegacyTenant('professional')
+        before = per_call_microseconds(analytics_view)
+        g.tenant = tenant
+        after = per_call_microseconds(analytics_view)
+
+    print(f"\nfeature_required per call: legacy features {before:.2f} us, tier table {after:.2f} us")
+    assert after < before
@@ -0,0 +1,83 @@
+import threading
+import uuid
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.services.tenant_service import TenantService
+from app.utils.usage_buffer import usage_buffer
+
+THREADS = 8
+UPDATES_PER_THREAD = 25
+
+def run_concurrently(app, tenant_id, target):
+    errors = []
+
+    def worker():
+        with app.app_context():
+            try:
+                for _ in range(UPDATES_PER_THREAD):
+                    target(tenant_id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                from app.extensions import db
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+def update_usage(tenant_id):
+    from app.extensions import db
+    db.session.get(Tenant, tenant_id).update_usage(student_delta=1, storage_delta=10)
+
+def reload(db, tenant_id):
+    db.session.expire_all()
+    return db.session.get(Tenant, tenant_id)
+
+def test_concurrent_updates_lose_nothing(app, db, tenant):
+    run_concurrently(app, tenant.id, update_usage)
+
+    tenant = reload(db, tenant.id)
+    assert tenant.student_count == THREADS * UPDATES_PER_THREAD
+    assert tenant.storage_used == THREADS * UPDATES_PER_THREAD * 10
+
+def test_buffered_updates_lose_nothing(app, db, tenant):
+    app.config['TENANT_USAGE_BUFFERED_TENANTS'] = [tenant.slug]
+    run_concurrently(app, tenant.id, update_usage)
+
+    assert usage_buffer.pending(tenant.id)['student_count'] == THREADS * UPDATES_PER_THREAD
+    usage_buffer.flush()
+
+    tenant = reload(db, tenant.id)
+    assert tenant.student_count == THREADS * UPDATES_PER_THREAD
+    assert usage_buffer.pending(tenant.id)['student_count'] == 0
+
+def test_reconcile_does_not_double_count_pending_deltas(app, db, tenant):
+    app.config['TENANT_USAGE_BUFFERED_TENANTS'] = [tenant.slug]
+    for index in range(3):
+        user = User(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant.id,
+            email=f'student{index}@example.com',
+            full_name=f'Student {index}',
+            role='student',
+            status='active'
+        )
+        user.set_password('Secret123')
+        db.session.add(user)
+        db.session.commit()
+        tenant.update_usage(student_delta=1)
+
+    # The counter drifts by 5, then a +1/-1 pair is still pending at reconcile
+    Tenant.apply_usage_deltas(tenant.id, student_delta=5)
+    db.session.commit()
+    usage_buffer.flush()
+    tenant.update_usage(student_delta=1)
+    tenant.update_usage(student_delta=-1)
+
+    assert TenantService.reconcile_usage([tenant.id]) == 1
+    usage_buffer.flush()
+    assert reload(db, tenant.id).student_count == 3
@@ -0,0 +1,188 @@
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+import pytest
+from app.models.payment import Invoice, Payment, RevenueDaily, WebhookEvent
+from app.services.webhook_inbox import process_events, replay_events
+
+SECRET = 'whsec_test'
+
+class FakeGateway:
+    """Posts Stripe-shaped payment intent events, signed like Stripe, to the webhook"""
+
+    def __init__(self, client, base_url, secret=SECRET):
+        self.client = client
+        self.base_url = base_url
+        self.secret = secret
+        self.clock = int(time.time())
+
+    def event(self, event_type, intent_id, created=None, metadata=None):
+        self.clock += 1
+        return {
+            'id': f"evt_{uuid.uuid4().hex}",
+            'type': event_type,
+            'created': created or self.clock,
+            'data': {'object': {'id': intent_id, 'metadata': metadata or {}}}
+        }
+
+    def sign(self, payload, secret=None):
+        timestamp = int(time.time())
+        signature = hmac.new(
+            (secret or self.secret).encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        return f"t={timestamp},v1={signature}"
+
+    def post(self, event, signature=True):
+        payload = json.dumps(event)
+        headers = {'Content-Type': 'application/json'}
+        if signature:
+            headers['Stripe-Signature'] = self.sign(payload, None if signature is True else signature)
+        return self.client.post('/api/payments/webhook/stripe', data=payload, headers=headers,
+                                base_url=self.base_url)
+
+@pytest.fixture
+def gateway(client, base_url):
+    return FakeGateway(client, base_url)
+
+@pytest.fixture
+def make_payments(db, tenant, make_user):
+    """Pending gateway payments of 100.00, each against its own invoice"""
+    def factory(count, with_intent=True):
+        student = make_user('student')
+        payments = []
+        for _ in range(count):
+            invoice = Invoice(
+                id=str(uuid.uuid4()),
+                tenant_id=tenant.id,
+                user_id=student.id,
+                invoice_number=f"INV-ACME-{uuid.uuid4().hex[:10]}",
+                due_date=date(2026, 1, 31),
+                total_amount=Decimal('100.00'),
+                paid_amount=Decimal('0'),
+                line_items=[{'description': 'Tuition', 'amount': 100, 'quantity': 1}],
+                status='sent'
+            )
+            payment = Payment(
+                id=str(uuid.uuid4()),
+                tenant_id=tenant.id,
+                user_id=student.id,
+                invoice_id=invoice.id,
+                amount=Decimal('100.00'),
+                payment_method='stripe',
+                status='pending',
+                gateway_transaction_id=f"pi_{uuid.uuid4().hex}" if with_intent else None
+            )
+            db.session.add_all([invoice, payment])
+            payments.append(payment)
+        db.session.commit()
+        return payments
+
+    return factory
+
+def drain():
+    handled = 0
+    while True:
+        batch = process_events(batch_size=100)
+        if not batch:
+            return handled
+        handled += batch
+
+def test_unsigned_and_forged_events_are_rejected(db, gateway, make_payments):
+    payment, = make_payments(1)
+    event = gateway.event('payment_intent.succeeded', payment.gateway_transaction_id)
+
+    assert gateway.post(event, signature=False).status_code == 400
+    assert gateway.post(event, signature='whsec_forged').status_code == 400
+    assert WebhookEvent.query.count() == 0
+
+def test_metadata_payment_id_does_not_confirm_a_payment(db, gateway, make_payments):
+    payment, = make_payments(1, with_intent=False)
+    event = gateway.event('payment_intent.succeeded', 'pi_not_a_real_intent', metadata={'payment_id': payment.id})
+
+    assert gateway.post(event).status_code == 200
+    drain()
+
+    db.session.expire_all()
+    assert db.session.get(Payment, payment.id).status == 'pending'
+    assert db.session.get(Invoice, payment.invoice_id).status == 'sent'
+
+def test_events_of_an_intent_apply_in_gateway_order(db, gateway, make_payments):
+    payment, = make_payments(1)
+    intent_id = payment.gateway_transaction_id
+    failed = gateway.event('payment_intent.payment_failed', intent_id)
+    succeeded = gateway.event('payment_intent.succeeded', intent_id)
+
+    # The later event arrives first
+    gateway.post(succeeded)
+    gateway.post(failed)
+
+    assert process_events(batch_size=100) == 1
+    db.session.expire_all()
+    assert db.session.get(Payment, payment.id).status == 'failed'
+
+    drain()
+    db.session.expire_all()
+    assert db.session.get(Payment, payment.id).status == 'completed'
+
+def post_burst(gateway, payments, rng):
+    """Each payment fails once and then succeeds; every event is delivered twice, shuffled"""
+    events = []
+    for payment in payments:
+        events.append(gateway.event('payment_intent.payment_failed', payment.gateway_transaction_id))
+        events.append(gateway.event('payment_intent.succeeded', payment.gateway_transaction_id))
+    deliveries = events + events
+    rng.shuffle(deliveries)
+
+    latencies, duplicates = [], 0
+    for event in deliveries:
+        started = time.perf_counter()
+        response = gateway.post(event)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        duplicates += response.get_json()['duplicate']
+    return len(events), duplicates, latencies
+
+def assert_paid_exactly_once(db, payments):
+    db.session.expire_all()
+    assert {db.session.get(Payment, payment.id).status for payment in payments} == {'completed'}
+    invoices = Invoice.query.filter(Invoice.id.in_([payment.invoice_id for payment in payments])).all()
+    assert {(invoice.status, invoice.paid_amount) for invoice in invoices} == {('paid', Decimal('100.00'))}
+    count, gross = db.session.query(
+        db.func.sum(RevenueDaily.payments_count), db.func.sum(RevenueDaily.gross_amount)
+    ).one()
+    assert count == len(payments)
+    assert Decimal(gross) == Decimal('100.00') * len(payments)
+
+def test_fake_gateway_burst_applies_each_payment_once(db, gateway, make_payments):
+    payments = make_payments(100)
+    unique, duplicates, _ = post_burst(gateway, payments, random.Random(7))
+
+    assert duplicates == unique
+    assert WebhookEvent.query.count() == unique
+    assert drain() == unique
+    assert_paid_exactly_once(db, payments)
+
+    # Replaying the whole burst changes nothing
+    assert replay_events(status='processed') == unique
+    drain()
+    assert_paid_exactly_once(db, payments)
+
+@pytest.mark.benchmark
+def test_fake_gateway_ingestion_latency_stays_flat(db, gateway, make_payments):
+    payments = make_payments(1250)
+    unique, _, latencies = post_burst(gateway, payments, random.Random(11))
+
+    # 5000 deliveries: acknowledging one must not get slower as the inbox fills
+    window = len(latencies) // 10
+    first, last = statistics.median(latencies[:window]), statistics.median(latencies[-window:])
+    print(f"\nwebhook ingest median: first {first * 1000:.2f} ms, last {last * 1000:.2f} ms")
+    assert last < first * 2
+
+    assert drain() == unique
+    assert_paid_exactly_once(db, payments)
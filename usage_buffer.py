@@ -0,0 +1,107 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import current_app
+from app.extensions import db
+
+class UsageBuffer:
+    """Defers usage counter updates of hot tenants through a side table.
+
+    A buffered tenant's deltas are appended to tenant_usage_deltas in the
+    caller's transaction (an insert, no lock on the tenants row) and drained
+    into the tenants row in batches by flush(). Because a delta row commits or
+    rolls back together with the change it counts, reconcile_usage can read
+    counters, pending deltas and source rows from one snapshot.
+    """
+
+    FIELDS = ('student_count', 'course_count', 'storage_used')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def is_buffered(self, tenant):
+        buffered = current_app.config.get('TENANT_USAGE_BUFFERED_TENANTS', ())
+        return tenant.slug in buffered or tenant.id in buffered
+
+    def add(self, tenant_id, student_delta=0, course_delta=0, storage_delta=0):
+        """Append deltas in the current transaction; the caller commits"""
+        from app.models.tenant import TenantUsageDelta
+
+        if not (student_delta or course_delta or storage_delta):
+            return
+
+        now = datetime.utcnow()
+        db.session.execute(db.insert(TenantUsageDelta).values(
+            id=str(uuid.uuid4()),
+            tenant_id=tenant_id,
+            student_delta=student_delta,
+            course_delta=course_delta,
+            storage_delta=storage_delta,
+            created_at=now,
+            updated_at=now
+        ))
+
+    def pending(self, tenant_id):
+        """Return the undrained deltas of a tenant as a dict"""
+        from app.models.tenant import TenantUsageDelta
+
+        row = db.session.query(
+            db.func.coalesce(db.func.sum(TenantUsageDelta.student_delta), 0),
+            db.func.coalesce(db.func.sum(TenantUsageDelta.course_delta), 0),
+            db.func.coalesce(db.func.sum(TenantUsageDelta.storage_delta), 0)
+        ).filter(TenantUsageDelta.tenant_id == tenant_id).one()
+        return dict(zip(self.FIELDS, (int(value) for value in row)))
+
+    def flush_if_due(self):
+        interval = current_app.config.get('TENANT_USAGE_FLUSH_SECONDS', 5)
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        """Drain pending deltas into the tenants table; returns the number of delta rows applied.
+
+        Each batch is claimed with FOR UPDATE SKIP LOCKED, applied and deleted
+        in one transaction of its own, so concurrent drains in other
+        processes never apply a delta twice.
+        """
+        from app.models.tenant import Tenant, TenantUsageDelta
+
+        with self._lock:
+            self._last_flush = time.monotonic()
+
+        batch_size = current_app.config.get('TENANT_USAGE_DRAIN_BATCH_SIZE', 1000)
+        table = TenantUsageDelta.__table__
+        drained = 0
+
+        while True:
+            with db.engine.begin() as connection:
+                rows = connection.execute(
+                    db.select(
+                        table.c.id, table.c.tenant_id,
+                        table.c.student_delta, table.c.course_delta, table.c.storage_delta
+                    ).order_by(table.c.created_at).limit(batch_size).with_for_update(skip_locked=True)
+                ).all()
+                if not rows:
+                    break
+
+                totals = {}
+                for row in rows:
+                    deltas = totals.setdefault(row.tenant_id, [0, 0, 0])
+                    deltas[0] += row.student_delta or 0
+                    deltas[1] += row.course_delta or 0
+                    deltas[2] += row.storage_delta or 0
+
+                # Fixed tenant order so concurrent drains cannot deadlock
+                for tenant_id in sorted(totals):
+                    Tenant.apply_usage_deltas(tenant_id, *totals[tenant_id], connection=connection)
+                connection.execute(table.delete().where(table.c.id.in_([row.id for row in rows])))
+
+            drained += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        return drained
+
+usage_buffer = UsageBuffer()
@@ -1,3 +1,4 @@
+import math
 import re
 from datetime import datetime
 
@@ -59,3 +60,46 @@ class Validators:
         text = text.strip()
 
         return text
+
+    @staticmethod
+    def code_test_weight(test_case):
+        """Weight of a code test case: a non-negative number, 1 when absent, None when invalid"""
+        weight = test_case.get('weight', 1)
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            return None
+        if not math.isfinite(weight) or weight < 0:
+            return None
+        return weight
+
+    @staticmethod
+    def validate_question(question_type, content, marks):
+        """Validate question fields by type; returns a list of error messages"""
+        errors = []
+
+        if question_type not in ['mcq', 'tf', 'short', 'essay', 'code']:
+            return [f"Invalid question type: {question_type}"]
+
+        if not isinstance(content, dict) or not content.get('prompt'):
+            errors.append("Question prompt is required")
+            content = content if isinstance(content, dict) else {}
+
+        if not isinstance(marks, int) or isinstance(marks, bool) or marks <= 0:
+            errors.append("Marks must be a positive integer")
+
+        if question_type == 'mcq':
+            options = content.get('options')
+            if not isinstance(options, list) or len(options) < 2:
+                errors.append("MCQ questions need at least two options")
+            elif content.get('correct_answer') is None:
+                errors.append("MCQ questions need a correct_answer")
+        elif question_type == 'tf':
+            if str(content.get('correct_answer')).strip().lower() not in ['true', 'false']:
+                errors.append("True/false questions need a correct_answer of true or false")
+        elif question_type == 'code':
+            test_cases = content.get('test_cases', [])
+            if not isinstance(test_cases, list) or not all(isinstance(t, dict) for t in test_cases):
+                errors.append("Code question test_cases must be a list of objects")
+            elif any(Validators.code_test_weight(t) is None for t in test_cases):
+                errors.append("Code question test case weights must be non-negative numbers")
+
+        return errors
@@ -0,0 +1,222 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from app.extensions import db
+from app.models.payment import Payment, WebhookEvent
+from app.services.payment_service import PaymentService
+
+# event type -> callable(event_payload); unknown types are marked ignored
+WEBHOOK_HANDLERS = {}
+
+def register_webhook_handler(event_type):
+    """Register the processor of a gateway event type"""
+    def decorator(f):
+        WEBHOOK_HANDLERS[event_type] = f
+        return f
+    return decorator
+
+def _find_payment(payment_intent):
+    # Only the intent recorded when the payment was sent to the gateway: ids
+    # in the event metadata are not trusted
+    return Payment.query.filter_by(gateway_transaction_id=payment_intent['id']).first()
+
+@register_webhook_handler('payment_intent.succeeded')
+def handle_payment_succeeded(event):
+    payment_intent = event['data']['object']
+    payment = _find_payment(payment_intent)
+    if payment:
+        # Idempotent: an already completed or refunded payment is left as is
+        PaymentService.confirm_payment(payment.id, payment_intent['id'])
+
+@register_webhook_handler('payment_intent.payment_failed')
+def handle_payment_failed(event):
+    payment_intent = event['data']['object']
+    payment = _find_payment(payment_intent)
+    if payment and payment.status not in ('completed', 'refunded'):
+        payment.status = 'failed'
+        payment.gateway_transaction_id = payment_intent['id']
+        payment.gateway_response = {
+            'status': 'failed',
+            'error': (payment_intent.get('last_payment_error') or {}).get('message')
+        }
+        db.session.commit()
+
+def ingest_event(payload, provider='stripe'):
+    """Persist a raw webhook payload; returns (event_id, duplicate)"""
+    try:
+        event = json.loads(payload)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid webhook payload")
+
+    if not isinstance(event, dict) or not event.get('id') or not event.get('type'):
+        raise ValueError("Webhook event id and type required")
+
+    data_object = (event.get('data') or {}).get('object') or {}
+    now = datetime.utcnow()
+    created = event.get('created')
+    event_created_at = (
+        datetime.utcfromtimestamp(created)
+        if isinstance(created, (int, float)) and not isinstance(created, bool) else now
+    )
+
+    try:
+        db.session.execute(db.insert(WebhookEvent).values(
+            id=str(uuid.uuid4()),
+            provider=provider,
+            event_id=event['id'],
+            event_type=event['type'],
+            ordering_key=data_object.get('id'),
+            event_created_at=event_created_at,
+            payload=event,
+            status='received',
+            attempts=0,
+            received_at=now,
+            created_at=now,
+            updated_at=now
+        ))
+        db.session.commit()
+    except IntegrityError:
+        # Gateway retry of an event that is already in the inbox
+        db.session.rollback()
+        return event['id'], True
+
+    return event['id'], False
+
+def claim_events(batch_size):
+    """Mark up to batch_size events as processing and return them.
+
+    Only the earliest unfinished event of each ordering key (by gateway
+    creation time, then arrival) can be claimed, so events of one payment are
+    never processed concurrently or out of order.
+    """
+    stale_before = datetime.utcnow() - timedelta(
+        seconds=current_app.config.get('WEBHOOK_EVENT_TIMEOUT_SECONDS', 300)
+    )
+    older = aliased(WebhookEvent)
+    unfinished = db.or_(
+        WebhookEvent.status == 'received',
+        db.and_(WebhookEvent.status == 'processing', WebhookEvent.locked_at < stale_before)
+    )
+
+    events = WebhookEvent.query.filter(
+        unfinished,
+        db.or_(
+            WebhookEvent.ordering_key.is_(None),
+            ~db.exists().where(
+                older.provider == WebhookEvent.provider,
+                older.ordering_key == WebhookEvent.ordering_key,
+                older.status.in_(['received', 'processing']),
+                db.tuple_(older.event_created_at, older.received_at, older.id) <
+                db.tuple_(WebhookEvent.event_created_at, WebhookEvent.received_at, WebhookEvent.id)
+            )
+        )
+    ).order_by(WebhookEvent.event_created_at, WebhookEvent.received_at, WebhookEvent.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    now = datetime.utcnow()
+    for event in events:
+        event.status = 'processing'
+        event.locked_at = now
+        event.attempts = (event.attempts or 0) + 1
+    db.session.commit()
+    return events
+
+def process_events(batch_size=50):
+    """Process one batch of inbox events; returns the number handled"""
+    events = claim_events(batch_size)
+    if not events:
+        return 0
+
+    max_attempts = current_app.config.get('WEBHOOK_EVENT_MAX_ATTEMPTS', 5)
+    for event in events:
+        handler = WEBHOOK_HANDLERS.get(event.event_type)
+        try:
+            if handler:
+                handler(event.payload)
+            status, error = ('processed' if handler else 'ignored'), None
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Webhook event %s failed", event.event_id)
+            status = 'failed' if event.attempts >= max_attempts else 'received'
+            error = str(e)
+
+        WebhookEvent.query.filter_by(id=event.id).update({
+            'status': status,
+            'error': error,
+            'processed_at': datetime.utcnow() if status in ('processed', 'ignored') else None
+        }, synchronize_session=False)
+        db.session.commit()
+
+    return len(events)
+
+def replay_events(status='failed', since=None, until=None, event_ids=None):
+    """Queue stored events for processing again; returns the number queued"""
+    query = WebhookEvent.query
+    if event_ids:
+        query = query.filter(WebhookEvent.event_id.in_(event_ids))
+    elif status:
+        query = query.filter(WebhookEvent.status == status)
+    if since:
+        query = query.filter(WebhookEvent.received_at >= since)
+    if until:
+        query = query.filter(WebhookEvent.received_at < until)
+
+    count = query.update({
+        'status': 'received',
+        'attempts': 0,
+        'error': None,
+        'locked_at': None
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+class WebhookWorkerPool:
+    """Thread pool that drains the webhook_events inbox in batches"""
+
+    def __init__(self, app, workers=None, batch_size=None, poll_interval=None):
+        self.app = app
+        self.workers = workers or app.config.get('WEBHOOK_WORKERS', 2)
+        self.batch_size = batch_size or app.config.get('WEBHOOK_BATCH_SIZE', 50)
+        self.poll_interval = poll_interval or app.config.get('WEBHOOK_POLL_SECONDS', 1)
+        self._stop = threading.Event()
+        self._executor = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    handled = process_events(self.batch_size)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Webhook batch failed")
+                    handled = 0
+                finally:
+                    db.session.remove()
+            if not handled:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='webhooks')
+        for _ in range(self.workers):
+            self._executor.submit(self._run)
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()